@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Mäter sträcktidsanalysen för en tredagarstävling (från tolkade svar till ledplaceringar och misstag).
+
+    python -m benchmarks.analytics_bench
+"""
+import time
+
+import xmltodict
+
+import eventor_analytics
+from benchmarks.records_bench import CLASSES, CONTROLS, RUNNERS, result_list_xml
+
+STAGES = 3
+REPEAT = 5
+
+
+def main():
+    stages = [xmltodict.parse(result_list_xml()) for _ in range(STAGES)]
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        analyses = eventor_analytics.analyse(stages)
+        for analysis in analyses.values():
+            analysis.cumulative_ranks()
+            analysis.leg_ranks()
+            analysis.time_behind()
+            analysis.mistakes()
+        timings.append(time.perf_counter() - start)
+    elapsed = min(timings)
+    print('{0} stages x {1} classes x {2} runners x {3} controls: {4:.3f} s'.format(
+        STAGES, CLASSES, RUNNERS, CONTROLS, elapsed))
+
+
+if __name__ == '__main__':
+    main()
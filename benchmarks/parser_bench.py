@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Jämför tolkningshastigheten (MB/s) för XML-tolkarna i PARSERS på genererade svar för de största funktionerna.
+
+    python -m benchmarks.parser_bench
+"""
+import time
+
+from eventor_toolkit import PARSERS
+from tests.fake_eventor import synthetic_responses
+
+SIZE = 4
+REPEAT = 5
+FUNCTIONS = ('results/event', 'results/event/iofxml', 'starts/event', 'entries', 'organisations', 'events')
+
+
+def throughput(parse, body):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        parse(body)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(body) / 1e6 / best
+
+
+def main():
+    responses = synthetic_responses(SIZE)
+    names = sorted(PARSERS)
+    print('{0:24s} {1:>8s} {2}'.format('function', 'MB', ' '.join('{0:>10s}'.format(n) for n in names)))
+    for function in FUNCTIONS:
+        body = responses[function]({'includeSplitTimes': 'true'}).encode('utf-8')
+        rates = [throughput(PARSERS[name], body) for name in names]
+        print('{0:24s} {1:8.2f} {2}'.format(function, len(body) / 1e6,
+                                            ' '.join('{0:10.2f}'.format(rate) for rate in rates)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Genomströmning (resultatlistor per sekund) för Eventor.map(results_per_event, include_split_times=True) med
+tolkning i de hämtande trådarna jämfört med en ProcessParser med 1, 2 och 4 processer.
+
+    python -m benchmarks.process_parse_bench
+"""
+import os
+import time
+
+from eventor_toolkit import Eventor, ProcessParser
+from tests.fake_eventor import FakeEventorServer
+
+SIZE = 4
+EVENTS = 32
+THREADS = 16
+PROCESSES = (1, 2, 4)
+
+
+def rate(e):
+    args = [dict(event_id=event_id, include_split_times=True) for event_id in range(1, EVENTS + 1)]
+    start = time.perf_counter()
+    for result in e.map(e.results_per_event, args, workers=THREADS):
+        result.value
+    return EVENTS / (time.perf_counter() - start)
+
+
+def main():
+    print('{0} CPU, {1} result lists of size {2}, {3} threads'.format(os.cpu_count(), EVENTS, SIZE, THREADS))
+    with FakeEventorServer.synthetic(SIZE) as server:
+        with Eventor('KEY', api_url=server.url, pool_size=THREADS, parser='expat') as e:
+            print('  {0:20s} {1:8.1f}/s'.format('threads (expat)', rate(e)))
+        for processes in PROCESSES:
+            with ProcessParser(processes=processes) as parser, \
+                    Eventor('KEY', api_url=server.url, pool_size=THREADS, parser=parser) as e:
+                parser(b'<Warmup>' + b' ' * parser.min_size + b'</Warmup>')
+                print('  {0:20s} {1:8.1f}/s'.format('processes={0}'.format(processes), rate(e)))
+
+
+if __name__ == '__main__':
+    main()
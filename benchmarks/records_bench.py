@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Jämför minnesanvändningen för en resultatlista som xmltodict-struktur och som eventor_records-poster.
+
+    python -m benchmarks.records_bench
+"""
+import gc
+import tracemalloc
+
+import xmltodict
+
+import eventor_records
+
+CLASSES = 40
+RUNNERS = 100
+CONTROLS = 20
+
+
+def result_list_xml():
+    split = '<SplitTime sequence="{s}"><ControlCode>{c}</ControlCode><Time>{m}:{s:02d}</Time></SplitTime>'
+    person = ('<PersonResult><Person sex="M"><PersonName><Family>Family{p}</Family><Given sequence="1">Given{p}'
+              '</Given></PersonName><PersonId>{p}</PersonId></Person><Organisation><OrganisationId>{o}'
+              '</OrganisationId></Organisation><Result><StartTime><Date>2018-05-01</Date><Clock>10:{m:02d}:00'
+              '</Clock></StartTime><Time>{m}:30</Time><ResultPosition>{p}</ResultPosition>{splits}'
+              '<CompetitorStatus value="OK" /></Result></PersonResult>')
+    class_result = '<ClassResult><EventClass><EventClassId>{c}</EventClassId></EventClass>{persons}</ClassResult>'
+    classes = []
+    for c in range(CLASSES):
+        persons = []
+        for p in range(RUNNERS):
+            splits = ''.join(split.format(s=s, c=31 + s, m=p % 60) for s in range(1, CONTROLS + 1))
+            persons.append(person.format(p=p, o=p % 50, m=p % 60, splits=splits))
+        classes.append(class_result.format(c=c, persons=''.join(persons)))
+    return '<ResultList>{0}</ResultList>'.format(''.join(classes))
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def main():
+    body = result_list_xml()
+    doc, dict_size = measure(lambda: xmltodict.parse(body))
+    records, records_size = measure(lambda: eventor_records.results(xmltodict.parse(body)))
+    print('{0} results, {1} split times each'.format(len(records), CONTROLS))
+    print('xmltodict:       {0:8.1f} MB'.format(dict_size / 1e6))
+    print('eventor_records: {0:8.1f} MB'.format(records_size / 1e6))
+    print('reduction: {0:.1f}x'.format(dict_size / float(records_size)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Samlad prestandamätning mot en lokal ersättare för Eventor med genererade svar (tests.fake_eventor):
+
+- latens per anrop för varje funktion i Eventor,
+- tolkningstid per MB XML för en resultatlista med sträcktider,
+- högsta minnesanvändning för en resultatlista hämtad i sin helhet respektive med stream=True,
+- genomströmning (anrop per sekund) med Eventor.map och 1, 4 och 16 trådar mot en server med SERVER_LATENCY.
+
+Med --json skrivs resultatet som JSON och med --baseline jämförs det med ett tidigare sparat resultat; skriptet
+avslutas med status 1 om något mått försämrats mer än --tolerance.
+
+    python -m benchmarks.suite --json > baseline.json
+    python -m benchmarks.suite --baseline baseline.json
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+import xmltodict
+
+from eventor_toolkit import Eventor
+from tests.fake_eventor import FakeEventorServer, synthetic_responses
+
+CALLS = 10
+SIZE = 2
+MIN_DELTA = 1.0
+SERVER_LATENCY = 0.01
+THROUGHPUT_CALLS = 200
+WORKERS = (1, 4, 16)
+
+ENDPOINTS = [
+    ('events', lambda e: e.events()),
+    ('events_documents', lambda e: e.events_documents()),
+    ('event', lambda e: e.event(1)),
+    ('event_classes', lambda e: e.event_classes(1)),
+    ('event_entryfees', lambda e: e.event_entryfees(1)),
+    ('organisation_from_api_key', lambda e: e.organisation_from_api_key()),
+    ('organisations', lambda e: e.organisations()),
+    ('organisation', lambda e: e.organisation(100)),
+    ('members_in_organisation', lambda e: e.members_in_organisation(100, include_contact_details=True)),
+    ('competitors', lambda e: e.competitors(100)),
+    ('external_login_url', lambda e: e.external_login_url(1000, 100)),
+    ('authenticate_person', lambda e: e.authenticate_person('user', 'password')),
+    ('entries', lambda e: e.entries(event_ids=[1, 2, 3])),
+    ('competitor_count', lambda e: e.competitor_count([100], event_ids=[1])),
+    ('start_times_per_event', lambda e: e.start_times_per_event(1)),
+    ('start_times_per_event_iofxml', lambda e: e.start_times_per_event_iofxml(1)),
+    ('start_times_per_person', lambda e: e.start_times_per_person(1000)),
+    ('start_times_per_organisation', lambda e: e.start_times_per_organisation([100], event_id=1)),
+    ('results_per_event', lambda e: e.results_per_event(1, include_split_times=True)),
+    ('results_per_event_iofxml', lambda e: e.results_per_event_iofxml(1, include_split_times=True)),
+    ('results_per_person', lambda e: e.results_per_person(1000)),
+    ('results_per_organisation', lambda e: e.results_per_organisation(100, event_id=1)),
+    ('activities', lambda e: e.activities(100)),
+    ('activity', lambda e: e.activity(100, 1)),
+    ('competitor', lambda e: e.competitor(1000)),
+]
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def endpoint_latency(server):
+    latencies = {}
+    with Eventor('KEY', api_url=server.url) as e:
+        for name, call in ENDPOINTS:
+            samples = []
+            for _ in range(CALLS):
+                start = time.perf_counter()
+                call(e)
+                samples.append(time.perf_counter() - start)
+            latencies[name] = median(samples) * 1000
+    return latencies
+
+
+def parse_time_per_mb():
+    body = synthetic_responses(SIZE)['results/event']({'includeSplitTimes': 'true'}).encode('utf-8')
+    samples = []
+    for _ in range(5):
+        start = time.perf_counter()
+        xmltodict.parse(body)
+        samples.append(time.perf_counter() - start)
+    return median(samples) * 1000 / (len(body) / 1e6)
+
+
+def peak_memory(fn):
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def memory(server):
+    with Eventor('KEY', api_url=server.url) as e:
+        buffered = peak_memory(lambda: e.results_per_event(1, include_split_times=True))
+        streamed = peak_memory(lambda: sum(1 for _ in e.results_per_event(1, include_split_times=True, stream=True)))
+    return {'buffered': buffered, 'stream': streamed}
+
+
+def throughput(server):
+    rates = {}
+    with Eventor('KEY', api_url=server.url, pool_size=max(WORKERS)) as e:
+        for workers in WORKERS:
+            start = time.perf_counter()
+            for result in e.map(e.event, [(i,) for i in range(THROUGHPUT_CALLS)], workers=workers):
+                result.value
+            rates[str(workers)] = THROUGHPUT_CALLS / (time.perf_counter() - start)
+    return rates
+
+
+def run():
+    with FakeEventorServer.synthetic(SIZE) as server:
+        latencies = endpoint_latency(server)
+        memory_mb = memory(server)
+    with FakeEventorServer.synthetic(1, latency=SERVER_LATENCY) as server:
+        rates = throughput(server)
+    return {'latency_ms': latencies,
+            'parse_ms_per_mb': parse_time_per_mb(),
+            'peak_memory_mb': memory_mb,
+            'throughput_per_s': rates}
+
+
+def _flatten(result, prefix=''):
+    values = {}
+    for name, value in result.items():
+        if isinstance(value, dict):
+            values.update(_flatten(value, '{0}{1}.'.format(prefix, name)))
+        else:
+            values['{0}{1}'.format(prefix, name)] = value
+    return values
+
+
+def compare(result, baseline, tolerance):
+    """
+    Mått som försämrats mer än tolerance (andel) och mer än MIN_DELTA (i måttets enhet) jämfört med baseline.
+    Högre är bättre för genomströmning och lägre för övriga mått. Returnerar en lista med (namn, baseline, nytt
+    värde).
+    """
+    regressions = []
+    current = _flatten(result)
+    for name, before in sorted(_flatten(baseline).items()):
+        after = current.get(name)
+        if after is None or not before:
+            continue
+        if name.startswith('throughput_per_s.'):
+            change = (before - after) / before
+        else:
+            change = (after - before) / before
+        if change > tolerance and abs(after - before) > MIN_DELTA:
+            regressions.append((name, before, after))
+    return regressions
+
+
+def report(result):
+    print('Latency per call (ms, median of {0})'.format(CALLS))
+    for name, value in sorted(result['latency_ms'].items()):
+        print('  {0:32s} {1:8.2f}'.format(name, value))
+    print('Parse time: {0:.1f} ms per MB'.format(result['parse_ms_per_mb']))
+    print('Peak memory results_per_event: buffered {buffered:.1f} MB, stream {stream:.1f} MB'.format(
+        **result['peak_memory_mb']))
+    print('Throughput with {0} ms server latency (calls/s)'.format(SERVER_LATENCY * 1000))
+    for workers in WORKERS:
+        print('  workers={0:<3d} {1:8.1f}'.format(workers, result['throughput_per_s'][str(workers)]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Eventor-toolkit benchmark suite')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    parser.add_argument('--baseline', help='JSON result to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed regression (default 0.5)')
+    args = parser.parse_args(argv)
+
+    result = run()
+    if args.json:
+        json.dump(result, sys.stdout, indent=2, sort_keys=True)
+        print('')
+    else:
+        report(result)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for name, before, after in regressions:
+            sys.stderr.write('regression {0}: {1:.2f} -> {2:.2f}\n'.format(name, before, after))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Jämför latens per anrop mellan en ny anslutning per anrop (requests.get) och Eventors anslutningspool.
+
+Mot en lokal ersättare för Eventor där varje ny anslutning kostar CONNECT_LATENCY sekunder (motsvarar
+TCP- och TLS-handskakning mot eventor.orientering.se).
+
+    python -m benchmarks.transport_bench
+"""
+import time
+
+import requests
+
+from eventor_toolkit import Eventor
+from tests.fake_eventor import FakeEventorServer
+
+CALLS = 200
+CONNECT_LATENCY = 0.02
+EVENT_XML = '<?xml version="1.0" encoding="utf-8"?><Event><EventId>1</EventId><Name>Test</Name></Event>'
+
+
+def per_call(fn, calls=CALLS):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    with FakeEventorServer({'event/1': EVENT_XML}, connect_latency=CONNECT_LATENCY) as server:
+        url = '{base}event/1'.format(base=server.url)
+        unpooled = per_call(lambda: requests.get(url, headers={'ApiKey': 'KEY'}))
+        with Eventor('KEY', api_url=server.url) as e:
+            pooled = per_call(lambda: e.event(1))
+    print('requests.get per call:  {0:8.2f} ms'.format(unpooled * 1000))
+    print('Eventor pooled per call: {0:8.2f} ms'.format(pooled * 1000))
+    print('speedup: {0:.1f}x'.format(unpooled / pooled))
+
+
+if __name__ == '__main__':
+    main()
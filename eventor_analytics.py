@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Sträcktidsanalys med NumPy för resultat med sträcktider från Eventor.results_per_event(include_split_times=True)
+eller Eventor.results_per_event_iofxml(include_split_times=True).
+
+Varje klass blir en SplitAnalysis med en matris löpare × kontroller (mål sist) med kumulativa tider i sekunder,
+där saknade stämplingar är NaN. Alla beräkningar görs kolumnvis över hela klassen.
+
+    for event_class_id, analysis in analyse(e.results_per_event(event_id, include_split_times=True)).items():
+        print(event_class_id, analysis.leg_ranks(), analysis.mistakes())
+"""
+import numpy as np
+
+from eventor_records import _first, _get, _int, _items, _races, _seconds, _text
+from eventor_toolkit import _as_list
+
+FINISH = 'F'
+
+
+def _competition_ranks(values):
+    """
+    Placering per kolumn (1 = snabbast, lika tider ger samma placering), 0 där tiden saknas.
+    """
+    ranks = np.zeros(values.shape, dtype=np.int32)
+    for column in range(values.shape[1]):
+        col = values[:, column]
+        present = ~np.isnan(col)
+        ordered = np.sort(col[present])
+        ranks[present, column] = np.searchsorted(ordered, col[present], side='left') + 1
+    return ranks
+
+
+class SplitAnalysis:
+    """
+    person_ids  Löparnas person-id:n, en per rad.
+    controls  Kontrollkoderna i banans ordning följt av FINISH, en per kolumn.
+    times  Kumulativa tider i sekunder, NaN för saknade stämplingar.
+    """
+
+    def __init__(self, person_ids, controls, times):
+        self.person_ids = np.asarray(person_ids)
+        self.controls = tuple(controls)
+        self.times = np.asarray(times, dtype=np.float64)
+
+    @classmethod
+    def from_class_result(cls, class_result, event_race_id=None):
+        """
+        Skapar en SplitAnalysis från en ClassResult i xmltodict-struktur. Kontrollordningen tas från den löpare som
+        har flest sträcktider.
+
+        event_race_id  Loppet i en flerdagarstävling, löpare utan resultat i loppet tas inte med. Standard är
+            varje löpares första lopp.
+        """
+        person_ids = []
+        rows = []
+        for person_result in _as_list(class_result.get('PersonResult')):
+            races = _races(person_result, 'Result', 'RaceResult')
+            if event_race_id is not None:
+                races = [race for race in races if race[0] == event_race_id]
+                if not races:
+                    continue
+            result = races[0][1]
+            person = person_result.get('Person') or {}
+            person_ids.append(_int(_first(person.get('PersonId'), person.get('Id'))))
+            status = result.get('CompetitorStatus')
+            if isinstance(status, dict):
+                status = status.get('@value')
+            total = result.get('Time') if (status or result.get('Status')) == 'OK' else None
+            splits = [(_text(split.get('ControlCode')), split.get('Time'))
+                      for split in _as_list(result.get('SplitTime'))]
+            rows.append((splits, total))
+        course = max((splits for splits, total in rows), key=len) if rows else []
+        controls = [code for code, time in course] + [FINISH]
+        parsed = {}
+        indices = ([], [], [])
+        for row, (splits, total) in enumerate(rows):
+            punches = [(column, time) for column, (code, time) in enumerate(splits[:len(course)])
+                       if time is not None and code == controls[column]]
+            if total is not None:
+                punches.append((len(controls) - 1, total))
+            for column, time in punches:
+                seconds = parsed.get(time)
+                if seconds is None:
+                    seconds = parsed[time] = _seconds(time)
+                indices[0].append(row)
+                indices[1].append(column)
+                indices[2].append(seconds)
+        times = np.full((len(rows), len(controls)), np.nan)
+        times[indices[0], indices[1]] = indices[2]
+        return cls(person_ids, controls, times)
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        Skapar en SplitAnalysis från en klass Result-poster (eventor_records).
+        """
+        results = list(results)
+        course = max((r.splits for r in results), key=len) if results else ()
+        controls = [split.control_code for split in course] + [FINISH]
+        times = np.full((len(results), len(controls)), np.nan)
+        for row, result in enumerate(results):
+            for column, split in enumerate(result.splits[:len(course)]):
+                if split.time is not None and split.control_code == controls[column]:
+                    times[row, column] = split.time
+            if result.time is not None and result.status == 'OK':
+                times[row, -1] = result.time
+        return cls([r.person_id for r in results], controls, times)
+
+    @property
+    def missing(self):
+        return np.isnan(self.times)
+
+    def leg_times(self):
+        """
+        Tid för varje sträcka (från föregående kontroll, eller start), NaN om någon av stämplingarna saknas.
+        """
+        previous = np.zeros_like(self.times)
+        previous[:, 1:] = self.times[:, :-1]
+        return self.times - previous
+
+    def cumulative_ranks(self):
+        return _competition_ranks(self.times)
+
+    def leg_ranks(self):
+        return _competition_ranks(self.leg_times())
+
+    def time_behind(self):
+        """
+        Kumulativ tid efter den bästa vid varje kontroll.
+        """
+        return self.times - self._column_best(self.times)
+
+    def leg_time_behind(self):
+        """
+        Tid efter sträcksegraren på varje sträcka.
+        """
+        legs = self.leg_times()
+        return legs - self._column_best(legs)
+
+    def mistakes(self, min_loss=30, ratio=0.2):
+        """
+        Uppskattad tidsförlust per sträcka. Varje löpares förväntade sträcktid är sträcksegrarens tid gånger
+        löparens mediantempo relativt sträcksegrarna; förlusten är sträcktiden minus den förväntade tiden och
+        räknas som ett misstag när den överstiger både min_loss sekunder och ratio av den förväntade tiden.
+        Returnerat element
+
+        Matris med tidsförlust i sekunder där misstag uppskattats, annars 0 (NaN för saknade sträckor).
+        """
+        legs = self.leg_times()
+        best = self._column_best(legs)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pace = np.nanmedian(legs / best, axis=1, keepdims=True) if legs.size else legs
+            expected = best * pace
+            loss = legs - expected
+            is_mistake = (loss > min_loss) & (loss > ratio * expected)
+        return np.where(np.isnan(loss), np.nan, np.where(is_mistake, loss, 0.0))
+
+    @staticmethod
+    def _column_best(values):
+        best = np.full((1, values.shape[1]), np.nan)
+        present = ~np.all(np.isnan(values), axis=0)
+        best[0, present] = np.nanmin(values[:, present], axis=0)
+        return best
+
+
+def analyse(doc):
+    """
+    SplitAnalysis per klass för ett resultatsvar, en ClassResult eller en lista med svar (t ex en etapp per svar).
+    Returnerat element
+
+    Dict från klass-id (för flera svar en tupel (index, klass-id)) till SplitAnalysis. Klasser med resultat för
+    flera lopp (RaceResult) får en SplitAnalysis per lopp med nyckeln (klass-id, event_race_id).
+    """
+    if isinstance(doc, list) and doc and 'ResultList' in doc[0]:
+        analyses = {}
+        for index, stage in enumerate(doc):
+            for event_class_id, analysis in analyse(stage).items():
+                analyses[(index, event_class_id)] = analysis
+        return analyses
+    analyses = {}
+    for class_result in _items(doc, ('ResultList', 'ClassResult')):
+        event_class_id = _first(_int(class_result.get('EventClassId')),
+                                _int(_get(class_result, 'EventClass', 'EventClassId')))
+        race_ids = sorted(set(race_id for person_result in _as_list(class_result.get('PersonResult'))
+                              for race_id, result in _races(person_result, 'Result', 'RaceResult')
+                              if race_id is not None))
+        if len(race_ids) > 1:
+            for race_id in race_ids:
+                analyses[(event_class_id, race_id)] = SplitAnalysis.from_class_result(class_result, race_id)
+        else:
+            analyses[event_class_id] = SplitAnalysis.from_class_result(class_result)
+    return analyses
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import hashlib
+import time
+from contextlib import asynccontextmanager
+
+import aiohttp
+
+from eventor_toolkit import (THROTTLE_STATUS_CODES, UNCOALESCED_FUNCTIONS, BatchResult, CallMetrics, Eventor,
+                             EventorError, RawDownload, _RAISE, _ItemParser, _call_with, _count_elements, _extract,
+                             _merge_documents, _queries, _query_key, _raw_destination, _retry_after)
+
+
+class _AsyncSingleFlight:
+    """
+    Motsvarighet till _SingleFlight för korutiner.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._flights = {}
+
+    async def do(self, key, fn):
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+            # Ledaren avbröts innan den var klar; gör anropet själv i stället.
+            return await self.do(key, fn)
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await fn()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as error:
+            flight.set_exception(error)
+            flight.exception()
+            raise
+        else:
+            flight.set_result(value)
+            return value
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+
+class AsyncEventor(Eventor):
+    """
+    Asynkron variant av Eventor för asyncio. Alla metoder i Eventor finns med samma parametrar men returnerar
+    korutiner, t ex:
+
+        async with AsyncEventor(api_key) as e:
+            event, classes = await asyncio.gather(e.event(event_id), e.event_classes(event_id))
+
+    Frågorna byggs av samma metoder som i Eventor, endast själva anropet mot API:t skiljer sig. Med stream=True
+    returneras en asynkron generator som används med async for.
+
+    concurrency  Maximalt antal samtidiga anrop mot Eventor.
+    """
+
+    def __init__(self, api_key, api_url=None, session=None, concurrency=10, pool_size=10, timeout=(5, 60),
+                 retries=3, backoff_factor=0.5, cache=None, chunk_size=100, rate=None, burst=None, limiter=None,
+                 metrics=None, parser='xmltodict'):
+        """
+        session  En befintlig aiohttp.ClientSession att dela mellan flera instanser. Om den utelämnas skapas en
+            egen session vid första anropet som stängs tillsammans med instansen.
+
+        CallMetrics.connect mäts inte för asynkrona anrop.
+        """
+        Eventor.__init__(self, api_key, api_url=api_url, pool_size=pool_size, timeout=timeout, retries=retries,
+                         cache=cache, chunk_size=chunk_size, rate=rate, burst=burst, limiter=limiter,
+                         backoff_factor=backoff_factor, metrics=metrics, parser=parser)
+        self.concurrency = concurrency
+        self._limiter_condition = None
+        self._semaphore = None
+        self._owns_session = session is None
+        self._session = session
+
+    def _create_transport(self):
+        return None
+
+    def _create_single_flight(self):
+        return _AsyncSingleFlight()
+
+    def _get_semaphore(self):
+        """
+        Semaforen och villkoret skapas vid första anropet i den körande händelseloopen, eftersom de i Python före
+        3.10 knyts till den loop som finns när de skapas.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    def _get_limiter_condition(self):
+        if self._limiter_condition is None:
+            self._limiter_condition = asyncio.Condition()
+        return self._limiter_condition
+
+    def _get_session(self):
+        if self._session is None:
+            connect, read = self.timeout
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read),
+                headers={'Accept-Encoding': 'gzip, deflate'})
+        return self._session
+
+    async def close(self):
+        """
+        Stänger instansens anslutningar. En delad session stängs inte.
+        """
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def map(self, method, arg_sets, workers=None):
+        """
+        Anropar method en gång per argumentuppsättning i arg_sets med högst workers samtidiga anrop (standard
+        pool_size), se Eventor.map. Returnerar en lista med BatchResult i samma ordning som arg_sets.
+        """
+        if not callable(method):
+            method = getattr(self, method)
+        semaphore = asyncio.Semaphore(workers or self.workers)
+
+        async def run(index, args):
+            async with semaphore:
+                try:
+                    return BatchResult(index, args, value=await _call_with(method, args))
+                except Exception as error:
+                    return BatchResult(index, args, error=error)
+
+        return list(await asyncio.gather(*[run(index, args) for index, args in enumerate(arg_sets)]))
+
+    async def events_by_id(self, event_ids, workers=None):
+        return await self.map(self.event, event_ids, workers=workers)
+
+    async def competitors_for(self, person_ids, workers=None):
+        return await self.map(self.competitor, person_ids, workers=workers)
+
+    async def results_for(self, person_ids, workers=None, **kwargs):
+        arg_sets = [dict(kwargs, person_id=person_id) for person_id in person_ids]
+        return await self.map(self.results_per_person, arg_sets, workers=workers)
+
+    async def _acquire(self):
+        if self.rate_limiter is not None:
+            delay = self.rate_limiter.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        if self.limiter is not None:
+            condition = self._get_limiter_condition()
+            async with condition:
+                await condition.wait_for(self.limiter.try_acquire)
+
+    async def _release(self, latency, throttled):
+        if self.limiter is not None:
+            self.limiter.release(latency, throttled)
+            condition = self._get_limiter_condition()
+            async with condition:
+                condition.notify_all()
+
+    @asynccontextmanager
+    async def _request(self, url, call=None, stream=False):
+        """
+        Ett anrop med rate, limiter och omförsök efter 429/503 som i Eventor._get. Ger ett öppet svar med status
+        under 400. Med stream=True lämnas platsen i limiter tillbaka när svarshuvudet tagits emot i stället för när
+        svaret stängs.
+        """
+        session = self._get_session()
+        attempt = 0
+        while True:
+            delay = None
+            await self._acquire()
+            start = time.monotonic()
+            failed = True
+            released = False
+            opened = False
+            try:
+                async with session.get(url, headers={'ApiKey': self.api_key}) as r:
+                    throttled = r.status in THROTTLE_STATUS_CODES
+                    failed = throttled or r.status >= 500
+                    if call is not None:
+                        call.status = r.status
+                        call.retries = attempt
+                        call.ttfb = time.monotonic() - start
+                    if throttled and attempt < self.retries:
+                        delay = _retry_after(r)
+                        if delay is None:
+                            delay = self.backoff_factor * (2 ** attempt)
+                    elif r.status >= 400:
+                        raise EventorError(r.status, url, (await r.text())[:1000])
+                    else:
+                        if stream:
+                            released = True
+                            await self._release(time.monotonic() - start, failed)
+                        opened = True
+                        yield r
+                        if call is not None and not stream:
+                            call.download = time.monotonic() - start - call.ttfb
+                        return
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if opened or attempt >= self.retries:
+                    raise
+                delay = self.backoff_factor * (2 ** attempt)
+            finally:
+                if not released:
+                    await self._release(time.monotonic() - start, failed)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _get(self, url, call=None):
+        async with self._request(url, call) as r:
+            return await r.text()
+
+    async def _iterparse(self, function, q, tag):
+        for query in _queries(q, self.chunk_size):
+            items = self._iterparse_query(function, query, tag)
+            try:
+                async for item in items:
+                    yield item
+            finally:
+                await items.aclose()
+
+    async def _iterparse_query(self, function, q, tag):
+        call = CallMetrics(function, q) if self.metrics is not None else None
+        size = 0
+        elements = 0
+        failure = None
+        try:
+            async with self._get_semaphore():
+                async with self._request(self._url(function, q), call, stream=True) as r:
+                    parser = _ItemParser(tag)
+                    async for chunk in r.content.iter_chunked(64 * 1024):
+                        size += len(chunk)
+                        for item in parser.feed(chunk):
+                            elements += 1
+                            yield item
+                    for item in parser.close():
+                        elements += 1
+                        yield item
+        except Exception as error:
+            failure = error
+            raise
+        finally:
+            if call is not None:
+                call.bytes = size
+                call.elements = elements
+            self._record(call, failure)
+
+    async def _copy_raw(self, function, q, destination, checksum=None):
+        """
+        Skriver till destination synkront; använd ett filobjekt som inte blockerar om det spelar roll.
+        """
+        call = CallMetrics(function, q) if self.metrics is not None else None
+        digest = hashlib.new(checksum) if checksum else None
+        size = 0
+        try:
+            async with self._get_semaphore():
+                async with self._request(self._url(function, q), call, stream=True) as r:
+                    with _raw_destination(destination) as f:
+                        async for chunk in r.content.iter_chunked(64 * 1024):
+                            f.write(chunk)
+                            size += len(chunk)
+                            if digest is not None:
+                                digest.update(chunk)
+        except Exception as error:
+            self._record(call, error)
+            raise
+        if call is not None:
+            call.bytes = size
+            self._record(call)
+        return RawDownload(size, digest.hexdigest() if digest is not None else None)
+
+    async def _fetch(self, function, q):
+        call = CallMetrics(function, q, cache='hit') if self.metrics is not None else None
+        e = self._cache_get(function, q)
+        if e is None and function in UNCOALESCED_FUNCTIONS:
+            return await self._download(function, q)
+        if e is None:
+            return await self._flights.do(_query_key(function, q), lambda: self._download(function, q))
+        self._record(call)
+        return e
+
+    async def _download(self, function, q):
+        call = None
+        if self.metrics is not None:
+            call = CallMetrics(function, q, cache='miss' if self.cache is not None else None)
+        try:
+            async with self._get_semaphore():
+                body = await self._get(self._url(function, q), call=call)
+            start = time.monotonic()
+            parse_async = getattr(self.parser, 'parse_async', None)
+            e = await parse_async(body) if parse_async is not None else self.parser(body)
+            if call is not None:
+                call.parse = time.monotonic() - start
+                call.bytes = len(body.encode('utf-8'))
+                call.elements = _count_elements(e)
+        except Exception as error:
+            self._record(call, error)
+            raise
+        self._record(call)
+        self._cache_put(function, q, e, body)
+        return e
+
+    async def _execute(self, function, q, path=None, default=_RAISE, shard=None):
+        queries = _queries(q, self.chunk_size, shard)
+        if len(queries) == 1:
+            e = await self._fetch(function, queries[0])
+        else:
+            e = _merge_documents(await asyncio.gather(*[self._fetch(function, chunk) for chunk in queries]))
+        return _extract(e, path, default)
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+Kommandoradsverktyget eventor för export från Eventor till NDJSON, CSV eller Parquet.
+
+    eventor export results --event-ids 17395,17396 --split-times --format csv -o results.csv
+    eventor export entries --event-ids 17395 -o entries.ndjson --resume
+    eventor export members --organisation-ids 646 --format parquet -o members
+
+API-nyckeln anges med --api-key eller miljövariabeln EVENTOR_API_KEY.
+
+Exporten delas upp i delar (en per tävlings- eller organisations-id) som hämtas parallellt med --workers trådar.
+Raderna skrivs till en tillfällig fil per del allteftersom svaret tolkas och läggs till utdatafilen när delen är
+klar. Färdiga delar och utdatafilens storlek sparas i <output>.progress så att en avbruten export kan fortsätta med
+--resume. Parquet (kräver pyarrow) skrivs som en katalog med en fil per del.
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+ACTIVITY_COLUMNS = ('id', 'name', 'url', 'registration_deadline')
+PARQUET_BATCH_SIZE = 10000
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (tuple, list)):
+        return [_value(v) for v in value]
+    if hasattr(value, 'fields'):
+        return dict((f, _value(getattr(value, f))) for f in value.fields)
+    return value
+
+
+def _row(record, **extra):
+    row = dict((f, _value(getattr(record, f))) for f in record.fields)
+    row.update(extra)
+    return row
+
+
+def _ids(value):
+    return [i.strip() for i in value.split(',') if i.strip()]
+
+
+class _Kind:
+    def __init__(self, columns, units, rows):
+        self.columns = columns
+        self.units = units
+        self.rows = rows
+
+
+def _events_columns():
+    from eventor_records import Event
+    return Event.fields
+
+
+def _events_rows(e, unit, args):
+    from eventor_records import Event
+    for d in e.events(from_date=args.from_date, to_date=args.to_date, event_ids=args.event_ids,
+                      organisation_ids=args.organisation_ids, stream=True):
+        yield _row(Event.from_dict(d))
+
+
+def _entries_columns():
+    from eventor_records import Entry
+    return Entry.fields
+
+
+def _entries_rows(e, unit, args):
+    from eventor_records import Entry
+    event_ids = [unit] if unit != 'all' else None
+    for d in e.entries(organisation_ids=args.organisation_ids, event_ids=event_ids, from_event_date=args.from_date,
+                       to_event_date=args.to_date, stream=True):
+        yield _row(Entry.from_dict(d))
+
+
+def _results_columns():
+    from eventor_records import Result
+    return ('event_id',) + Result.fields
+
+
+def _results_rows(e, unit, args):
+    from eventor_records import results
+    for class_result in e.results_per_event(unit, include_split_times=args.split_times, stream=True):
+        for result in results(class_result):
+            yield _row(result, event_id=int(unit))
+
+
+def _members_columns():
+    from eventor_records import Person
+    return Person.fields
+
+
+def _members_rows(e, unit, args):
+    from eventor_records import Person
+    for d in e.members_in_organisation(unit, stream=True):
+        yield _row(Person.from_dict(d))
+
+
+def _activities_rows(e, unit, args):
+    from eventor_records import _text
+    for d in e.activities(unit, from_date=args.from_date, to_date=args.to_date, stream=True):
+        yield {'id': int(d['@id']),
+               'name': _text(d.get('Name')),
+               'url': d.get('@url'),
+               'registration_deadline': d.get('@registrationDeadline')}
+
+
+def _required(name):
+    def units(args):
+        ids = getattr(args, name)
+        if not ids:
+            raise SystemExit('--{0} krävs'.format(name.replace('_', '-')))
+        return ids
+    return units
+
+
+KINDS = {
+    'events': _Kind(_events_columns, lambda args: ['all'], _events_rows),
+    'entries': _Kind(_entries_columns, lambda args: args.event_ids or ['all'], _entries_rows),
+    'results': _Kind(_results_columns, _required('event_ids'), _results_rows),
+    'members': _Kind(_members_columns, _required('organisation_ids'), _members_rows),
+    'activities': _Kind(lambda: ACTIVITY_COLUMNS, _required('organisation_ids'), _activities_rows),
+}
+
+
+class _NdjsonWriter:
+    def __init__(self, f, columns):
+        self.f = f
+
+    def write(self, row):
+        self.f.write(json.dumps(row, ensure_ascii=False))
+        self.f.write('\n')
+
+    def close(self):
+        pass
+
+
+class _CsvWriter:
+    def __init__(self, f, columns):
+        self.writer = csv.DictWriter(f, columns)
+
+    def write_header(self):
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(dict((k, json.dumps(v, ensure_ascii=False) if isinstance(v, (list, dict)) else v)
+                                  for k, v in row.items()))
+
+    def close(self):
+        pass
+
+
+class _ParquetWriter:
+    """
+    Skriver rader till en Parquet-fil i radgrupper om PARQUET_BATCH_SIZE rader. Kolumntyperna bestäms av första
+    radgruppen; listor och dicts lagras som JSON-text.
+    """
+
+    def __init__(self, path, columns):
+        import pyarrow
+        import pyarrow.parquet
+        self._pyarrow = pyarrow
+        self._parquet = pyarrow.parquet
+        self.path = path
+        self.columns = columns
+        self._rows = []
+        self._writer = None
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= PARQUET_BATCH_SIZE:
+            self._flush()
+
+    def _schema(self):
+        types = {bool: self._pyarrow.bool_(), int: self._pyarrow.int64(), float: self._pyarrow.float64()}
+        fields = []
+        for column in self.columns:
+            value = next((row[column] for row in self._rows if row.get(column) is not None), None)
+            fields.append(self._pyarrow.field(column, types.get(type(value), self._pyarrow.string())))
+        return self._pyarrow.schema(fields)
+
+    def _flush(self):
+        if self._writer is None:
+            self._writer = self._parquet.ParquetWriter(self.path, self._schema())
+        strings = set(f.name for f in self._writer.schema if f.type == self._pyarrow.string())
+        columns = {}
+        for column in self.columns:
+            values = [row.get(column) for row in self._rows]
+            if column in strings:
+                values = [v if v is None or isinstance(v, str) else json.dumps(v, ensure_ascii=False)
+                          for v in values]
+            columns[column] = values
+        self._writer.write_table(self._pyarrow.table(columns, schema=self._writer.schema))
+        self._rows = []
+
+    def close(self):
+        if self._rows or self._writer is None:
+            self._flush()
+        self._writer.close()
+
+
+WRITERS = {'ndjson': _NdjsonWriter, 'csv': _CsvWriter}
+
+
+class _Progress:
+    """
+    Färdiga delar och utdatafilens storlek efter den senast tillagda delen, sparas som JSON i path.
+    """
+
+    def __init__(self, path, resume):
+        self.path = path
+        self.done = []
+        self.size = 0
+        if path and resume and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.done = data['done']
+            self.size = data['size']
+
+    def add(self, unit, size=0):
+        self.done.append(unit)
+        self.size = size
+        if not self.path:
+            return
+        tmp = '{path}.tmp'.format(path=self.path)
+        with open(tmp, 'w') as f:
+            json.dump({'done': self.done, 'size': self.size}, f)
+        os.replace(tmp, self.path)
+
+
+def _eventor(args):
+    from eventor_toolkit import Eventor
+    api_key = args.api_key or os.environ.get('EVENTOR_API_KEY')
+    if not api_key:
+        raise SystemExit('Ange API-nyckeln med --api-key eller EVENTOR_API_KEY')
+    return Eventor(api_key, api_url=args.api_url, pool_size=args.workers, parser='expat')
+
+
+def export(args):
+    """
+    Kör eventor export. Returnerar 0 om alla delar exporterades, annars 1.
+    """
+    kind = KINDS[args.kind]
+    columns = kind.columns()
+    e = _eventor(args)
+    to_stdout = args.output == '-'
+    progress = _Progress(None if to_stdout else '{0}.progress'.format(args.output), args.resume)
+    units = [u for u in kind.units(args) if u not in progress.done]
+    parts = '{0}.parts'.format(args.output) if not to_stdout else None
+    if args.format == 'parquet':
+        if to_stdout:
+            raise SystemExit('Parquet kan inte skrivas till stdout')
+        parts = args.output
+    if parts and not os.path.isdir(parts):
+        os.makedirs(parts)
+
+    def run(unit):
+        part = os.path.join(parts, '{0}.{1}'.format(unit, args.format))
+        tmp = '{0}.tmp'.format(part)
+        if args.format == 'parquet':
+            writer = _ParquetWriter(tmp, columns)
+            for row in kind.rows(e, unit, args):
+                writer.write(row)
+            writer.close()
+        else:
+            with open(tmp, 'w', newline='', encoding='utf-8') as f:
+                writer = WRITERS[args.format](f, columns)
+                for row in kind.rows(e, unit, args):
+                    writer.write(row)
+        os.replace(tmp, part)
+        return part
+
+    if to_stdout:
+        output = sys.stdout
+    elif args.format == 'parquet':
+        output = None
+    elif args.resume and progress.done and os.path.exists(args.output):
+        output = open(args.output, 'r+', newline='', encoding='utf-8')
+        output.truncate(progress.size)
+        output.seek(progress.size)
+    else:
+        output = open(args.output, 'w', newline='', encoding='utf-8')
+
+    failed = 0
+    if to_stdout:
+        parts = tempfile.mkdtemp()
+    try:
+        if output is not None and args.format == 'csv' and not progress.done:
+            _CsvWriter(output, columns).write_header()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = dict((executor.submit(run, unit), unit) for unit in units)
+            for future in as_completed(futures):
+                unit = futures[future]
+                try:
+                    part = future.result()
+                except Exception as error:
+                    failed += 1
+                    sys.stderr.write('{0}: {1}\n'.format(unit, error))
+                    continue
+                if output is not None:
+                    with open(part, encoding='utf-8', newline='') as f:
+                        shutil.copyfileobj(f, output)
+                    output.flush()
+                    os.remove(part)
+                progress.add(unit, output.tell() if output is not None and not to_stdout else 0)
+    finally:
+        e.close()
+        if output is not None and not to_stdout:
+            output.close()
+        if to_stdout:
+            shutil.rmtree(parts, ignore_errors=True)
+    if not failed:
+        if progress.path and os.path.exists(progress.path):
+            os.remove(progress.path)
+        if args.format != 'parquet' and not to_stdout:
+            shutil.rmtree(parts, ignore_errors=True)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='eventor', description='Export från Eventor.')
+    parser.add_argument('--api-key', help='API-nyckel, standard är miljövariabeln EVENTOR_API_KEY')
+    parser.add_argument('--api-url', help='bas-url för API:t')
+    commands = parser.add_subparsers(dest='command')
+    export_parser = commands.add_parser('export', help='exportera till NDJSON, CSV eller Parquet')
+    export_parser.add_argument('kind', choices=sorted(KINDS))
+    export_parser.add_argument('-o', '--output', default='-', help='utdatafil (katalog för parquet), - för stdout')
+    export_parser.add_argument('--format', choices=('ndjson', 'csv', 'parquet'), default='ndjson')
+    export_parser.add_argument('--event-ids', type=_ids, help='kommaseparerade tävlings-id:n')
+    export_parser.add_argument('--organisation-ids', type=_ids, help='kommaseparerade organisations-id:n')
+    export_parser.add_argument('--from-date', default='0000-01-01', help='åååå-mm-dd')
+    export_parser.add_argument('--to-date', default='9999-12-31', help='åååå-mm-dd')
+    export_parser.add_argument('--split-times', action='store_true', help='inkludera sträcktider (results)')
+    export_parser.add_argument('--workers', type=int, default=4, help='antal parallella hämtningar')
+    export_parser.add_argument('--resume', action='store_true', help='fortsätt en avbruten export')
+    args = parser.parse_args(argv)
+    if args.command != 'export':
+        parser.print_help()
+        return 2
+    return export(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
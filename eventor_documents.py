@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Spegling av tävlingsdokument (PM, kartor, startinformation) enligt Eventor.events_documents till en lokal katalog.
+
+    mirror = DocumentMirror(e, 'documents')
+    report = mirror.mirror(from_date='2018-05-01', to_date='2018-06-30')
+    path = mirror.path(document_id)
+
+Filerna lagras efter innehållets sha256 (objects/ab/abcdef...) så att samma fil för flera tävlingar bara sparas en
+gång, och manifest.json (en SyncStore) håller dokumentens metadata. Dokument vars metadata (url, modifyDate, size)
+är oförändrad sedan förra speglingen hämtas inte igen, övriga hämtas villkorligt (If-None-Match/If-Modified-Since).
+Nedladdningar skrivs i bitar till partial/. En avbruten nedladdning fortsätter med ett Range-anrop med If-Range om
+svaret hade en ETag eller Last-Modified, annars hämtas filen från början. Stämmer inte svarets Content-Range görs
+ett nytt anrop utan Range, och ger även det 206 misslyckas dokumentet med EventorError. Dokumenten hämtas med
+samma rate, limiter, omförsök och Metrics (endpoint 'document') som övriga anrop.
+"""
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from eventor_sync import SyncStore
+from eventor_toolkit import CallMetrics, EventorError, _as_list, _extract
+
+METADATA_ATTRIBUTES = ('@url', '@modifyDate', '@size')
+
+
+class MirrorReport:
+    """
+    downloaded  Id:n för dokument som hämtats.
+    unchanged  Id:n för dokument som inte ändrats sedan förra speglingen.
+    deduplicated  Id:n för hämtade dokument vars innehåll redan fanns lagrat.
+    failed  Dict från dokument-id till undantaget för misslyckade nedladdningar.
+    """
+
+    def __init__(self):
+        self.downloaded = []
+        self.unchanged = []
+        self.deduplicated = []
+        self.failed = {}
+
+    def __repr__(self):
+        return 'MirrorReport(downloaded={d}, unchanged={u}, deduplicated={dd}, failed={f})'.format(
+            d=len(self.downloaded), u=len(self.unchanged), dd=len(self.deduplicated), f=len(self.failed))
+
+
+class DocumentMirror:
+    """
+    eventor  Eventor-instans vars Transport (anslutningspool), rate, limiter och Metrics används även för
+        dokumenten.
+    directory  Katalog för filer och manifest.
+    workers  Högsta antal samtidiga nedladdningar.
+    """
+
+    def __init__(self, eventor, directory, workers=4, chunk_size=64 * 1024):
+        self.eventor = eventor
+        self.directory = directory
+        self.workers = workers
+        self.chunk_size = chunk_size
+        for name in ('objects', 'partial'):
+            path = os.path.join(directory, name)
+            if not os.path.isdir(path):
+                os.makedirs(path)
+        self.store = SyncStore(os.path.join(directory, 'manifest.json'))
+
+    def path(self, document_id):
+        """
+        Sökvägen till dokumentets fil, None om det inte speglats.
+        """
+        record = self.store.records('documents').get(str(document_id))
+        return self._object_path(record['sha256']) if record else None
+
+    def mirror(self, **kwargs):
+        """
+        Speglar dokumenten enligt Eventor.events_documents(**kwargs). Returnerar en MirrorReport.
+        """
+        documents = _as_list(_extract(self.eventor.events_documents(**kwargs), ('DocumentList', 'Document'),
+                                      default=None))
+        records = self.store.records('documents')
+        report = MirrorReport()
+        pending = []
+        for document in documents:
+            previous = records.get(document['@id'])
+            if previous is not None and self._unchanged(document, previous):
+                report.unchanged.append(document['@id'])
+            else:
+                pending.append((document, previous))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = dict((executor.submit(self._download, document, previous), document['@id'])
+                           for document, previous in pending)
+            for future in as_completed(futures):
+                document_id = futures[future]
+                try:
+                    record, status = future.result()
+                except Exception as error:
+                    report.failed[document_id] = error
+                    continue
+                getattr(report, status).append(document_id)
+                if status == 'deduplicated':
+                    report.downloaded.append(document_id)
+                records[document_id] = record
+                self.store.save()
+        self.store.save()
+        return report
+
+    def _object_path(self, content_hash):
+        return os.path.join(self.directory, 'objects', content_hash[:2], content_hash)
+
+    def _unchanged(self, document, previous):
+        if not os.path.exists(self._object_path(previous['sha256'])):
+            return False
+        if document.get('@modifyDate') is None and document.get('@size') is None:
+            return False
+        return all(document.get(name) == previous['metadata'].get(name) for name in METADATA_ATTRIBUTES)
+
+    def _download(self, document, previous):
+        result = self._transfer(document, previous, resume=True)
+        if result is None:
+            result = self._transfer(document, previous, resume=False)
+        return result
+
+    def _transfer(self, document, previous, resume):
+        """
+        Hämtar dokumentet, med resume=True som fortsättning på en avbruten nedladdning. Returnerar (record, status),
+        eller None om fortsättningen inte gick att använda och den delvisa filen tagits bort.
+        """
+        url = document['@url']
+        partial = os.path.join(self.directory, 'partial', document['@id'])
+        validator_path = '{0}.validator'.format(partial)
+        headers = {}
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        validator = None
+        if offset and os.path.exists(validator_path):
+            with open(validator_path) as f:
+                validator = f.read()
+        if validator and resume:
+            headers['Range'] = 'bytes={0}-'.format(offset)
+            headers['If-Range'] = validator
+        elif previous is not None and previous['metadata'].get('@url') == url and \
+                os.path.exists(self._object_path(previous['sha256'])):
+            if previous.get('etag'):
+                headers['If-None-Match'] = previous['etag']
+            if previous.get('last_modified'):
+                headers['If-Modified-Since'] = previous['last_modified']
+
+        eventor = self.eventor
+        call = CallMetrics('document', None) if eventor.metrics is not None else None
+        try:
+            r = eventor._get(url, stream=True, call=call, headers=headers)
+            try:
+                if r.status_code == 304:
+                    eventor._record(call)
+                    return dict(previous, metadata=_metadata(document)), 'unchanged'
+                if r.status_code not in (200, 206):
+                    raise EventorError(r.status_code, url)
+                if r.status_code == 206 and not ('Range' in headers and _range_start(r) == offset):
+                    if 'Range' not in headers:
+                        raise EventorError(r.status_code, url, r.headers.get('Content-Range', ''))
+                    _remove(partial, validator_path)
+                    eventor._record(call)
+                    return None
+                etag = r.headers.get('ETag')
+                last_modified = r.headers.get('Last-Modified')
+                digest = hashlib.sha256()
+                if r.status_code == 206:
+                    with open(partial, 'rb') as f:
+                        for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                            digest.update(chunk)
+                    mode = 'ab'
+                else:
+                    mode = 'wb'
+                    if etag or last_modified:
+                        with open(validator_path, 'w') as f:
+                            f.write(etag or last_modified)
+                    elif os.path.exists(validator_path):
+                        os.remove(validator_path)
+                received = 0
+                with open(partial, mode) as f:
+                    for chunk in r.iter_content(chunk_size=self.chunk_size):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        received += len(chunk)
+            finally:
+                r.close()
+        except Exception as error:
+            eventor._record(call, error)
+            raise
+        if call is not None:
+            call.bytes = received
+        eventor._record(call)
+
+        content_hash = digest.hexdigest()
+        size = os.path.getsize(partial)
+        target = self._object_path(content_hash)
+        status = 'downloaded'
+        if os.path.exists(target):
+            os.remove(partial)
+            status = 'deduplicated'
+        else:
+            if not os.path.isdir(os.path.dirname(target)):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(partial, target)
+        if os.path.exists(validator_path):
+            os.remove(validator_path)
+        return {'metadata': _metadata(document), 'sha256': content_hash, 'size': size, 'etag': etag,
+                'last_modified': last_modified}, status
+
+
+def _range_start(r):
+    """
+    Första byten enligt svarets Content-Range ('bytes 1000-1999/2000'), None om den saknas.
+    """
+    content_range = r.headers.get('Content-Range', '')
+    if not content_range.startswith('bytes ') or '-' not in content_range:
+        return None
+    try:
+        return int(content_range[len('bytes '):].split('-', 1)[0])
+    except ValueError:
+        return None
+
+
+def _remove(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _metadata(document):
+    return dict((name, value) for name, value in document.items() if name.startswith('@'))
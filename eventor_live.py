@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Bevakning av resultat för tävlingar som pågår (EventStatusId 8, 'live').
+
+Resultatlistorna hämtas med ett intervall som kortas när nya resultat kommer in och förlängs när det är lugnt.
+Oförändrade svar hoppas över utan tolkning (304 Not Modified om Eventor stöder villkorliga anrop, annars samma
+innehållshash) och endast klasser vars innehåll ändrats jämförs löpare för löpare. Varje ändrad löpare blir en
+ResultChange. En tävling vars hämtning misslyckas hämtas igen med förlängt intervall utan att övriga tävlingar
+påverkas:
+
+    live = LiveResults(e, LiveResults.live_event_ids(e))
+    for change in live.changes():
+        screen.update(change.event_id, change.event_class_id, change.new)
+"""
+import hashlib
+import threading
+import time
+from datetime import date
+
+from eventor_records import Result, _first, _get, _int, _items
+from eventor_toolkit import _as_list
+
+LIVE_STATUS_ID = '8'
+
+
+class ResultChange:
+    """
+    En löpare vars resultatrad ändrats.
+
+    event_id  Tävlingens id.
+    event_class_id  Klassens id.
+    key  Löparens person-id (eller ('row', position) för löpare utan id).
+    old  Föregående Result, None för en ny löpare.
+    new  Nytt Result, None om löparen försvunnit ur listan.
+    """
+
+    def __init__(self, event_id, event_class_id, key, old, new):
+        self.event_id = event_id
+        self.event_class_id = event_class_id
+        self.key = key
+        self.old = old
+        self.new = new
+
+    def __repr__(self):
+        return 'ResultChange(event_id={0!r}, event_class_id={1!r}, key={2!r}, old={3!r}, new={4!r})'.format(
+            self.event_id, self.event_class_id, self.key, self.old, self.new)
+
+
+class _LiveEvent:
+    def __init__(self, event_id, interval):
+        self.event_id = event_id
+        self.interval = interval
+        self.due = 0.0
+        self.etag = None
+        self.last_modified = None
+        self.body_hash = None
+        self.classes = {}
+        self.rows = {}
+
+
+def _class_id(class_result):
+    return _first(_int(_get(class_result, 'EventClassId')), _int(_get(class_result, 'EventClass', 'EventClassId')))
+
+
+def _rows(class_result, event_class_id):
+    rows = {}
+    for index, person_result in enumerate(_as_list(class_result.get('PersonResult'))):
+        result = Result.from_dict(person_result, event_class_id)
+        rows[result.person_id if result.person_id is not None else ('row', index)] = result
+    return rows
+
+
+class LiveResults:
+    """
+    Bevakar resultatlistorna (Eventor.results_per_event) för event_ids.
+
+    min_interval  Kortaste tid i sekunder mellan två hämtningar av samma tävling, används så länge resultat kommer in.
+    max_interval  Längsta tid i sekunder mellan två hämtningar.
+    backoff  Faktor som intervallet förlängs med efter varje hämtning utan ändringar eller som misslyckats.
+    on_error  Funktion (event_id, undantag) som anropas när hämtningen av en tävling misslyckas.
+
+    Räknarna requests, not_modified (304), unchanged (samma innehållshash) och parsed (tolkade svar) visar hur
+    många hämtningar som kunnat hoppas över. failed är en dict från tävlingens id till undantaget för tävlingar
+    vars senaste hämtning misslyckades.
+    """
+
+    def __init__(self, eventor, event_ids, include_split_times=False, min_interval=5.0, max_interval=60.0,
+                 backoff=1.5, on_error=None):
+        self.eventor = eventor
+        self.on_error = on_error
+        self.include_split_times = include_split_times
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.requests = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.parsed = 0
+        self.failed = {}
+        self._events = [_LiveEvent(event_id, min_interval) for event_id in event_ids]
+
+    @staticmethod
+    def live_event_ids(eventor, day=None, **kwargs):
+        """
+        Id:n för tävlingar med status 'live' på day (standard i dag). Övriga nyckelordsargument skickas vidare till
+        Eventor.events.
+        """
+        day = (day or date.today()).isoformat()
+        events = _items(eventor.events(from_date=day, to_date=day, **kwargs), ('EventList', 'Event'))
+        return [event['EventId'] for event in events if event.get('EventStatusId') == LIVE_STATUS_ID]
+
+    def poll(self, now=None):
+        """
+        Hämtar de tävlingar vars intervall har löpt ut. Returnerar en lista med ResultChange.
+        """
+        now = time.monotonic() if now is None else now
+        changes = []
+        for event in self._events:
+            if event.due > now:
+                continue
+            try:
+                found = self._poll_event(event)
+            except Exception as error:
+                self.failed[event.event_id] = error
+                if self.on_error is not None:
+                    self.on_error(event.event_id, error)
+                event.interval = min(self.max_interval, event.interval * self.backoff)
+                event.due = now + event.interval
+                continue
+            self.failed.pop(event.event_id, None)
+            if found:
+                event.interval = self.min_interval
+            else:
+                event.interval = min(self.max_interval, event.interval * self.backoff)
+            event.due = now + event.interval
+            changes.extend(found)
+        return changes
+
+    def changes(self, stop=None):
+        """
+        Generator som hämtar tävlingarna allteftersom deras intervall löper ut och returnerar en ResultChange i
+        taget. Avslutas när stop (en threading.Event) sätts.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            for change in self.poll():
+                yield change
+            delay = min(event.due for event in self._events) - time.monotonic() if self._events else None
+            if delay is None or delay > 0:
+                stop.wait(delay)
+
+    def run(self, callback, stop=None):
+        """
+        Anropar callback med varje ResultChange tills stop (en threading.Event) sätts.
+        """
+        for change in self.changes(stop):
+            callback(change)
+
+    def _poll_event(self, event):
+        q = {'eventId': event.event_id,
+             'includeSplitTimes': 'true' if self.include_split_times else 'false'}
+        self.requests += 1
+        r = self.eventor.fetch_if_modified('results/event', q, event.etag, event.last_modified)
+        if not r.modified:
+            self.not_modified += 1
+            return []
+        event.etag = r.etag
+        event.last_modified = r.last_modified
+        body_hash = hashlib.sha256(r.body).hexdigest()
+        if body_hash == event.body_hash:
+            self.unchanged += 1
+            return []
+        event.body_hash = body_hash
+        self.parsed += 1
+
+        changes = []
+        classes = {}
+        for class_result in _items(self.eventor.parser(r.body), ('ResultList', 'ClassResult')):
+            event_class_id = _class_id(class_result)
+            classes[event_class_id] = class_result
+            if event.classes.get(event_class_id) == class_result:
+                continue
+            old_rows = event.rows.get(event_class_id, {})
+            new_rows = event.rows[event_class_id] = _rows(class_result, event_class_id)
+            changes.extend(self._diff(event.event_id, event_class_id, old_rows, new_rows))
+        for event_class_id in [c for c in event.classes if c not in classes]:
+            changes.extend(self._diff(event.event_id, event_class_id, event.rows.pop(event_class_id, {}), {}))
+        event.classes = classes
+        return changes
+
+    @staticmethod
+    def _diff(event_id, event_class_id, old_rows, new_rows):
+        changes = []
+        for key, new in new_rows.items():
+            old = old_rows.get(key)
+            if old != new:
+                changes.append(ResultChange(event_id, event_class_id, key, old, new))
+        for key, old in old_rows.items():
+            if key not in new_rows:
+                changes.append(ResultChange(event_id, event_class_id, key, old, None))
+        return changes
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Index över Eventors organisationer (förbund, distrikt och klubbar) byggt från ett enda anrop till
+Eventor.organisations(include_properties=True).
+
+    index = OrganisationIndex.from_eventor(e)
+    club = index[646]
+    district = index.district_of(646)
+    clubs = index.clubs_in(district.id)
+    matches = index.search(u'ok s')
+
+Indexet kan sparas som en kompakt ögonblicksbild (snapshot) som andra processer laddar med from_snapshot i stället
+för att hämta organisationerna från Eventor igen.
+"""
+import marshal
+from bisect import bisect_left
+from datetime import datetime
+
+from eventor_records import Organisation, organisations
+
+FEDERATION = 1
+DISTRICT = 2
+CLUB = 3
+
+SNAPSHOT_VERSION = 1
+
+
+def _key(name):
+    return name.casefold()
+
+
+class OrganisationIndex:
+    """
+    Uppslag per id, prefixsökning på namn och kortnamn samt förälder/barn-träd (förbund → distrikt → klubb) för en
+    mängd Organisation-poster.
+    """
+
+    def __init__(self, records):
+        self._by_id = {}
+        self._children = {}
+        names = set()
+        for record in records:
+            self._by_id[record.id] = record
+            for name in (record.name, record.short_name):
+                if name:
+                    names.add((_key(name), record.id))
+        for record in self._by_id.values():
+            if record.parent_id is not None:
+                self._children.setdefault(record.parent_id, []).append(record.id)
+        for children in self._children.values():
+            children.sort()
+        self._names = sorted(names)
+
+    @classmethod
+    def from_eventor(cls, eventor):
+        return cls(organisations(eventor.organisations(include_properties=True)))
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def __contains__(self, organisation_id):
+        return organisation_id in self._by_id
+
+    def __getitem__(self, organisation_id):
+        return self._by_id[organisation_id]
+
+    def get(self, organisation_id, default=None):
+        return self._by_id.get(organisation_id, default)
+
+    def search(self, prefix):
+        """
+        Organisationer vars namn eller kortnamn börjar med prefix (skiftlägesokänsligt), sorterade efter namn.
+        """
+        prefix = _key(prefix)
+        found = []
+        seen = set()
+        for i in range(bisect_left(self._names, (prefix,)), len(self._names)):
+            name, organisation_id = self._names[i]
+            if not name.startswith(prefix):
+                break
+            if organisation_id not in seen:
+                seen.add(organisation_id)
+                found.append(self._by_id[organisation_id])
+        return found
+
+    def parent(self, organisation_id):
+        parent_id = self._by_id[organisation_id].parent_id
+        return self._by_id.get(parent_id) if parent_id is not None else None
+
+    def children(self, organisation_id):
+        return [self._by_id[child_id] for child_id in self._children.get(organisation_id, ())]
+
+    def ancestors(self, organisation_id):
+        """
+        Organisationens föräldrar från närmaste och uppåt.
+        """
+        found = []
+        seen = set([organisation_id])
+        record = self.parent(organisation_id)
+        while record is not None and record.id not in seen:
+            seen.add(record.id)
+            found.append(record)
+            record = self.parent(record.id)
+        return found
+
+    def descendants(self, organisation_id, type_id=None):
+        """
+        Alla organisationer under organisation_id i trädet, eventuellt endast de med type_id.
+        """
+        found = []
+        stack = list(reversed(self._children.get(organisation_id, ())))
+        while stack:
+            record = self._by_id[stack.pop()]
+            if type_id is None or record.type_id == type_id:
+                found.append(record)
+            stack.extend(reversed(self._children.get(record.id, ())))
+        return found
+
+    def district_of(self, organisation_id):
+        """
+        Distriktet som organisationen tillhör, None om den inte tillhör något.
+        """
+        for record in [self._by_id[organisation_id]] + self.ancestors(organisation_id):
+            if record.type_id == DISTRICT:
+                return record
+        return None
+
+    def clubs_in(self, organisation_id):
+        return self.descendants(organisation_id, type_id=CLUB)
+
+    def snapshot(self):
+        """
+        Indexet som bytes för from_snapshot.
+        """
+        rows = [(r.id, r.name, r.short_name, r.type_id, r.parent_id,
+                 r.modified.isoformat() if r.modified is not None else None) for r in self._by_id.values()]
+        return marshal.dumps((SNAPSHOT_VERSION, rows, self._names, self._children))
+
+    @classmethod
+    def from_snapshot(cls, data):
+        version, rows, names, children = marshal.loads(data)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError('Okänd version av ögonblicksbilden: {version}'.format(version=version))
+        index = cls.__new__(cls)
+        index._by_id = {}
+        for organisation_id, name, short_name, type_id, parent_id, modified in rows:
+            index._by_id[organisation_id] = Organisation(
+                id=organisation_id, name=name, short_name=short_name, type_id=type_id, parent_id=parent_id,
+                modified=datetime.strptime(modified, '%Y-%m-%dT%H:%M:%S') if modified else None)
+        index._names = names
+        index._children = children
+        return index
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.snapshot())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_snapshot(f.read())
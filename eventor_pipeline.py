@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Hämtning av en hel säsong i steg: events följt av klasser, anmälningsavgifter, anmälningar, startlistor och
+resultat per tävling.
+
+    with Warehouse('season.db') as w:
+        pipeline = SeasonPipeline(e, 'season.checkpoint.json', warehouse_sink(w), workers=8)
+        report = pipeline.run(from_date='2018-01-01', to_date='2018-12-31', organisation_ids=[646])
+
+Stegen för en tävling körs så snart de steg de beror av är klara för just den tävlingen, oberoende av övriga
+tävlingar, och högst workers anrop pågår samtidigt. Svaren lämnas till sink(stage, event_id, doc) i den tråd som
+anropade run. Färdiga steg sparas i en SyncStore (checkpoint) så att en avbruten körning fortsätter där den
+slutade; om tävlingens status eller ändringstidpunkt ändrats sedan dess körs dess steg om. Tävlingar med status i
+skip_status_ids (standard 10, 'inställt') hoppas över.
+"""
+import heapq
+import itertools
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from eventor_records import _items
+from eventor_sync import SyncStore, _modify_date
+
+CANCELLED_STATUS_ID = 10
+CHECKPOINT_KIND = 'pipeline'
+
+
+class Stage:
+    """
+    name  Stegets namn, används i checkpoint och som första argument till sink.
+    fetch  Funktion (eventor, event_id) som hämtar stegets svar.
+    requires  Namnen på de steg som måste vara klara för tävlingen innan steget körs.
+    """
+
+    def __init__(self, name, fetch, requires=()):
+        self.name = name
+        self.fetch = fetch
+        self.requires = tuple(requires)
+
+    def __repr__(self):
+        return 'Stage({0!r}, requires={1!r})'.format(self.name, self.requires)
+
+
+def default_stages(include_split_times=False):
+    """
+    Stegen event_classes och event_entryfees → entries → start_times → results.
+    """
+    return (Stage('event_classes', lambda e, event_id: e.event_classes(event_id)),
+            Stage('event_entryfees', lambda e, event_id: e.event_entryfees(event_id)),
+            Stage('entries', lambda e, event_id: e.entries(event_ids=[event_id]),
+                  requires=('event_classes', 'event_entryfees')),
+            Stage('start_times', lambda e, event_id: e.start_times_per_event(event_id), requires=('entries',)),
+            Stage('results', lambda e, event_id: e.results_per_event(event_id,
+                                                                     include_split_times=include_split_times),
+                  requires=('start_times',)))
+
+
+def warehouse_sink(warehouse):
+    """
+    En sink som lägger in svaren i en eventor_warehouse.Warehouse. Anmälningsavgifter lagras inte.
+    """
+    loaders = {'events': lambda event_id, doc: warehouse.load_events(doc),
+               'event_classes': lambda event_id, doc: warehouse.load_event_classes(doc, event_id),
+               'entries': lambda event_id, doc: warehouse.load_entries(doc),
+               'start_times': lambda event_id, doc: warehouse.load_starts(doc, event_id),
+               'results': lambda event_id, doc: warehouse.load_results(doc, event_id)}
+
+    def sink(stage, event_id, doc):
+        if stage in loaders:
+            loaders[stage](event_id, doc)
+    return sink
+
+
+class PipelineReport:
+    """
+    events  Antal tävlingar som events returnerade.
+    completed  (event_id, stage) för steg som kördes klart.
+    resumed  (event_id, stage) för steg som redan var klara enligt checkpoint.
+    skipped  Id:n för tävlingar som hoppades över på grund av sin status.
+    failed  Dict från (event_id, stage) till undantaget. Steg som beror av ett misslyckat steg körs inte.
+    """
+
+    def __init__(self):
+        self.events = 0
+        self.completed = []
+        self.resumed = []
+        self.skipped = []
+        self.failed = {}
+
+    def __repr__(self):
+        return 'PipelineReport(events={e}, completed={c}, resumed={r}, skipped={s}, failed={f})'.format(
+            e=self.events, c=len(self.completed), r=len(self.resumed), s=len(self.skipped), f=len(self.failed))
+
+
+class SeasonPipeline:
+    """
+    eventor  Eventor-instans för anropen. Dess pool_size bör vara minst workers.
+    checkpoint  Sökväg till checkpoint-filen eller en SyncStore.
+    sink  Funktion (stage, event_id, doc) som tar emot svaren, event_id är None för steget events.
+    workers  Högsta antal samtidiga anrop.
+    stages  Stegen per tävling, standard default_stages().
+    skip_status_ids  Tävlingsstatusar (EVENT_STATUS_ID_MAPPING) för vilka inga steg körs.
+    checkpoint_interval  Minsta tid i sekunder mellan två skrivningar av checkpoint.
+    """
+
+    def __init__(self, eventor, checkpoint, sink=None, workers=8, stages=None,
+                 skip_status_ids=(CANCELLED_STATUS_ID,), checkpoint_interval=1.0):
+        self.eventor = eventor
+        self.store = SyncStore(checkpoint) if isinstance(checkpoint, str) else checkpoint
+        self.sink = sink or (lambda stage, event_id, doc: None)
+        self.workers = workers
+        self.stages = tuple(stages or default_stages())
+        self.skip_status_ids = set(int(s) for s in skip_status_ids)
+        self.checkpoint_interval = checkpoint_interval
+        self._by_name = dict((stage.name, stage) for stage in self.stages)
+        self._order = itertools.count()
+        self._depth = {}
+        for stage in self.stages:
+            self._stage_depth(stage.name, ())
+
+    def _stage_depth(self, name, path):
+        if name in path:
+            raise ValueError('Stegen beror cirkulärt av varandra: {0}'.format(' → '.join(path + (name,))))
+        if name not in self._depth:
+            requires = self._by_name[name].requires
+            self._depth[name] = 1 + max([self._stage_depth(r, path + (name,)) for r in requires] or [-1])
+        return self._depth[name]
+
+    def run(self, **kwargs):
+        """
+        Hämtar tävlingarna enligt Eventor.events(**kwargs) och kör stegen för var och en. Returnerar en
+        PipelineReport.
+        """
+        report = PipelineReport()
+        doc = self.eventor.events(**kwargs)
+        self.sink('events', None, doc)
+        records = self.store.records(CHECKPOINT_KIND)
+
+        ready = []
+        waiting = {}
+        for event in _items(doc, ('EventList', 'Event')):
+            report.events += 1
+            event_id = event['EventId']
+            status_id = int(event.get('EventStatusId') or 0)
+            if status_id in self.skip_status_ids:
+                report.skipped.append(event_id)
+                continue
+            version = [status_id, _modify_date(event)]
+            record = records.get(event_id)
+            if record is None or record['version'] != version:
+                record = records[event_id] = {'version': version, 'done': []}
+            done = set(record['done'])
+            report.resumed.extend((event_id, name) for name in record['done'])
+            for stage in self.stages:
+                if stage.name in done:
+                    continue
+                missing = set(stage.requires) - done
+                if missing:
+                    waiting[(event_id, stage.name)] = missing
+                else:
+                    self._push(ready, event_id, stage)
+
+        dependents = {}
+        for (event_id, name), missing in waiting.items():
+            for required in missing:
+                dependents.setdefault((event_id, required), []).append(name)
+
+        saved = time.monotonic()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while ready or running:
+                    while ready and len(running) < self.workers:
+                        depth, order, event_id, stage = heapq.heappop(ready)
+                        running[executor.submit(stage.fetch, self.eventor, event_id)] = (event_id, stage)
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        event_id, stage = running.pop(future)
+                        try:
+                            self.sink(stage.name, event_id, future.result())
+                        except Exception as error:
+                            report.failed[(event_id, stage.name)] = error
+                            continue
+                        report.completed.append((event_id, stage.name))
+                        records[event_id]['done'].append(stage.name)
+                        for name in dependents.pop((event_id, stage.name), ()):
+                            missing = waiting[(event_id, name)]
+                            missing.discard(stage.name)
+                            if not missing:
+                                del waiting[(event_id, name)]
+                                self._push(ready, event_id, self._by_name[name])
+                    if time.monotonic() - saved >= self.checkpoint_interval:
+                        self.store.save()
+                        saved = time.monotonic()
+            finally:
+                for future in running:
+                    future.cancel()
+                self.store.save()
+        return report
+
+    def _push(self, ready, event_id, stage):
+        heapq.heappush(ready, (-self._depth[stage.name], next(self._order), event_id, stage))
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Anrop för många organisationer med en API-nyckel per organisation, t ex ett distrikt med nycklar för sina klubbar.
+
+Funktionerna members_in_organisation, competitors, activities, start_times_per_organisation och
+results_per_organisation måste anropas med den egna organisationens id och dess API-nyckel. ClientPool tar reda på
+varje nyckels organisation med organisation_from_api_key, anropar funktionen för alla organisationer parallellt med
+respektive nyckel och slår ihop svaren:
+
+    with ClientPool(api_keys, rate=5) as pool:
+        members = pool.collect('members_in_organisation')
+        results = pool.collect('results_per_organisation', event_id=17395)
+        for organisation_id, error in members.failed.items():
+            ...
+
+Alla klienter delar en Transport (anslutningspool) och anropstakten begränsas per nyckel med TokenBucket.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from eventor_records import organisations
+from eventor_toolkit import BatchResult, Eventor, Transport, _as_list, _merge_documents
+
+ORGANISATION_ARGUMENTS = {'members_in_organisation': 'organisation_id',
+                          'competitors': 'organisation_id',
+                          'activities': 'organisation_id',
+                          'activity': 'organisation_id',
+                          'start_times_per_organisation': 'organisation_ids',
+                          'results_per_organisation': 'organisation_id'}
+DOCUMENT_METHODS = ('start_times_per_organisation', 'results_per_organisation')
+
+
+def _call(eventor, method, organisation_id, kwargs):
+    if callable(method):
+        return method(eventor, organisation_id, **kwargs)
+    argument = ORGANISATION_ARGUMENTS[method]
+    value = [organisation_id] if argument.endswith('_ids') else organisation_id
+    return getattr(eventor, method)(**dict(kwargs, **{argument: value}))
+
+
+class PoolResult:
+    """
+    value  Svaren för alla organisationer sammanslagna: dokumenten från DOCUMENT_METHODS (StartList, ResultList)
+        slås ihop till ett dokument med en ClassStart/ClassResult per klass och övriga svar läggs efter varandra i en
+        lista.
+    by_organisation  Dict från organisations-id till organisationens svar.
+    failed  Dict från organisations-id till undantaget för misslyckade anrop.
+    """
+
+    def __init__(self, value, by_organisation, failed):
+        self.value = value
+        self.by_organisation = by_organisation
+        self.failed = failed
+
+    def __repr__(self):
+        return 'PoolResult(organisations={o}, failed={f})'.format(o=len(self.by_organisation), f=len(self.failed))
+
+
+class ClientPool:
+    """
+    api_keys  API-nycklarna, en per organisation.
+    api_url  Bas-url för API:t, standard är Eventor.EVENTOR_API_URL.
+    pool_size  Storlek på anslutningspoolen som alla klienter delar.
+    workers  Högsta antal samtidiga anrop för alla nycklar tillsammans, standard pool_size.
+    rate  Högsta antal anrop per sekund och API-nyckel, med tillfälliga toppar på upp till burst anrop. Utelämna för
+        obegränsat.
+
+    Övriga nyckelordsargument (cache, metrics, parser osv) skickas vidare till varje Eventor.
+    """
+
+    def __init__(self, api_keys, api_url=None, pool_size=20, workers=None, rate=None, burst=None, timeout=(5, 60),
+                 retries=3, **kwargs):
+        self.transport = Transport(pool_size=pool_size, timeout=timeout, retries=retries)
+        self.workers = workers or pool_size
+        self.clients = [Eventor(api_key, api_url=api_url, transport=self.transport, pool_size=pool_size,
+                                timeout=timeout, retries=retries, rate=rate, burst=burst, **kwargs)
+                        for api_key in api_keys]
+        self.unresolved = {}
+        self._organisations = None
+        self._by_organisation = None
+        self._lock = threading.Lock()
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _resolve(self):
+        with self._lock:
+            if self._by_organisation is not None:
+                return
+            by_organisation = {}
+            found = {}
+            self.unresolved = {}
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(self.clients)) or 1) as executor:
+                futures = dict((executor.submit(client.organisation_from_api_key), index)
+                               for index, client in enumerate(self.clients))
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        found[index] = organisations(future.result())[0]
+                    except Exception as error:
+                        self.unresolved[index] = error
+            for index in sorted(found):
+                by_organisation.setdefault(found[index].id, self.clients[index])
+            self._organisations = dict((record.id, record) for index, record in sorted(found.items()))
+            self._by_organisation = by_organisation
+
+    @property
+    def organisations(self):
+        """
+        Dict från organisations-id till Organisation för nycklarnas organisationer. Nycklar som inte kunde
+        kopplas till en organisation finns i unresolved (index i api_keys till undantaget).
+        """
+        self._resolve()
+        return self._organisations
+
+    def client(self, organisation_id):
+        """
+        Eventor-instansen med organisationens API-nyckel.
+        """
+        self._resolve()
+        return self._by_organisation[int(organisation_id)]
+
+    def map(self, method, organisation_ids=None, ordered=True, **kwargs):
+        """
+        Anropar method för varje organisation parallellt, med organisationens nyckel.
+
+        method  Namnet på en funktion i ORGANISATION_ARGUMENTS eller en funktion (eventor, organisation_id,
+            **kwargs).
+        organisation_ids  Organisationerna, standard alla nycklarnas organisationer.
+        ordered  Sätt till False för att få resultaten i den ordning de blir klara.
+        Övriga nyckelordsargument skickas vidare till method.
+
+        Generator med ett BatchResult per organisation där args är organisations-id:t.
+        """
+        if not callable(method) and method not in ORGANISATION_ARGUMENTS:
+            raise ValueError('{0} anropas inte per organisation'.format(method))
+        self._resolve()
+        organisation_ids = [int(i) for i in organisation_ids] if organisation_ids else sorted(self._by_organisation)
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(organisation_ids))))
+
+        def run(index, organisation_id):
+            try:
+                return BatchResult(index, organisation_id,
+                                   value=_call(self.client(organisation_id), method, organisation_id, kwargs))
+            except Exception as error:
+                return BatchResult(index, organisation_id, error=error)
+
+        futures = [executor.submit(run, index, organisation_id)
+                   for index, organisation_id in enumerate(organisation_ids)]
+        try:
+            for future in (futures if ordered else as_completed(futures)):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def collect(self, method, organisation_ids=None, **kwargs):
+        """
+        Som map men returnerar en PoolResult med svaren sammanslagna.
+        """
+        by_organisation = {}
+        failed = {}
+        for result in self.map(method, organisation_ids, **kwargs):
+            if result.ok:
+                by_organisation[result.args] = result.value
+            else:
+                failed[result.args] = result.error
+        values = [by_organisation[i] for i in sorted(by_organisation)]
+        if method in DOCUMENT_METHODS:
+            value = _merge_documents(values) if values else None
+        else:
+            value = [item for v in values for item in _as_list(v)]
+        return PoolResult(value, by_organisation, failed)
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""
+Typade, kompakta poster för svaren från Eventor.
+
+Posterna använder __slots__ och lagrar id:n som int, tider som datetime och tidsangivelser som sekunder. Element
+som kan förekomma en eller flera gånger blir alltid tupler. Med keep_raw=True sparas även det ursprungliga
+elementet i komprimerad form och kan hämtas med raw.
+
+    e = Eventor(api_key)
+    for result in results(e.results_per_event(event_id, include_split_times=True)):
+        print(result.person_id, result.time, [s.time for s in result.splits])
+"""
+import marshal
+import sys
+from datetime import datetime
+
+from eventor_toolkit import _as_list, _extract
+
+
+def _get(d, *path):
+    for key in path:
+        if not isinstance(d, dict):
+            return None
+        d = d.get(key)
+    return d
+
+
+def _text(value):
+    if isinstance(value, dict):
+        return value.get('#text')
+    return value
+
+
+def _int(value):
+    value = _text(value)
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+def _intern(value):
+    value = _text(value)
+    if value is None:
+        return None
+    return sys.intern(value)
+
+
+def _datetime(value):
+    """
+    Tolkar {'Date': 'åååå-mm-dd', 'Clock': 'hh:mm:ss'} eller en ISO 8601-sträng (IOF XML 3.0).
+    """
+    if isinstance(value, dict) and 'Date' in value:
+        date = value.get('Date') or ''
+        clock = value.get('Clock') or '00:00:00'
+    else:
+        value = _text(value)
+        if not value:
+            return None
+        date, _, clock = value.partition('T')
+        clock = clock[:8] or '00:00:00'
+    if not date:
+        return None
+    return datetime(int(date[0:4]), int(date[5:7]), int(date[8:10]),
+                    int(clock[0:2]), int(clock[3:5]), int(clock[6:8] or 0))
+
+
+def _seconds(value):
+    """
+    Tolkar en tid som 'mm:ss', 'h:mm:ss' eller ett antal sekunder (IOF XML 3.0).
+    """
+    value = _text(value)
+    if not value:
+        return None
+    seconds = 0
+    for part in value.split(':'):
+        seconds = seconds * 60 + int(float(part))
+    return seconds
+
+
+def _first(*values):
+    for value in values:
+        if value is not None:
+            return value
+    return None
+
+
+def _organisation_id(d):
+    return _first(_int(_get(d, 'OrganisationId')), _int(_get(d, 'Organisation', 'OrganisationId')))
+
+
+def _organiser_ids(organiser):
+    """
+    Alla OrganisationId i en Organiser; en tävling med flera arrangörer har flera i samma Organiser.
+    """
+    organisations = _as_list(_get(organiser, 'Organisation'))
+    return ([_int(i) for i in _as_list(_get(organiser, 'OrganisationId'))] +
+            [_int(i) for o in organisations for i in _as_list(_get(o, 'OrganisationId'))])
+
+
+def _races(d, name, race_name):
+    """
+    (event_race_id, element) för varje lopp i en PersonResult eller PersonStart. Elementet name (Result/Start)
+    finns antingen direkt i d, en gång per lopp i IOF XML 3.0 med loppets nummer i raceNumber, eller inuti ett
+    race_name (RaceResult/RaceStart) per lopp i flerdagarstävlingar.
+    """
+    races = [(_int(_get(item, '@raceNumber')), item or {}) for item in _as_list(d.get(name))]
+    for race in _as_list(d.get(race_name)):
+        races.append((_int(_get(race, 'EventRaceId')), _get(race, name) or {}))
+    return races or [(None, {})]
+
+
+class Record(object):
+    __slots__ = ('_raw',)
+    fields = ()
+
+    def __init__(self, raw=None, **kwargs):
+        self._raw = marshal.dumps(raw) if raw is not None else None
+        for name in self.fields:
+            setattr(self, name, kwargs.get(name))
+
+    @property
+    def raw(self):
+        """
+        Det ursprungliga elementet i xmltodict-struktur, None om posten skapades utan keep_raw.
+        """
+        if self._raw is None:
+            return None
+        return marshal.loads(self._raw)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, f) == getattr(other, f) for f in self.fields)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{cls}({fields})'.format(cls=type(self).__name__, fields=', '.join(
+            '{0}={1!r}'.format(f, getattr(self, f)) for f in self.fields))
+
+
+class SplitTime(Record):
+    fields = ('sequence', 'control_code', 'time')
+    __slots__ = fields
+
+    @classmethod
+    def from_dict(cls, d, keep_raw=False):
+        return cls(raw=d if keep_raw else None,
+                   sequence=_int(_get(d, '@sequence')),
+                   control_code=_intern(_get(d, 'ControlCode')),
+                   time=_seconds(_get(d, 'Time')))
+
+
+class Event(Record):
+    fields = ('id', 'name', 'classification_id', 'status_id', 'discipline_id', 'form', 'start', 'finish',
+              'organiser_ids', 'modified')
+    __slots__ = fields
+
+    @classmethod
+    def from_dict(cls, d, keep_raw=False):
+        return cls(raw=d if keep_raw else None,
+                   id=_int(d.get('EventId')),
+                   name=_text(d.get('Name')),
+                   classification_id=_int(d.get('EventClassificationId')),
+                   status_id=_int(d.get('EventStatusId')),
+                   discipline_id=_int(d.get('DisciplineId')),
+                   form=_intern(d.get('@eventForm')),
+                   start=_datetime(d.get('StartDate')),
+                   finish=_datetime(d.get('FinishDate')),
+                   organiser_ids=tuple(i for o in _as_list(_get(d, 'Organiser')) for i in _organiser_ids(o)),
+                   modified=_datetime(d.get('ModifyDate')))
+
+
+class EventClass(Record):
+    fields = ('id', 'event_id', 'name', 'short_name', 'sex', 'low_age', 'high_age')
+    __slots__ = fields
+
+    @classmethod
+    def from_dict(cls, d, keep_raw=False):
+        return cls(raw=d if keep_raw else None,
+                   id=_int(d.get('EventClassId')),
+                   event_id=_int(d.get('EventId')),
+                   name=_text(d.get('Name')),
+                   short_name=_text(d.get('ClassShortName')),
+                   sex=_intern(d.get('@sex')),
+                   low_age=_int(d.get('@lowAge')),
+                   high_age=_int(d.get('@highAge')))
+
+
+class Organisation(Record):
+    fields = ('id', 'name', 'short_name', 'type_id', 'parent_id', 'modified')
+    __slots__ = fields
+
+    @classmethod
+    def from_dict(cls, d, keep_raw=False):
+        return cls(raw=d if keep_raw else None,
+                   id=_int(d.get('OrganisationId')),
+                   name=_text(d.get('Name')),
+                   short_name=_text(d.get('ShortName')),
+                   type_id=_int(d.get('OrganisationTypeId')),
+                   parent_id=_organisation_id(d.get('ParentOrganisation')),
+                   modified=_datetime(d.get('ModifyDate')))
+
+
+class Person(Record):
+    fields = ('id', 'family', 'given', 'sex', 'birth_date', 'organisation_id')
+    __slots__ = fields
+
+    @classmethod
+    def from_dict(cls, d, keep_raw=False):
+        given = [_text(g) for g in _as_list(_get(d, 'PersonName', 'Given'))]
+        return cls(raw=d if keep_raw else None,
+                   id=_int(d.get('PersonId')),
+                   family=_text(_get(d, 'PersonName', 'Family')),
+                   given=' '.join(g for g in given if g) or None,
+                   sex=_intern(d.get('@sex')),
+                   birth_date=_datetime(d.get('BirthDate')),
+                   organisation_id=_organisation_id(d))
+
+
+class Entry(Record):
+    fields = ('id', 'event_id', 'person_id', 'organisation_id', 'event_class_ids', 'entry_date', 'modified')
+    __slots__ = fields
+
+    @classmethod
+    def from_dict(cls, d, keep_raw=False):
+        competitor = d.get('Competitor') or {}
+        return cls(raw=d if keep_raw else None,
+                   id=_int(d.get('EntryId')),
+                   event_id=_first(_int(d.get('EventId')), _int(_get(d, 'Event', 'EventId'))),
+                   person_id=_first(_int(competitor.get('PersonId')), _int(_get(competitor, 'Person', 'PersonId'))),
+                   organisation_id=_organisation_id(competitor),
+                   event_class_ids=tuple(_int(c.get('EventClassId')) for c in _as_list(d.get('EntryClass'))),
+                   entry_date=_datetime(d.get('EntryDate')),
+                   modified=_datetime(d.get('ModifyDate')))
+
+
+class Start(Record):
+    fields = ('person_id', 'organisation_id', 'event_class_id', 'start_time', 'card_number', 'bib_number',
+              'event_race_id')
+    __slots__ = fields
+
+    @classmethod
+    def from_dict(cls, d, event_class_id=None, keep_raw=False, race=None):
+        """
+        race  (event_race_id, Start) för loppet, standard det första loppet i d.
+        """
+        event_race_id, start = race or _races(d, 'Start', 'RaceStart')[0]
+        return cls(raw=d if keep_raw else None,
+                   person_id=_first(_int(_get(d, 'Person', 'PersonId')), _int(_get(d, 'Person', 'Id'))),
+                   organisation_id=_organisation_id(d),
+                   event_class_id=event_class_id,
+                   start_time=_datetime(start.get('StartTime')),
+                   card_number=_first(_int(_get(start, 'CCard', 'CCardId')), _int(start.get('ControlCard'))),
+                   bib_number=_text(start.get('BibNumber')),
+                   event_race_id=event_race_id)
+
+    @classmethod
+    def from_person_start(cls, d, event_class_id=None, keep_raw=False):
+        """
+        En Start per lopp i en PersonStart.
+        """
+        return [cls.from_dict(d, event_class_id, keep_raw, race) for race in _races(d, 'Start', 'RaceStart')]
+
+
+class Result(Record):
+    fields = ('person_id', 'organisation_id', 'event_class_id', 'start_time', 'finish_time', 'time', 'time_diff',
+              'position', 'status', 'splits', 'event_race_id')
+    __slots__ = fields
+
+    @classmethod
+    def from_dict(cls, d, event_class_id=None, keep_raw=False, race=None):
+        """
+        race  (event_race_id, Result) för loppet, standard det första loppet i d.
+        """
+        event_race_id, result = race or _races(d, 'Result', 'RaceResult')[0]
+        status = result.get('CompetitorStatus')
+        if isinstance(status, dict):
+            status = status.get('@value')
+        return cls(raw=d if keep_raw else None,
+                   person_id=_first(_int(_get(d, 'Person', 'PersonId')), _int(_get(d, 'Person', 'Id'))),
+                   organisation_id=_organisation_id(d),
+                   event_class_id=event_class_id,
+                   start_time=_datetime(result.get('StartTime')),
+                   finish_time=_datetime(result.get('FinishTime')),
+                   time=_seconds(result.get('Time')),
+                   time_diff=_seconds(result.get('TimeDiff') or result.get('TimeBehind')),
+                   position=_int(result.get('ResultPosition') or result.get('Position')),
+                   status=_intern(status or result.get('Status')),
+                   splits=tuple(SplitTime.from_dict(s) for s in _as_list(result.get('SplitTime'))),
+                   event_race_id=event_race_id)
+
+    @classmethod
+    def from_person_result(cls, d, event_class_id=None, keep_raw=False):
+        """
+        En Result per lopp i en PersonResult.
+        """
+        return [cls.from_dict(d, event_class_id, keep_raw, race) for race in _races(d, 'Result', 'RaceResult')]
+
+
+def _items(doc, path):
+    if isinstance(doc, list):
+        return doc
+    if path[0] in doc:
+        return _as_list(_extract(doc, path, default=None))
+    if path[1] in doc:
+        return _as_list(doc[path[1]])
+    return [doc]
+
+
+def events(doc, keep_raw=False):
+    """
+    Event-poster ur svaret från Eventor.events eller Eventor.event.
+    """
+    return [Event.from_dict(d, keep_raw) for d in _items(doc, ('EventList', 'Event'))]
+
+
+def event_classes(doc, keep_raw=False):
+    """
+    EventClass-poster ur svaret från Eventor.event_classes.
+    """
+    return [EventClass.from_dict(d, keep_raw) for d in _items(doc, ('EventClassList', 'EventClass'))]
+
+
+def organisations(doc, keep_raw=False):
+    """
+    Organisation-poster ur svaret från Eventor.organisations eller Eventor.organisation.
+    """
+    return [Organisation.from_dict(d, keep_raw) for d in _items(doc, ('OrganisationList', 'Organisation'))]
+
+
+def persons(doc, keep_raw=False):
+    """
+    Person-poster ur svaret från Eventor.members_in_organisation.
+    """
+    return [Person.from_dict(d, keep_raw) for d in _items(doc, ('PersonList', 'Person'))]
+
+
+def entries(doc, keep_raw=False):
+    """
+    Entry-poster ur svaret från Eventor.entries eller ur ett Entry i taget med stream=True.
+    """
+    return [Entry.from_dict(d, keep_raw) for d in _items(doc, ('EntryList', 'Entry'))]
+
+
+def starts(doc, keep_raw=False):
+    """
+    Start-poster, en per person och lopp, ur svaret från Eventor.start_times_per_event eller ur en ClassStart med
+    stream=True.
+    """
+    records = []
+    for class_start in _items(doc, ('StartList', 'ClassStart')):
+        event_class_id = _first(_int(_get(class_start, 'EventClassId')),
+                                _int(_get(class_start, 'EventClass', 'EventClassId')))
+        for person_start in _as_list(class_start.get('PersonStart')):
+            records.extend(Start.from_person_start(person_start, event_class_id, keep_raw))
+    return records
+
+
+def results(doc, keep_raw=False):
+    """
+    Result-poster, en per person och lopp, ur svaret från Eventor.results_per_event eller ur en ClassResult med
+    stream=True.
+    """
+    records = []
+    for class_result in _items(doc, ('ResultList', 'ClassResult')):
+        event_class_id = _first(_int(_get(class_result, 'EventClassId')),
+                                _int(_get(class_result, 'EventClass', 'EventClassId')))
+        for person_result in _as_list(class_result.get('PersonResult')):
+            records.extend(Result.from_person_result(person_result, event_class_id, keep_raw))
+    return records
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import inspect
+import json
+import os
+
+from eventor_toolkit import _as_list, _extract
+
+CANCELLED_STATUS_ID = '10'
+
+
+SCOPE_IGNORED = ('from_modify_date', 'shard', 'stream')
+
+
+def _scope(kind, method, **kwargs):
+    """
+    Nyckeln för ett urval: kind följt av en hash av alla argument till method, med standardvärden ifyllda och
+    id-listor sorterade. Brytpunkten from_modify_date och argument som inte påverkar urvalet (SCOPE_IGNORED) ingår
+    inte, så t ex olika datumintervall får egna brytpunkter.
+    """
+    arguments = inspect.signature(method).bind(**kwargs)
+    arguments.apply_defaults()
+    params = {}
+    for name, value in arguments.arguments.items():
+        if name in SCOPE_IGNORED:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            value = sorted(str(v) for v in value) or None
+        elif value is not None:
+            value = str(value)
+        params[name] = value
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+    return '{kind}:{digest}'.format(kind=kind, digest=digest[:16])
+
+
+def _modify_date(record):
+    modify_date = record.get('ModifyDate') or {}
+    if not modify_date.get('Date'):
+        return None
+    return '{date} {clock}'.format(date=modify_date['Date'], clock=modify_date.get('Clock') or '00:00:00')
+
+
+def _flatten(value, prefix, fields):
+    """
+    Lägger till elementets värden i fields med sökvägen som nyckel, t ex 'person.PersonName.Family'.
+    """
+    if isinstance(value, dict):
+        for key in value:
+            _flatten(value[key], '{prefix}.{key}'.format(prefix=prefix, key=key), fields)
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            _flatten(item, '{prefix}.{index}'.format(prefix=prefix, index=index), fields)
+    elif value is not None:
+        fields[prefix] = value
+    return fields
+
+
+def _content_hash(fields):
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _diff(old, new):
+    return dict((key, (old.get(key), new.get(key))) for key in sorted(set(old) | set(new))
+                if old.get(key) != new.get(key))
+
+
+class SyncStore:
+    """
+    Lokal lagring av synkroniserade poster per typ (t ex 'events') och brytpunkter per urval, sparad som JSON i
+    path. Ändringar skrivs till disk först när save anropas.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._data = {'records': {}, 'watermarks': {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._data = json.load(f)
+
+    def records(self, kind):
+        return self._data['records'].setdefault(kind, {})
+
+    def watermark(self, scope):
+        return self._data['watermarks'].get(scope)
+
+    def set_watermark(self, scope, watermark):
+        self._data['watermarks'][scope] = watermark
+
+    def save(self):
+        tmp = '{path}.tmp'.format(path=self.path)
+        with open(tmp, 'w') as f:
+            json.dump(self._data, f)
+        os.replace(tmp, self.path)
+
+
+class SyncReport:
+    """
+    Id:n för de poster som lagts till, ändrats, ställts in (endast tävlingar) respektive hämtats utan ändringar
+    vid en synkronisering.
+    """
+
+    def __init__(self, scope, watermark):
+        self.scope = scope
+        self.watermark = watermark
+        self.inserted = []
+        self.updated = []
+        self.cancelled = []
+        self.unchanged = []
+
+    def __repr__(self):
+        return 'SyncReport({scope!r}, inserted={i}, updated={u}, cancelled={c}, unchanged={n})'.format(
+            scope=self.scope, i=len(self.inserted), u=len(self.updated), c=len(self.cancelled),
+            n=len(self.unchanged))
+
+
+class IncrementalSync:
+    """
+    Inkrementell synkronisering av tävlingar och anmälningar till en SyncStore.
+
+    Varje urval (alla argument utom from_modify_date: organisations-id:n, tävlingstyper, datumintervall osv) har en
+    egen brytpunkt: den senaste ändringstidpunkten (ModifyDate) bland hämtade poster. Nästa körning hämtar endast
+    poster som ändrats från och med brytpunkten och slår ihop dem med de lagrade posterna efter id.
+    """
+
+    def __init__(self, eventor, store):
+        self.eventor = eventor
+        self.store = store
+
+    def sync_events(self, organisation_ids=None, classification_ids=None, **kwargs):
+        """
+        Synkroniserar tävlingar enligt Eventor.events. Övriga nyckelordsargument skickas vidare till events.
+        Returnerar en SyncReport.
+        """
+        scope = _scope('events', self.eventor.events, organisation_ids=organisation_ids,
+                       classification_ids=classification_ids, **kwargs)
+        watermark = self.store.watermark(scope)
+        if watermark:
+            kwargs['from_modify_date'] = watermark
+        e = self.eventor.events(organisation_ids=organisation_ids, classification_ids=classification_ids, **kwargs)
+        events = _as_list(_extract(e, ('EventList', 'Event'), default=None))
+        return self._merge('events', scope, watermark, events, 'EventId')
+
+    def sync_entries(self, organisation_ids=None, event_ids=None, event_class_ids=None, **kwargs):
+        """
+        Synkroniserar anmälningar enligt Eventor.entries. Övriga nyckelordsargument skickas vidare till entries.
+        Returnerar en SyncReport.
+        """
+        scope = _scope('entries', self.eventor.entries, organisation_ids=organisation_ids, event_ids=event_ids,
+                       event_class_ids=event_class_ids, **kwargs)
+        watermark = self.store.watermark(scope)
+        if watermark:
+            kwargs['from_modify_date'] = watermark
+        e = self.eventor.entries(organisation_ids=organisation_ids, event_ids=event_ids,
+                                 event_class_ids=event_class_ids, **kwargs)
+        entries = _as_list(_extract(e, ('EntryList', 'Entry'), default=None))
+        return self._merge('entries', scope, watermark, entries, 'EntryId')
+
+    def _merge(self, kind, scope, watermark, records, id_key):
+        stored = self.store.records(kind)
+        for record in records:
+            modify_date = _modify_date(record)
+            if modify_date and (watermark is None or modify_date > watermark):
+                watermark = modify_date
+        report = SyncReport(scope, watermark)
+        for record in records:
+            record_id = record[id_key]
+            previous = stored.get(record_id)
+            if previous == record:
+                report.unchanged.append(record_id)
+                continue
+            if record.get('EventStatusId') == CANCELLED_STATUS_ID and (
+                    previous is None or previous.get('EventStatusId') != CANCELLED_STATUS_ID):
+                report.cancelled.append(record_id)
+            elif previous is None:
+                report.inserted.append(record_id)
+            else:
+                report.updated.append(record_id)
+            stored[record_id] = record
+        if watermark:
+            self.store.set_watermark(scope, watermark)
+        self.store.save()
+        return report
+
+
+class MemberSyncReport:
+    """
+    Förändringar sedan föregående synkronisering av en organisations medlemmar.
+
+    added  Person-id:n för nya medlemmar.
+    removed  Person-id:n för medlemmar som inte längre finns.
+    changed  Dict från person-id till de ändrade fälten som {fält: (gammalt värde, nytt värde)}.
+    unchanged  Antal oförändrade medlemmar.
+    """
+
+    def __init__(self, organisation_id):
+        self.organisation_id = organisation_id
+        self.added = []
+        self.removed = []
+        self.changed = {}
+        self.unchanged = 0
+
+    def __repr__(self):
+        return 'MemberSyncReport({id!r}, added={a}, removed={r}, changed={c}, unchanged={n})'.format(
+            id=self.organisation_id, a=len(self.added), r=len(self.removed), c=len(self.changed), n=self.unchanged)
+
+
+class MemberSync:
+    """
+    Synkronisering av en organisations medlemmar (Eventor.members_in_organisation med kontaktuppgifter)
+    tillsammans med deras tävlingsuppgifter (Eventor.competitors: SI-kort, förvalda klasser osv) till en SyncStore.
+
+    Medlemmarna och tävlingsuppgifterna slås ihop per person-id till platta fält ('person.PersonName.Family',
+    'competitor.CCard.CCardId' osv) med en innehållshash per person. Endast personer vars hash skiljer sig från
+    föregående synkronisering jämförs fält för fält.
+    """
+
+    def __init__(self, eventor, store):
+        self.eventor = eventor
+        self.store = store
+
+    def sync(self, organisation_id):
+        """
+        Synkroniserar medlemmarna i organisation_id. Returnerar en MemberSyncReport.
+        """
+        members = self.eventor.members_in_organisation(organisation_id, include_contact_details=True)
+        competitors = self.eventor.competitors(organisation_id)
+        persons = {}
+        for member in _as_list(members):
+            persons[str(member['PersonId'])] = _flatten(member, 'person', {})
+        for competitor in _as_list(competitors):
+            person_id = str(competitor['PersonId'])
+            if person_id in persons:
+                _flatten(competitor, 'competitor', persons[person_id])
+
+        stored = self.store.records('members:{id}'.format(id=organisation_id))
+        report = MemberSyncReport(organisation_id)
+        for person_id, fields in persons.items():
+            content_hash = _content_hash(fields)
+            previous = stored.get(person_id)
+            if previous is None:
+                report.added.append(person_id)
+            elif previous['hash'] != content_hash:
+                report.changed[person_id] = _diff(previous['fields'], fields)
+            else:
+                report.unchanged += 1
+                continue
+            stored[person_id] = {'hash': content_hash, 'fields': fields}
+        for person_id in list(stored):
+            if person_id not in persons:
+                report.removed.append(person_id)
+                del stored[person_id]
+        self.store.save()
+        return report
@@ -1,18 +1,1175 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import contextvars
+import hashlib
+import json
+import marshal
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+import xml.etree.ElementTree as ElementTree
+from xml.parsers import expat
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from email.utils import parsedate_to_datetime
+
 import requests
 import xmltodict
+from requests.adapters import HTTPAdapter
 
 try:
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+    from urllib3.util.retry import Retry
+except ImportError:
+    from requests.packages.urllib3.connection import HTTPConnection, HTTPSConnection
+    from requests.packages.urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+    from requests.packages.urllib3.util.retry import Retry
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
     from urllib.parse import urlencode
 except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
     from urllib import urlencode
 
 
+_RAISE = object()
+
+
+LIST_PARAMETERS = ('eventIds', 'organisationIds', 'classificationIds', 'eventClassIds', 'personIds')
+REDACTED_PARAMETERS = ('Password',)
+UNCOALESCED_FUNCTIONS = ('externalLoginUrl', 'authenticatePerson')
+MERGE_ID_KEYS = {'Event': 'EventId',
+                 'Entry': 'EntryId',
+                 'Document': '@id',
+                 'Organisation': 'OrganisationId',
+                 'Person': 'PersonId'}
+MERGE_CLASS_KEYS = {'ClassResult': 'PersonResult',
+                    'ClassStart': 'PersonStart'}
+
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+class EventorError(Exception):
+    """
+    Eventor svarade med en felstatus (efter eventuella omförsök).
+    """
+
+    def __init__(self, status_code, url, body=''):
+        Exception.__init__(self, '{status} från {url}'.format(status=status_code, url=url))
+        self.status_code = status_code
+        self.url = url
+        self.body = body
+
+
 def format_list(original):
-    str_list = ""
-    for o in original:
-        str_list = '{li},{o}'.format(li=str_list, o=o)
-    return str_list
+    return ','.join(str(o) for o in original)
+
+
+def _as_list(value):
+    """
+    xmltodict returnerar ett enskilt element som en dict och flera som en lista, detta ger alltid en lista.
+    """
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def _extract(e, path, default=_RAISE):
+    """
+    Plockar ut elementet på sökvägen path ur ett tolkat svar. Om svaret saknar elementet returneras default, eller
+    så kastas TypeError om default inte är angivet.
+    """
+    if path is None:
+        return e
+    try:
+        for key in path:
+            e = e[key]
+    except TypeError:
+        if default is _RAISE:
+            raise
+        return default
+    return e
+
+
+def _local_name(name, prefixes):
+    if name[0] != '{':
+        return name
+    uri, local = name[1:].split('}', 1)
+    prefix = prefixes.get(uri)
+    return '{prefix}:{local}'.format(prefix=prefix, local=local) if prefix else local
+
+
+def _element_to_dict(element, prefixes=None):
+    """
+    Omvandlar ett ElementTree-element till samma struktur som xmltodict.parse ger för elementets innehåll.
+    """
+    prefixes = prefixes or {}
+    d = {}
+    for name, value in element.attrib.items():
+        d['@' + _local_name(name, prefixes)] = value
+    text = element.text or ''
+    for child in element:
+        tag = _local_name(child.tag, prefixes)
+        value = _element_to_dict(child, prefixes)
+        if tag not in d:
+            d[tag] = value
+        elif isinstance(d[tag], list):
+            d[tag].append(value)
+        else:
+            d[tag] = [d[tag], value]
+        text += child.tail or ''
+    text = text.strip()
+    if not d:
+        return text or None
+    if text:
+        d['#text'] = text
+    return d
+
+
+def _parse_expat(body):
+    """
+    Tolkar ett svar (bytes eller str) direkt med expat till samma struktur som xmltodict.parse, utan xmltodicts
+    allmänna efterbearbetning.
+    """
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    stack = [({}, [])]
+
+    def start(name, attributes):
+        stack.append((dict(('@' + k, v) for k, v in attributes.items()) if attributes else {}, []))
+
+    def end(name):
+        item, data = stack.pop()
+        text = ''.join(data).strip()
+        if text:
+            if item:
+                item['#text'] = text
+            else:
+                item = text
+        elif not item:
+            item = None
+        parent = stack[-1][0]
+        existing = parent.get(name, _RAISE)
+        if existing is _RAISE:
+            parent[name] = item
+        elif type(existing) is list:
+            existing.append(item)
+        else:
+            parent[name] = [existing, item]
+
+    def data(text):
+        stack[-1][1].append(text)
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = data
+    parser.Parse(body, True)
+    return stack[0][0]
+
+
+PARSERS = {'xmltodict': xmltodict.parse,
+           'expat': _parse_expat}
+
+
+def _parse_marshalled(body, parser):
+    return marshal.dumps(PARSERS[parser](body))
+
+
+class ProcessParser:
+    """
+    Tolkar svaren i en pool av processer i stället för i tråden som hämtade dem, så att tolkningen av stora svar
+    (t ex results_per_event med sträcktider) från flera trådar i Eventor.map kan använda flera kärnor:
+
+        with ProcessParser(processes=4) as parser, Eventor(api_key, parser=parser) as e:
+            args = [dict(event_id=event_id, include_split_times=True) for event_id in event_ids]
+            for result in e.map(e.results_per_event, args, workers=16):
+                ...
+
+    Med AsyncEventor väntar anropen på tolkningen utan att blockera händelseloopen (parse_async). submit lämnar
+    över ett svar och returnerar direkt, så att även en enda tråd kan hämta nästa svar medan föregående tolkas:
+
+        pending = None
+        for event_id in event_ids:
+            f = io.BytesIO()
+            e.results_per_event_iofxml(event_id, include_split_times=True, raw=f)
+            if pending is not None:
+                handle(pending.result())
+            pending = parser.submit(f.getvalue())
+
+    Processerna returnerar strukturen serialiserad med marshal, som är kompakt och går snabbt att läsa in.
+
+    processes  Antal processer, standard os.cpu_count().
+    parser  Tolkaren i processerna, 'expat' (standard) eller 'xmltodict'.
+    max_pending  Högsta antal svar som samtidigt väntar på eller håller på att tolkas, standard 2 × processes. En
+        tråd som hämtat ett svar när gränsen är nådd väntar innan den lämnar över svaret och hämtar nästa.
+    min_size  Svar kortare än så tolkas direkt i tråden, eftersom överföringen till en process då kostar mer än
+        den sparar.
+    """
+
+    def __init__(self, processes=None, parser='expat', max_pending=None, min_size=64 * 1024):
+        if parser not in PARSERS:
+            raise ValueError('Okänd tolkare: {parser}, välj en av {parsers}'.format(
+                parser=parser, parsers=sorted(PARSERS)))
+        self.processes = processes or os.cpu_count() or 1
+        self.parser = parser
+        self.max_pending = max_pending or 2 * self.processes
+        self.min_size = min_size
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def __call__(self, body):
+        if len(body) < self.min_size:
+            return PARSERS[self.parser](body)
+        return self.submit(body).result()
+
+    def submit(self, body):
+        """
+        Lämnar över body för tolkning och returnerar en concurrent.futures.Future med den tolkade strukturen. Väntar
+        endast om max_pending svar redan väntar på eller håller på att tolkas.
+        """
+        if len(body) < self.min_size:
+            future = Future()
+            try:
+                future.set_result(PARSERS[self.parser](body))
+            except Exception as error:
+                future.set_exception(error)
+            return future
+        self._slots.acquire()
+        return self._submit(body)
+
+    async def parse_async(self, body):
+        """
+        Som att anropa instansen, men för asyncio: väntar på en ledig plats och på tolkningen utan att blockera
+        händelseloopen.
+        """
+        if len(body) < self.min_size:
+            return PARSERS[self.parser](body)
+        if not self._slots.acquire(blocking=False):
+            acquired = asyncio.get_running_loop().run_in_executor(None, self._slots.acquire)
+            try:
+                await asyncio.shield(acquired)
+            except asyncio.CancelledError:
+                acquired.add_done_callback(lambda f: self._slots.release())
+                raise
+        return await asyncio.wrap_future(self._submit(body))
+
+    def _submit(self, body):
+        future = Future()
+        try:
+            parsing = self._executor().submit(_parse_marshalled, body, self.parser)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        def done(parsing):
+            self._slots.release()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(marshal.loads(parsing.result()))
+                except Exception as error:
+                    future.set_exception(error)
+        parsing.add_done_callback(done)
+        return future
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _ItemParser:
+    """
+    Inkrementell XML-tolkning som returnerar elementen med namnet tag direkt under rotelementet allteftersom de
+    blir kompletta, i samma struktur som xmltodict. Färdiga element släpps så att minnesanvändningen inte växer med
+    svarets storlek.
+    """
+
+    def __init__(self, tag):
+        self.tag = tag
+        self._parser = ElementTree.XMLPullParser(events=('start', 'end', 'start-ns'))
+        self._prefixes = {}
+        self._root = None
+        self._depth = 0
+
+    def feed(self, chunk):
+        self._parser.feed(chunk)
+        return self._items()
+
+    def close(self):
+        self._parser.close()
+        return self._items()
+
+    def _items(self):
+        items = []
+        for event, element in self._parser.read_events():
+            if event == 'start-ns':
+                prefix, uri = element
+                self._prefixes[uri] = prefix
+            elif event == 'start':
+                if self._root is None:
+                    self._root = element
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 1:
+                    if _local_name(element.tag, self._prefixes) == self.tag:
+                        items.append(_element_to_dict(element, self._prefixes))
+                    self._root.remove(element)
+        return items
+
+
+class BatchResult:
+    """
+    Resultatet av ett anrop i Eventor.map.
+
+    index  Argumentuppsättningens position i indata.
+    args  Argumentuppsättningen.
+    value  Metodens returvärde, None om anropet misslyckades.
+    error  Undantaget om anropet misslyckades, annars None.
+    """
+
+    def __init__(self, index, args, value=None, error=None):
+        self.index = index
+        self.args = args
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return 'BatchResult(index={index}, args={args!r}, ok={ok})'.format(index=self.index, args=self.args, ok=self.ok)
+
+
+class RawDownload:
+    """
+    Resultatet av en nedladdning med raw.
+
+    bytes  Antal skrivna byte.
+    checksum  Hexsumman enligt den valda algoritmen (t ex 'sha256'), None om ingen valts.
+    """
+
+    def __init__(self, bytes, checksum=None):
+        self.bytes = bytes
+        self.checksum = checksum
+
+    def __repr__(self):
+        return 'RawDownload(bytes={bytes}, checksum={checksum!r})'.format(bytes=self.bytes, checksum=self.checksum)
+
+
+class ConditionalResponse:
+    """
+    Svaret på ett villkorligt anrop med Eventor.fetch_if_modified.
+
+    status  HTTP-status, 304 om svaret inte ändrats.
+    body  Det otolkade svaret (bytes), None för 304.
+    etag  ETag för svaret, skickas med nästa anrop.
+    last_modified  Last-Modified för svaret, skickas med nästa anrop.
+    """
+
+    def __init__(self, status, body, etag=None, last_modified=None):
+        self.status = status
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def modified(self):
+        return self.status != 304
+
+    def __repr__(self):
+        return 'ConditionalResponse(status={status}, bytes={bytes})'.format(
+            status=self.status, bytes=len(self.body) if self.body is not None else None)
+
+
+@contextmanager
+def _raw_destination(destination):
+    """
+    Öppnar destination för skrivning om den är en sökväg (via en tillfällig fil i samma katalog, unik för varje
+    nedladdning, som ersätter destinationen först när nedladdningen lyckats), annars används den som ett filobjekt.
+    """
+    if hasattr(destination, 'write'):
+        yield destination
+        return
+    path = os.fspath(destination)
+    directory, name = os.path.split(path)
+    f = tempfile.NamedTemporaryFile(dir=directory or '.', prefix='{0}.'.format(name), suffix='.tmp', delete=False)
+    try:
+        with f:
+            yield f
+        os.replace(f.name, path)
+    finally:
+        if os.path.exists(f.name):
+            os.remove(f.name)
+
+
+def _call_with(method, args):
+    if isinstance(args, dict):
+        return method(**args)
+    if isinstance(args, (tuple, list)):
+        return method(*args)
+    return method(args)
+
+
+def _split_query(q, chunk_size):
+    """
+    Delar upp en fråga vars id-listor (LIST_PARAMETERS) är längre än chunk_size i flera frågor med högst chunk_size
+    id:n per lista. Frågorna täcker tillsammans samma urval som den ursprungliga.
+    """
+    if not q or not chunk_size:
+        return [q]
+    queries = [q]
+    for name in LIST_PARAMETERS:
+        if name not in q:
+            continue
+        ids = str(q[name]).split(',')
+        if len(ids) <= chunk_size:
+            continue
+        chunks = [format_list(ids[i:i + chunk_size]) for i in range(0, len(ids), chunk_size)]
+        queries = [dict(query, **{name: chunk}) for query in queries for chunk in chunks]
+    return queries
+
+
+def _next_window(start, shard):
+    if shard == 'year':
+        return date(start.year + 1, 1, 1)
+    if shard == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    if shard == 'week':
+        return start + timedelta(days=7 - start.weekday())
+    return start + timedelta(days=shard)
+
+
+def _date_windows(from_date, to_date, shard):
+    """
+    Delar upp datumintervallet from_date - to_date (åååå-mm-dd, inklusive) i fönster per kalenderår ('year'),
+    kalendermånad ('month'), vecka ('week') eller ett antal dagar (int).
+    """
+    if from_date.startswith('0000') or to_date.startswith('9999'):
+        raise ValueError('Uppdelning per datum kräver ett avgränsat datumintervall')
+    if shard not in ('year', 'month', 'week') and not (isinstance(shard, int) and shard > 0):
+        raise ValueError('Okänd uppdelning: {shard!r}'.format(shard=shard))
+    start = datetime.strptime(from_date[:10], '%Y-%m-%d').date()
+    end = datetime.strptime(to_date[:10], '%Y-%m-%d').date()
+    windows = []
+    while start <= end:
+        stop = _next_window(start, shard)
+        windows.append((start.isoformat(), min(stop - timedelta(days=1), end).isoformat()))
+        start = stop
+    return windows
+
+
+def _queries(q, chunk_size, shard=None):
+    """
+    Frågorna som ska göras för q: en per datumfönster om shard är en tupel (from-parameter, to-parameter,
+    uppdelning), och därefter uppdelade enligt chunk_size.
+    """
+    queries = [q]
+    if shard is not None:
+        from_key, to_key, window = shard
+        queries = [dict(q, **{from_key: start, to_key: stop})
+                   for start, stop in _date_windows(q[from_key], q[to_key], window)]
+    return [chunk for query in queries for chunk in _split_query(query, chunk_size)]
+
+
+def _merge_id(item, *paths):
+    for path in paths:
+        value = item
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is not None and not isinstance(value, (dict, list)):
+            return value
+    return None
+
+
+def _merge_documents(docs):
+    """
+    Slår ihop svar på delfrågor (t ex flera EventList) till ett svar. Element med id enligt MERGE_ID_KEYS, och i
+    övrigt identiska element, tas bara med en gång. Klasser enligt MERGE_CLASS_KEYS (ClassResult, ClassStart) med
+    samma klass-id slås ihop till en klass med alla delsvarens personer, varje person en gång.
+    """
+    root = next(iter(docs[0]))
+    merged = {}
+    seen = {}
+    classes = {}
+    for doc in docs:
+        body = doc.get(root)
+        if not isinstance(body, dict):
+            continue
+        for tag, value in body.items():
+            if tag.startswith('@') or tag == '#text':
+                merged.setdefault(tag, value)
+                continue
+            items = merged.setdefault(tag, [])
+            identities = seen.setdefault(tag, set())
+            id_key = MERGE_ID_KEYS.get(tag)
+            person_key = MERGE_CLASS_KEYS.get(tag)
+            for item in _as_list(value):
+                if person_key:
+                    identity = _merge_id(item, ('EventClassId',), ('EventClass', 'EventClassId'), ('Class', 'Id'))
+                    if identity is not None:
+                        _merge_class(classes, items, (tag, identity), item, person_key)
+                        continue
+                if id_key and isinstance(item, dict) and item.get(id_key) is not None:
+                    identity = item[id_key]
+                else:
+                    identity = json.dumps(item, sort_keys=True)
+                if identity not in identities:
+                    identities.add(identity)
+                    items.append(item)
+    for tag, items in merged.items():
+        if tag in seen and len(items) == 1:
+            merged[tag] = items[0]
+    return {root: merged or None}
+
+
+def _merge_class(classes, items, key, item, person_key):
+    if key not in classes:
+        item = dict(item)
+        classes[key] = (item, [], set())
+        items.append(item)
+    merged, persons, identities = classes[key]
+    for person in _as_list(item.get(person_key)):
+        identity = _merge_id(person, ('Person', 'PersonId'), ('Person', 'Id'))
+        if identity is None:
+            identity = json.dumps(person, sort_keys=True)
+        if identity not in identities:
+            identities.add(identity)
+            persons.append(person)
+    if persons:
+        merged[person_key] = persons[0] if len(persons) == 1 else persons
+
+
+def _endpoint(function):
+    """
+    Funktionsnamnet utan id:n i sökvägen, t ex 'organisation' för 'organisation/123'.
+    """
+    return '/'.join(part for part in function.split('/') if not part.isdigit())
+
+
+class ResponseCache:
+    """
+    Cache för svar från Eventor i två nivåer: en begränsad LRU-cache i minnet med tolkade svar och, om path anges,
+    en sqlite-databas på disk med råa svar som kan delas mellan flera processer.
+
+    Nyckeln är funktion, query-parametrar och API-nyckel (som hash). Livslängden i sekunder anges per funktion
+    utan id:n (se DEFAULT_TTLS), funktioner som saknas i ttls och default_ttl 0 cachas inte. Tolkade svar delas
+    mellan anrop och ska inte ändras av anroparen.
+
+    max_entries  Maximalt antal svar i minnet.
+    path  Sökväg till sqlite-databasen, utelämna för att endast cacha i minnet.
+    ttls  Dict med livslängder per funktion som ersätter standardvärdena.
+    default_ttl  Livslängd för funktioner som inte finns i ttls.
+    """
+    DEFAULT_TTLS = {
+        'organisations': 6 * 3600,
+        'organisation': 6 * 3600,
+        'organisation/apiKey': 6 * 3600,
+        'events': 10 * 60,
+        'events/documents': 10 * 60,
+        'event': 10 * 60,
+        'eventclasses': 10 * 60,
+        'entryfees/events': 10 * 60,
+        'starts/event': 60,
+        'starts/event/iofxml': 60,
+        'results/event': 15,
+        'results/event/iofxml': 15,
+    }
+
+    def __init__(self, max_entries=256, path=None, ttls=None, default_ttl=0):
+        self.max_entries = max_entries
+        self.path = path
+        self.ttls = dict(self.DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS response_cache ('
+                             'key TEXT PRIMARY KEY, endpoint TEXT, expires REAL, body TEXT)')
+            self._db.commit()
+
+    @property
+    def stats(self):
+        return {'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._memory)}
+
+    def ttl(self, function):
+        return self.ttls.get(_endpoint(function), self.default_ttl)
+
+    @staticmethod
+    def key(api_key, function, q):
+        identity = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+        query = sorted((str(k), str(v)) for k, v in (q or {}).items())
+        return hashlib.sha256(json.dumps([identity, function, query]).encode('utf-8')).hexdigest()
+
+    def get(self, api_key, function, q, parse):
+        """
+        Returnerar det cachade svaret eller None. Råa svar från disk tolkas med parse och läggs i minnet.
+        """
+        if not self.ttl(function):
+            return None
+        key = self.key(api_key, function, q)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                del self._memory[key]
+            if self._db is not None:
+                row = self._db.execute('SELECT expires, body FROM response_cache WHERE key = ?', (key,)).fetchone()
+                if row is not None and row[0] > now:
+                    value = parse(row[1])
+                    self._remember(key, _endpoint(function), row[0], value)
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+        return None
+
+    def put(self, api_key, function, q, value, body):
+        ttl = self.ttl(function)
+        if not ttl:
+            return
+        key = self.key(api_key, function, q)
+        expires = time.time() + ttl
+        endpoint = _endpoint(function)
+        with self._lock:
+            self._remember(key, endpoint, expires, value)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO response_cache (key, endpoint, expires, body) '
+                                 'VALUES (?, ?, ?, ?)', (key, endpoint, expires, body))
+                self._db.commit()
+
+    def _remember(self, key, endpoint, expires, value):
+        self._memory[key] = (endpoint, expires, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, function=None):
+        """
+        Tar bort cachade svar för en funktion (med eller utan id:n, t ex 'event' eller 'event/123'), eller alla svar
+        om function utelämnas.
+        """
+        endpoint = _endpoint(function) if function else None
+        with self._lock:
+            for key in [k for k, v in self._memory.items() if endpoint is None or v[0] == endpoint]:
+                del self._memory[key]
+            if self._db is not None:
+                if endpoint is None:
+                    self._db.execute('DELETE FROM response_cache')
+                else:
+                    self._db.execute('DELETE FROM response_cache WHERE endpoint = ?', (endpoint,))
+                self._db.commit()
+
+    def purge(self):
+        """
+        Tar bort utgångna svar från disk.
+        """
+        if self._db is not None:
+            with self._lock:
+                self._db.execute('DELETE FROM response_cache WHERE expires <= ?', (time.time(),))
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def _retry_after(r):
+    """
+    Väntetiden i sekunder enligt svarets Retry-After (sekunder eller HTTP-datum), None om den saknas.
+    """
+    value = r.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(when.tzinfo)).total_seconds())
+
+
+class TokenBucket:
+    """
+    Begränsar anropstakten till rate anrop per sekund med tillfälliga toppar på upp till burst anrop.
+
+    TokenBucket.for_key ger en gemensam hink per API-nyckel för alla Eventor-instanser i processen. Hinken finns
+    kvar så länge någon instans använder den.
+    """
+    _shared = weakref.WeakValueDictionary()
+    _shared_lock = threading.Lock()
+
+    def __init__(self, rate, burst=None):
+        self._lock = threading.Lock()
+        self._updated = time.monotonic()
+        self._tokens = None
+        self.configure(rate, burst)
+
+    def configure(self, rate, burst=None):
+        """
+        Ändrar rate och burst. Sparade tokens över den nya burst tas bort.
+        """
+        if rate <= 0:
+            raise ValueError('rate måste vara större än 0')
+        with self._lock:
+            self.rate = float(rate)
+            self.burst = float(burst or max(rate, 1))
+            self._tokens = self.burst if self._tokens is None else min(self._tokens, self.burst)
+
+    @classmethod
+    def for_key(cls, api_key, rate, burst=None):
+        """
+        Den gemensamma hinken för api_key. Om den redan finns med en annan rate eller burst ändras den, så att det
+        senast angivna värdet gäller för alla instanser med nyckeln.
+        """
+        key = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+        with cls._shared_lock:
+            bucket = cls._shared.get(key)
+            if bucket is None:
+                bucket = cls._shared[key] = cls(rate, burst)
+            elif (bucket.rate, bucket.burst) != (float(rate), float(burst or max(rate, 1))):
+                bucket.configure(rate, burst)
+            return bucket
+
+    def reserve(self):
+        """
+        Tar en token och returnerar hur många sekunder anroparen ska vänta innan anropet görs.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+class AdaptiveLimiter:
+    """
+    Anpassar antalet samtidiga anrop (AIMD): gränsen halveras när Eventor svarar 429 eller 5xx, när anropet
+    misslyckas (t ex timeout) eller när svarstiden överstiger target_latency, och ökar med ungefär ett anrop per
+    svarstid när svaren är friska.
+
+    maximum  Högsta antal samtidiga anrop.
+    minimum  Lägsta antal samtidiga anrop.
+    target_latency  Svarstid i sekunder över vilken gränsen sänks, None för att bara reagera på 429/503.
+    cooldown  Minsta tid i sekunder mellan två sänkningar.
+    """
+
+    def __init__(self, maximum=10, minimum=1, target_latency=None, cooldown=1.0):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.target_latency = target_latency
+        self.cooldown = cooldown
+        self.limit = float(max(minimum, maximum // 2))
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = None
+        self._condition = threading.Condition()
+
+    def try_acquire(self):
+        with self._condition:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency, throttled=False):
+        """
+        throttled  True om anropet misslyckades eller Eventor svarade 429 eller 5xx.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled or (self.target_latency and latency > self.target_latency):
+                if self._last_decrease is None or now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+
+def _redact(q):
+    if not q:
+        return {}
+    return dict((k, '***' if k in REDACTED_PARAMETERS else v) for k, v in q.items())
+
+
+def _count_elements(e):
+    """
+    Antal element direkt under svarets rotelement.
+    """
+    root = next(iter(e.values()), None) if isinstance(e, dict) else None
+    if not isinstance(root, dict):
+        return 0 if root is None else 1
+    return sum(len(_as_list(value)) for key, value in root.items() if key[0] not in '@#')
+
+
+class CallMetrics:
+    """
+    Mätvärden för ett anrop, skickas till Metrics och dess lyssnare. Tider är i sekunder och None när de inte
+    mätts (t ex för cacheträffar).
+
+    endpoint  Funktionen utan id:n i sökvägen, t ex 'event' för 'event/1'.
+    query  Query-parametrarna med REDACTED_PARAMETERS maskerade.
+    cache  'hit', 'miss' eller None om instansen saknar cache.
+    status  HTTP-status för det sista försöket.
+    retries  Antal omförsök efter 429/503.
+    connect  Tid för att öppna en ny anslutning (namnuppslagning, TCP och TLS) i det sista försöket, None om en
+        befintlig anslutning återanvändes.
+    ttfb  Tid från att det sista försöket skickats till att svarshuvudet tagits emot, exklusive connect.
+    download  Tid för att ta emot svarskroppen.
+    bytes  Svarskroppens storlek (okomprimerad).
+    parse  Tid för XML-tolkningen.
+    elements  Antal element direkt under svarets rotelement.
+    duration  Total tid för anropet.
+    error  Undantaget om anropet misslyckades.
+    """
+    fields = ('endpoint', 'query', 'cache', 'status', 'retries', 'connect', 'ttfb', 'download', 'bytes', 'parse',
+              'elements', 'duration', 'error')
+
+    def __init__(self, function, q, cache=None):
+        for name in self.fields:
+            setattr(self, name, None)
+        self.endpoint = _endpoint(function)
+        self.query = _redact(q)
+        self.cache = cache
+        self.retries = 0
+        self._start = time.monotonic()
+
+    def __repr__(self):
+        return 'CallMetrics({fields})'.format(fields=', '.join(
+            '{0}={1!r}'.format(name, getattr(self, name)) for name in self.fields if getattr(self, name) is not None))
+
+
+class Histogram:
+    """
+    Histogram med fasta övre gränser (buckets) i stil med Prometheus.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        Lista med (övre gräns, antal observationer <= gränsen), sist (inf, count).
+        """
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+def _prometheus_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """
+    Samlar CallMetrics för alla anrop från en eller flera Eventor-instanser (Eventor(..., metrics=m)) i histogram
+    per endpoint och skickar varje CallMetrics vidare till listeners:
+
+        m = Metrics(listeners=[lambda call: log.info('%r', call)])
+        e = Eventor(api_key, metrics=m)
+        ...
+        print(m.prometheus())
+
+    Histogrammen kan hämtas som dict med snapshot eller i Prometheus textformat med prometheus (eller serve).
+    """
+    TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    BYTE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+    COUNT_BUCKETS = (1, 10, 100, 1000, 10000)
+    HISTOGRAMS = (('duration', 'eventor_request_duration_seconds', 'Total tid per anrop.', TIME_BUCKETS),
+                  ('connect', 'eventor_connect_seconds', 'Tid för nya anslutningar.', TIME_BUCKETS),
+                  ('ttfb', 'eventor_ttfb_seconds', 'Tid till svarshuvudet.', TIME_BUCKETS),
+                  ('download', 'eventor_download_seconds', 'Tid för att ta emot svarskroppen.', TIME_BUCKETS),
+                  ('parse', 'eventor_parse_seconds', 'Tid för XML-tolkning.', TIME_BUCKETS),
+                  ('bytes', 'eventor_response_bytes', 'Svarets storlek i byte.', BYTE_BUCKETS),
+                  ('elements', 'eventor_result_elements', 'Antal element i svaret.', COUNT_BUCKETS))
+
+    def __init__(self, listeners=None):
+        self.listeners = list(listeners or [])
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = {}
+        self._retries = {}
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def record(self, call):
+        with self._lock:
+            key = (call.endpoint, str(call.status or 'none'), call.cache or 'none')
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._retries[call.endpoint] = self._retries.get(call.endpoint, 0) + call.retries
+            for attribute, name, _, buckets in self.HISTOGRAMS:
+                value = getattr(call, attribute)
+                if value is None:
+                    continue
+                histogram = self._histograms.get((name, call.endpoint))
+                if histogram is None:
+                    histogram = self._histograms[(name, call.endpoint)] = Histogram(buckets)
+                histogram.observe(value)
+        for listener in self.listeners:
+            listener(call)
+
+    def snapshot(self):
+        """
+        Dict med antal anrop per (endpoint, status, cache), omförsök per endpoint och histogram som
+        {namn: {endpoint: {'count', 'sum', 'buckets'}}}.
+        """
+        with self._lock:
+            histograms = {}
+            for (name, endpoint), histogram in self._histograms.items():
+                histograms.setdefault(name, {})[endpoint] = {'count': histogram.count, 'sum': histogram.sum,
+                                                             'buckets': histogram.cumulative()}
+            return {'requests': dict(self._requests), 'retries': dict(self._retries), 'histograms': histograms}
+
+    def prometheus(self):
+        """
+        Histogrammen och räknarna i Prometheus textformat.
+        """
+        snapshot = self.snapshot()
+        lines = ['# HELP eventor_requests_total Antal anrop.', '# TYPE eventor_requests_total counter']
+        for (endpoint, status, cache), count in sorted(snapshot['requests'].items()):
+            lines.append('eventor_requests_total{{endpoint="{0}",status="{1}",cache="{2}"}} {3}'.format(
+                endpoint, status, cache, count))
+        lines += ['# HELP eventor_retries_total Antal omförsök efter 429/503.',
+                  '# TYPE eventor_retries_total counter']
+        for endpoint, count in sorted(snapshot['retries'].items()):
+            lines.append('eventor_retries_total{{endpoint="{0}"}} {1}'.format(endpoint, count))
+        for _, name, description, _ in self.HISTOGRAMS:
+            histograms = snapshot['histograms'].get(name)
+            if not histograms:
+                continue
+            lines += ['# HELP {0} {1}'.format(name, description), '# TYPE {0} histogram'.format(name)]
+            for endpoint, histogram in sorted(histograms.items()):
+                for bound, count in histogram['buckets']:
+                    lines.append('{0}_bucket{{endpoint="{1}",le="{2}"}} {3}'.format(
+                        name, endpoint, _prometheus_value(bound), count))
+                lines.append('{0}_sum{{endpoint="{1}"}} {2}'.format(
+                    name, endpoint, _prometheus_value(histogram['sum'])))
+                lines.append('{0}_count{{endpoint="{1}"}} {2}'.format(name, endpoint, histogram['count']))
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        """
+        Startar en HTTP-server i en bakgrundstråd som svarar med prometheus() på alla GET-anrop. Returnerar
+        servern, stoppa den med shutdown().
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = HTTPServer((host, port), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return server
+
+
+def _query_key(function, q):
+    return function, tuple(sorted((str(k), str(v)) for k, v in (q or {}).items()))
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class _SingleFlight:
+    """
+    Samordnar samtidiga identiska anrop: medan ett anrop för en nyckel pågår väntar övriga anropare på det och får
+    samma resultat (eller undantag) i stället för att göra egna anrop. Funktioner i UNCOALESCED_FUNCTIONS, vars svar
+    bara får användas en gång, samordnas inte.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = fn()
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+
+_connection_timings = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.monotonic()
+        HTTPConnection.connect(self)
+        _connection_timings.connect = time.monotonic() - start
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.monotonic()
+        HTTPSConnection.connect(self)
+        _connection_timings.connect = time.monotonic() - start
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter som mäter tiden för nya anslutningar (CallMetrics.connect).
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool,
+                                                   'https': _TimedHTTPSConnectionPool}
+
+
+class Transport:
+    """
+    HTTP-transport med en beständig anslutningspool (keep-alive) mot Eventor.
+
+    Anslutningar återanvänds mellan anrop så att TCP- och TLS-handskakningen bara görs en gång per anslutning.
+    Svar begärs gzip/deflate-komprimerade och anrop som avbryts av nätverksfel (t ex återställda anslutningar)
+    görs om med exponentiell backoff.
+
+    pool_size  Maximalt antal öppna anslutningar i poolen.
+    timeout  Tupel (connect, read) i sekunder.
+    retries  Antal omförsök vid anslutnings- och läsfel.
+    backoff_factor  Grundfördröjning i sekunder för omförsök (0.5, 1, 2, ...).
+    """
+
+    def __init__(self, pool_size=10, timeout=(5, 60), retries=3, backoff_factor=0.5):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        retry = Retry(total=retries, connect=retries, read=retries, backoff_factor=backoff_factor,
+                      respect_retry_after_header=False)
+        adapter = _TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url, headers=None, stream=False):
+        return self.session.get(url, headers=headers, timeout=self.timeout, stream=stream)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
 
 class Eventor:
@@ -57,19 +1214,347 @@ class Eventor:
         'IndMultiDay': 'individuell flerdagarstävling',
         'RelaySingleDay': 'stafett endagstävling'}
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, api_url=None, transport=None, pool_size=10, timeout=(5, 60), retries=3, cache=None,
+                 chunk_size=100, rate=None, burst=None, limiter=None, backoff_factor=0.5, metrics=None,
+                 parser='xmltodict'):
+        """
+        api_key  Organisationens API-nyckel.
+        api_url  Bas-url för API:t, standard är EVENTOR_API_URL.
+        transport  En befintlig Transport att dela mellan flera instanser. Om den utelämnas skapas en egen
+            Transport med pool_size, timeout, retries och backoff_factor som stängs tillsammans med instansen.
+        cache  En ResponseCache för svaren, utelämna för att inte cacha.
+        chunk_size  Maximalt antal id:n per id-lista i ett anrop. Längre listor delas upp i flera anrop som görs
+            parallellt och vars svar slås ihop (med stream=True i tur och ordning).
+        rate  Högsta antal anrop per sekund för API-nyckeln (gemensamt för alla instanser med samma nyckel), med
+            tillfälliga toppar på upp till burst anrop. Utelämna för obegränsat.
+        limiter  En AdaptiveLimiter som anpassar antalet samtidiga anrop, utelämna för att inte begränsa.
+        metrics  En Metrics som tar emot en CallMetrics per anrop, utelämna för att inte mäta.
+        parser  XML-tolkare för svaren: 'xmltodict' (standard), 'expat' (snabbare, tolkar svarets bytes direkt och
+            ger samma struktur), en ProcessParser (tolkar i en pool av processer) eller en funktion som tar svaret
+            som bytes och returnerar samma struktur som xmltodict.parse.
+
+        Svar med status 429/503 görs om upp till retries gånger efter Retry-After (eller exponentiell backoff).
+        Övriga felstatusar ger EventorError.
+        """
         self.api_key = api_key
+        self.api_url = api_url or self.EVENTOR_API_URL
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.workers = pool_size
+        self.cache = cache
+        self.chunk_size = chunk_size
+        self.rate_limiter = TokenBucket.for_key(api_key, rate, burst) if rate else None
+        self.limiter = limiter
+        self.metrics = metrics
+        if isinstance(parser, str) and parser not in PARSERS:
+            raise ValueError('Okänd tolkare: {parser}, välj en av {parsers}'.format(
+                parser=parser, parsers=sorted(PARSERS)))
+        self._parse_text = parser == 'xmltodict'
+        self.parser = PARSERS[parser] if parser in PARSERS else parser
+        self._flights = self._create_single_flight()
+        self._bypass = contextvars.ContextVar('bypass_cache', default=None)
+        self._owns_transport = transport is None
+        self.transport = transport if transport is not None else self._create_transport()
+
+    def _create_transport(self):
+        return Transport(pool_size=self.pool_size, timeout=self.timeout, retries=self.retries,
+                         backoff_factor=self.backoff_factor)
+
+    def _create_single_flight(self):
+        return _SingleFlight()
+
+    @property
+    def coalesced(self):
+        """
+        Antal anrop som inte gjordes mot Eventor eftersom ett identiskt anrop redan pågick och delade sitt svar.
+        """
+        return self._flights.coalesced
+
+    def close(self):
+        """
+        Stänger instansens anslutningar. En delad Transport stängs inte.
+        """
+        if self._owns_transport:
+            self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @contextmanager
+    def bypass_cache(self, store=False):
+        """
+        Hämtar svaren från Eventor i stället för cachen för anrop inom with-blocket i denna tråd (eller
+        asyncio-task och de tasks den startar):
+
+            with e.bypass_cache():
+                e.organisations()
+
+        store  Sätt till True för att ersätta de cachade svaren med de nya.
+        """
+        token = self._bypass.set('store' if store else 'skip')
+        try:
+            yield self
+        finally:
+            self._bypass.reset(token)
+
+    def _cache_get(self, function, q):
+        if self.cache is None or self._bypass.get():
+            return None
+        return self.cache.get(self.api_key, function, q, self.parser)
+
+    def _cache_put(self, function, q, e, body):
+        if self.cache is None or self._bypass.get() == 'skip':
+            return
+        self.cache.put(self.api_key, function, q, e, body)
+
+    def map(self, method, arg_sets, workers=None, ordered=True):
+        """
+        Anropar method en gång per argumentuppsättning i arg_sets, parallellt i en trådpool.
+
+        method  En metod i Eventor (eller dess namn), t ex e.competitor eller 'competitor'.
+        arg_sets  Argumentuppsättningar: en tupel med positionsargument, en dict med nyckelordsargument eller ett
+            enskilt argument.
+        workers  Antal trådar, standard är anslutningspoolens storlek.
+        ordered  Sätt till False för att få resultaten i den ordning de blir klara i stället för i indataordning.
+        Returnerat element
+
+        Generator med ett BatchResult per argumentuppsättning. Ett misslyckat anrop avbryter inte de övriga utan
+        returneras med error satt.
+        """
+        if not callable(method):
+            method = getattr(self, method)
+
+        def run(index, args):
+            try:
+                return BatchResult(index, args, value=_call_with(method, args))
+            except Exception as error:
+                return BatchResult(index, args, error=error)
+
+        executor = ThreadPoolExecutor(max_workers=workers or self.workers)
+        futures = [executor.submit(run, index, args) for index, args in enumerate(arg_sets)]
+        try:
+            for future in (futures if ordered else as_completed(futures)):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def events_by_id(self, event_ids, workers=None):
+        """
+        Hämtar flera tävlingar enligt event parallellt. Returnerar en lista med BatchResult i samma ordning som
+        event_ids.
+        """
+        return list(self.map(self.event, event_ids, workers=workers))
+
+    def competitors_for(self, person_ids, workers=None):
+        """
+        Hämtar tävlingsuppgifter för flera personer enligt competitor parallellt. Returnerar en lista med
+        BatchResult i samma ordning som person_ids.
+        """
+        return list(self.map(self.competitor, person_ids, workers=workers))
 
-    def _execute(self, function, q):
-        url = "{base}{function}".format(base=self.EVENTOR_API_URL, function=function)
+    def results_for(self, person_ids, workers=None, **kwargs):
+        """
+        Hämtar resultat för flera personer enligt results_per_person parallellt. Övriga nyckelordsargument skickas
+        vidare till results_per_person. Returnerar en lista med BatchResult i samma ordning som person_ids.
+        """
+        arg_sets = [dict(kwargs, person_id=person_id) for person_id in person_ids]
+        return list(self.map(self.results_per_person, arg_sets, workers=workers))
+
+    def _url(self, function, q):
+        url = "{base}{function}".format(base=self.api_url, function=function)
         if q:
             query_string = urlencode(q)
             url = "{url}?{query}".format(url=url, query=query_string)
+        return url
+
+    def _get(self, url, stream=False, call=None, headers=None):
+        """
+        API-nyckeln skickas bara till adresser under api_url, inte t ex till dokument på andra värdar.
+        """
+        request_headers = {'ApiKey': self.api_key} if url.startswith(self.api_url) else {}
+        if headers:
+            request_headers.update(headers)
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            if self.limiter is not None:
+                self.limiter.acquire()
+            _connection_timings.connect = None
+            start = time.monotonic()
+            r = None
+            try:
+                r = self.transport.get(url, headers=request_headers, stream=stream)
+            finally:
+                throttled = r is not None and r.status_code in THROTTLE_STATUS_CODES
+                if self.limiter is not None:
+                    self.limiter.release(time.monotonic() - start, r is None or throttled or r.status_code >= 500)
+            if throttled and attempt < self.retries:
+                delay = _retry_after(r)
+                r.close()
+                time.sleep(self.backoff_factor * (2 ** attempt) if delay is None else delay)
+                attempt += 1
+                continue
+            if call is not None:
+                call.status = r.status_code
+                call.retries = attempt
+                call.connect = _connection_timings.connect
+                elapsed = r.elapsed.total_seconds()
+                call.ttfb = max(0.0, elapsed - (call.connect or 0.0))
+                if not stream:
+                    call.download = max(0.0, time.monotonic() - start - elapsed)
+            if not r.ok:
+                body = '' if stream else r.text[:1000]
+                r.close()
+                raise EventorError(r.status_code, url, body)
+            return r
+
+    def _record(self, call, error=None):
+        if call is None:
+            return
+        call.error = error
+        call.duration = time.monotonic() - call._start
+        self.metrics.record(call)
+
+    def _iterparse(self, function, q, tag):
+        """
+        Elementen tag från ett anrop per fråga i _queries(q, chunk_size), i tur och ordning.
+        """
+        for query in _queries(q, self.chunk_size):
+            yield from self._iterparse_query(function, query, tag)
+
+    def _iterparse_query(self, function, q, tag):
+        call = CallMetrics(function, q) if self.metrics is not None else None
+        try:
+            r = self._get(self._url(function, q), stream=True, call=call)
+        except Exception as error:
+            self._record(call, error)
+            raise
+        size = 0
+        elements = 0
+        failure = None
+        try:
+            parser = _ItemParser(tag)
+            for chunk in r.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                for item in parser.feed(chunk):
+                    elements += 1
+                    yield item
+            for item in parser.close():
+                elements += 1
+                yield item
+        except Exception as error:
+            failure = error
+            raise
+        finally:
+            r.close()
+            if call is not None:
+                call.bytes = size
+                call.elements = elements
+            self._record(call, failure)
+
+    def _copy_raw(self, function, q, destination, checksum=None):
+        call = CallMetrics(function, q) if self.metrics is not None else None
+        digest = hashlib.new(checksum) if checksum else None
+        size = 0
+        try:
+            r = self._get(self._url(function, q), stream=True, call=call)
+            try:
+                with _raw_destination(destination) as f:
+                    for chunk in r.iter_content(chunk_size=64 * 1024):
+                        f.write(chunk)
+                        size += len(chunk)
+                        if digest is not None:
+                            digest.update(chunk)
+            finally:
+                r.close()
+        except Exception as error:
+            self._record(call, error)
+            raise
+        if call is not None:
+            call.bytes = size
+            self._record(call)
+        return RawDownload(size, digest.hexdigest() if digest is not None else None)
+
+    def fetch_if_modified(self, function, q=None, etag=None, last_modified=None):
+        """
+        Hämtar ett otolkat svar med ett villkorligt anrop, förbi cachen, för bevakning av svar som ändras (t ex
+        results/event under en pågående tävling).
+
+        function  Funktionen i API:t, t ex 'results/event'.
+        q  Query-parametrarna.
+        etag, last_modified  Värdena från föregående svar, skickas som If-None-Match och If-Modified-Since.
+        Returnerat element
+
+        ConditionalResponse. Tolka body med e.parser.
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        call = CallMetrics(function, q) if self.metrics is not None else None
+        try:
+            r = self._get(self._url(function, q), call=call, headers=headers)
+            if r.status_code == 304:
+                response = ConditionalResponse(304, None, etag, last_modified)
+            else:
+                response = ConditionalResponse(r.status_code, r.content, r.headers.get('ETag'),
+                                               r.headers.get('Last-Modified'))
+        except Exception as error:
+            self._record(call, error)
+            raise
+        if call is not None:
+            call.bytes = len(response.body) if response.body is not None else 0
+        self._record(call)
+        return response
+
+    def _fetch(self, function, q):
+        call = CallMetrics(function, q, cache='hit') if self.metrics is not None else None
+        e = self._cache_get(function, q)
+        if e is None and function in UNCOALESCED_FUNCTIONS:
+            return self._download(function, q)
+        if e is None:
+            return self._flights.do(_query_key(function, q), lambda: self._download(function, q))
+        self._record(call)
+        return e
 
-        r = requests.get(url, headers={'ApiKey': self.api_key})
-        e = xmltodict.parse(r.text)
+    def _download(self, function, q):
+        call = None
+        if self.metrics is not None:
+            call = CallMetrics(function, q, cache='miss' if self.cache is not None else None)
+        try:
+            r = self._get(self._url(function, q), call=call)
+            start = time.monotonic()
+            body = r.text if self._parse_text else r.content
+            e = self.parser(body)
+            if call is not None:
+                call.parse = time.monotonic() - start
+                call.bytes = len(r.content)
+                call.elements = _count_elements(e)
+        except Exception as error:
+            self._record(call, error)
+            raise
+        self._record(call)
+        self._cache_put(function, q, e, body)
         return e
 
+    def _execute(self, function, q, path=None, default=_RAISE, shard=None):
+        queries = _queries(q, self.chunk_size, shard)
+        if len(queries) == 1:
+            e = self._fetch(function, queries[0])
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(queries))) as executor:
+                e = _merge_documents(list(executor.map(lambda chunk: self._fetch(function, chunk), queries)))
+        return _extract(e, path, default)
+
     def events(self,
                from_date='0000-01-01',
                to_date='9999-12-31',
@@ -79,7 +1564,9 @@ class Eventor:
                organisation_ids=None,
                classification_ids=None,
                include_entry_breaks=False,
-               include_attributes=False):
+               include_attributes=False,
+               shard=None,
+               stream=False):
         """
         GET https://eventor.orientering.se/api/events
         Returnerar en lista med tävlingar som matchar sökparametrarna.
@@ -104,6 +1591,11 @@ class Eventor:
         Returnerat element
 
         EventList
+
+        shard  Dela upp datumintervallet i fönster per 'year', 'month', 'week' eller ett antal dagar (int) som hämtas
+            parallellt och slås ihop. Kräver att from_date och to_date anges.
+        stream  Sätt till True för att i stället få en generator som returnerar ett Event i taget medan svaret
+            laddas ner.
         """
         if include_entry_breaks:
             ieb = 'true'
@@ -129,6 +1621,10 @@ class Eventor:
         if classification_ids:
             q['classificationIds'] = format_list(classification_ids)
 
+        if stream:
+            return self._iterparse('events', q, 'Event')
+        if shard:
+            return self._execute('events', q, shard=('fromDate', 'toDate', shard))
         return self._execute('events', q)
 
     def events_documents(self,
@@ -242,7 +1738,7 @@ class Eventor:
             ip = 'false'
 
         q = {'includeProperties': ip}
-        return self._execute('organisations', q)['OrganisationList']['Organisation']
+        return self._execute('organisations', q, path=('OrganisationList', 'Organisation'))
 
     def organisation(self, organisation_id):
         """
@@ -258,7 +1754,7 @@ class Eventor:
         """
         return self._execute('organisation/{organisation_id}'.format(organisation_id=organisation_id), None)
 
-    def members_in_organisation(self, organisation_id, include_contact_details=False):
+    def members_in_organisation(self, organisation_id, include_contact_details=False, stream=False):
         """
         GET https://eventor.orientering.se/api/persons/organisations/{organisationId}
         Returnerar alla personer som är medlemmar i en organisation.
@@ -274,6 +1770,9 @@ class Eventor:
         Returnerat element
 
         PersonList
+
+        stream  Sätt till True för att i stället få en generator som returnerar en Person i taget medan svaret
+            laddas ner.
         """
         if include_contact_details:
             icd = 'true'
@@ -281,7 +1780,9 @@ class Eventor:
             icd = 'false'
         q = {'includeContactDetails': icd}
         url = 'persons/organisations/{organisation_id}'.format(organisation_id=organisation_id)
-        return self._execute(url, q)['PersonList']['Person']
+        if stream:
+            return self._iterparse(url, q, 'Person')
+        return self._execute(url, q, path=('PersonList', 'Person'), default=[])
 
     def competitors(self, organisation_id):
         """
@@ -298,7 +1799,7 @@ class Eventor:
         CompetitorList
         """
         q = {'organisationId': organisation_id}
-        return self._execute('competitors', q)['CompetitorList']['Competitor']
+        return self._execute('competitors', q, path=('CompetitorList', 'Competitor'), default=[])
 
     def external_login_url(self, person_id, organisation_id, include_contact_details=False):
         """
@@ -360,7 +1861,9 @@ class Eventor:
                 include_entry_fees=False,
                 include_person_element=False,
                 include_organisation_element=False,
-                include_event_element=False
+                include_event_element=False,
+                stream=False,
+                shard=None
                 ):
         """
         GET https://eventor.orientering.se/api/entries
@@ -395,6 +1898,11 @@ class Eventor:
         Returnerat element
 
         EntryList
+
+        stream  Sätt till True för att i stället få en generator som returnerar ett Entry i taget medan svaret
+            laddas ner.
+        shard  Dela upp tävlingsdatumintervallet i fönster per 'year', 'month', 'week' eller ett antal dagar (int)
+            som hämtas parallellt och slås ihop. Kräver att from_event_date och to_event_date anges.
         """
         if include_entry_fees:
             ief = 'true'
@@ -432,6 +1940,10 @@ class Eventor:
             q['eventIds'] = format_list(event_ids)
         if event_class_ids:
             q['eventClassIds'] = format_list(event_class_ids)
+        if stream:
+            return self._iterparse('entries', q, 'Entry')
+        if shard:
+            return self._execute('entries', q, shard=('fromEventDate', 'toEventDate', shard))
         return self._execute('entries', q)
 
     def competitor_count(self, organisation_ids, event_ids=None, person_ids=None):
@@ -459,7 +1971,7 @@ class Eventor:
             q['personIds'] = format_list(person_ids)
         return self._execute('competitorcount', q)
 
-    def start_times_per_event(self, event_id):
+    def start_times_per_event(self, event_id, stream=False):
         """
         GET https://eventor.orientering.se/api/starts/event
         Returnerar starttider för en tävling.
@@ -470,11 +1982,16 @@ class Eventor:
         Returnerat element
 
         StartList
+
+        stream  Sätt till True för att i stället få en generator som returnerar en ClassStart i taget medan svaret
+            laddas ner.
         """
         q = {'eventId': event_id}
+        if stream:
+            return self._iterparse('starts/event', q, 'ClassStart')
         return self._execute('starts/event', q)
 
-    def start_times_per_event_iofxml(self, event_id, event_race_id=None):
+    def start_times_per_event_iofxml(self, event_id, event_race_id=None, raw=None, checksum=None):
         """
         GET https://eventor.orientering.se/api/starts/event/iofxml
         Returnerar starttider i IOF XML 3.0-format för en tävling.
@@ -486,10 +2003,16 @@ class Eventor:
         Returnerat element
 
         IOF XML 3.0 StartList
+
+        raw  En sökväg eller ett filobjekt (binärt) som svaret skrivs till oförändrat i bitar medan det laddas ner,
+            utan avkodning eller tolkning. Returnerar då en RawDownload med antal byte.
+        checksum  Hashalgoritm (t ex 'sha256') för en kontrollsumma över svaret i RawDownload, endast med raw.
         """
         q = {'eventId': event_id}
         if event_race_id:
             q['eventRaceId'] = event_race_id
+        if raw is not None:
+            return self._copy_raw('starts/event/iofxml', q, raw, checksum)
         return self._execute('starts/event/iofxml', q)
 
     def start_times_per_person(self,
@@ -537,7 +2060,7 @@ class Eventor:
             q['eventId'] = event_id
         return self._execute('starts/organisation', q)
 
-    def results_per_event(self, event_id, include_split_times=False, top=None):
+    def results_per_event(self, event_id, include_split_times=False, top=None, stream=False):
         """
         GET https://eventor.orientering.se/api/results/event
         Returnerar resultat för en tävling.
@@ -551,6 +2074,9 @@ class Eventor:
         Returnerat element
 
         ResultList
+
+        stream  Sätt till True för att i stället få en generator som returnerar en ClassResult i taget medan svaret
+            laddas ner.
         """
         if include_split_times:
             ist = 'true'
@@ -561,13 +2087,18 @@ class Eventor:
         if top:
             q['top'] = top
 
+        if stream:
+            return self._iterparse('results/event', q, 'ClassResult')
         return self._execute('results/event', q)
 
     def results_per_event_iofxml(self,
                                  event_id,
                                  event_race_id=None,
                                  include_split_times=False,
-                                 total_result=False):
+                                 total_result=False,
+                                 stream=False,
+                                 raw=None,
+                                 checksum=None):
         """
         GET https://eventor.orientering.se/api/results/event/iofxml
         Returnerar resultat i IOF XML 3.0-format för en tävling.
@@ -581,6 +2112,12 @@ class Eventor:
         Returnerat element
 
         IOF XML 3.0 ResultList
+
+        stream  Sätt till True för att i stället få en generator som returnerar en ClassResult i taget medan svaret
+            laddas ner.
+        raw  En sökväg eller ett filobjekt (binärt) som svaret skrivs till oförändrat i bitar medan det laddas ner,
+            utan avkodning eller tolkning. Returnerar då en RawDownload med antal byte.
+        checksum  Hashalgoritm (t ex 'sha256') för en kontrollsumma över svaret i RawDownload, endast med raw.
         """
         if include_split_times:
             ist = 'true'
@@ -595,6 +2132,10 @@ class Eventor:
              'totalResult': tr}
         if event_race_id:
             q['eventRaceId'] = event_race_id
+        if raw is not None:
+            return self._copy_raw('results/event/iofxml', q, raw, checksum)
+        if stream:
+            return self._iterparse('results/event/iofxml', q, 'ClassResult')
         return self._execute('results/event/iofxml', q)
 
     def results_per_person(self,
@@ -635,10 +2176,7 @@ class Eventor:
             q['eventIds'] = format_list(event_ids)
         if top:
             q['top'] = top
-        try:
-            return self._execute('results/person', q)['ResultListList']['ResultList']
-        except TypeError:
-            return []
+        return self._execute('results/person', q, path=('ResultListList', 'ResultList'), default=[])
 
     def results_per_organisation(self,
                                  organisation_id,
@@ -675,7 +2213,8 @@ class Eventor:
             q['top'] = top
         return self._execute('results/organisation', q)
 
-    def activities(self, organisation_id, from_date='0000-01-01', to_date='9999-12-31', include_registrations=False):
+    def activities(self, organisation_id, from_date='0000-01-01', to_date='9999-12-31', include_registrations=False,
+                   stream=False):
         """
         GET https://eventor.orientering.se/api/activities
         Returnerar alla aktiviteter för en organisation (klubb) i en viss tidsperiod.
@@ -690,6 +2229,9 @@ class Eventor:
         Returnerat element
 
         ActivityList
+
+        stream  Sätt till True för att i stället få en generator som returnerar en Activity i taget medan svaret
+            laddas ner.
         """
         if include_registrations:
             ir = 'true'
@@ -699,10 +2241,9 @@ class Eventor:
              'from': from_date,
              'to': to_date,
              'includeRegistrations': ir}
-        try:
-            return self._execute('activities', q)['ActivityList']['Activity']
-        except TypeError:
-            return []
+        if stream:
+            return self._iterparse('activities', q, 'Activity')
+        return self._execute('activities', q, path=('ActivityList', 'Activity'), default=[])
 
     def activity(self, organisation_id, activity_id, include_registrations=False):
         """
@@ -741,4 +2282,4 @@ class Eventor:
 
         Competitor
         """
-        return self._execute('competitor/{personId}'.format(person_id), None)
+        return self._execute('competitor/{person_id}'.format(person_id=person_id), None)
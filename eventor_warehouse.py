@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Lokal SQLite-databas med tävlingar, klasser, organisationer, anmälningar, starttider och resultat från Eventor i
+normaliserade tabeller, så att återkommande frågor kan besvaras lokalt i stället för med nya anrop.
+
+    with Warehouse('eventor.db') as w:
+        w.load_organisations(e.organisations())
+        w.load_events(e.events(from_date='2018-01-01', to_date='2018-12-31', organisation_ids=[646]))
+        w.ingest_event(e, 17395, include_split_times=True)
+        rows = w.query('SELECT * FROM results JOIN event_classes c ON c.id = event_class_id '
+                       'WHERE organisation_id = ? AND c.name = ?', 646, 'H21')
+
+Varje load-metod skriver i en transaktion med executemany. Tävlingar, klasser, organisationer och anmälningar
+uppdateras efter Eventors id (upsert); starttider och resultat saknar egna id:n och ersätts per tävling, med en rad
+per person och lopp (event_race_id) i flerdagarstävlingar.
+Tider lagras som text 'åååå-mm-dd hh:mm:ss' och tidsangivelser som sekunder.
+"""
+import sqlite3
+
+from eventor_records import Entry, Event, EventClass, Organisation, Result, Start, _first, _get, _int, _items
+from eventor_toolkit import _as_list
+
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY, name TEXT, classification_id INTEGER, status_id INTEGER, discipline_id INTEGER,
+    form TEXT, start TEXT, finish TEXT, modified TEXT);
+CREATE TABLE IF NOT EXISTS event_organisers (
+    event_id INTEGER NOT NULL, organisation_id INTEGER NOT NULL, PRIMARY KEY (event_id, organisation_id));
+CREATE TABLE IF NOT EXISTS event_classes (
+    id INTEGER PRIMARY KEY, event_id INTEGER, name TEXT, short_name TEXT, sex TEXT, low_age INTEGER,
+    high_age INTEGER);
+CREATE TABLE IF NOT EXISTS organisations (
+    id INTEGER PRIMARY KEY, name TEXT, short_name TEXT, type_id INTEGER, parent_id INTEGER, modified TEXT);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY, event_id INTEGER, person_id INTEGER, organisation_id INTEGER, entry_date TEXT,
+    modified TEXT);
+CREATE TABLE IF NOT EXISTS entry_classes (
+    entry_id INTEGER NOT NULL, event_class_id INTEGER NOT NULL, PRIMARY KEY (entry_id, event_class_id));
+CREATE TABLE IF NOT EXISTS starts (
+    event_id INTEGER NOT NULL, event_class_id INTEGER, person_id INTEGER, organisation_id INTEGER,
+    start_time TEXT, card_number INTEGER, bib_number TEXT, event_race_id INTEGER);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY, event_id INTEGER NOT NULL, event_class_id INTEGER, person_id INTEGER,
+    organisation_id INTEGER, start_time TEXT, finish_time TEXT, time INTEGER, time_diff INTEGER, position INTEGER,
+    status TEXT, event_race_id INTEGER);
+CREATE TABLE IF NOT EXISTS splits (
+    result_id INTEGER NOT NULL, sequence INTEGER, control_code TEXT, time INTEGER);
+
+CREATE INDEX IF NOT EXISTS events_start ON events (start);
+CREATE INDEX IF NOT EXISTS event_organisers_organisation ON event_organisers (organisation_id);
+CREATE INDEX IF NOT EXISTS event_classes_event ON event_classes (event_id);
+CREATE INDEX IF NOT EXISTS organisations_parent ON organisations (parent_id);
+CREATE INDEX IF NOT EXISTS entries_event ON entries (event_id);
+CREATE INDEX IF NOT EXISTS entries_organisation ON entries (organisation_id);
+CREATE INDEX IF NOT EXISTS entries_person ON entries (person_id);
+CREATE INDEX IF NOT EXISTS entry_classes_class ON entry_classes (event_class_id);
+CREATE INDEX IF NOT EXISTS starts_event_class ON starts (event_id, event_class_id);
+CREATE UNIQUE INDEX IF NOT EXISTS starts_key ON starts (event_id, event_class_id, person_id, event_race_id);
+CREATE INDEX IF NOT EXISTS starts_organisation ON starts (organisation_id);
+CREATE INDEX IF NOT EXISTS starts_person ON starts (person_id);
+CREATE INDEX IF NOT EXISTS results_event_class ON results (event_id, event_class_id);
+CREATE UNIQUE INDEX IF NOT EXISTS results_key ON results (event_id, event_class_id, person_id, event_race_id);
+CREATE INDEX IF NOT EXISTS results_organisation ON results (organisation_id);
+CREATE INDEX IF NOT EXISTS results_person ON results (person_id);
+CREATE INDEX IF NOT EXISTS splits_result ON splits (result_id);
+"""
+
+MIGRATIONS = {1: ('ALTER TABLE starts ADD COLUMN event_race_id INTEGER',
+                  'ALTER TABLE results ADD COLUMN event_race_id INTEGER')}
+
+EVENT_COLUMNS = ('id', 'name', 'classification_id', 'status_id', 'discipline_id', 'form', 'start', 'finish',
+                 'modified')
+EVENT_CLASS_COLUMNS = EventClass.fields
+ORGANISATION_COLUMNS = Organisation.fields
+ENTRY_COLUMNS = ('id', 'event_id', 'person_id', 'organisation_id', 'entry_date', 'modified')
+START_COLUMNS = ('event_id', 'person_id', 'organisation_id', 'event_class_id', 'start_time', 'card_number',
+                 'bib_number', 'event_race_id')
+START_KEY = ('event_id', 'event_class_id', 'person_id', 'event_race_id')
+RESULT_COLUMNS = ('id', 'event_id', 'person_id', 'organisation_id', 'event_class_id', 'start_time', 'finish_time',
+                  'time', 'time_diff', 'position', 'status', 'event_race_id')
+
+
+def _value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat(' ')
+    return value
+
+
+def _row(record, columns, **values):
+    return tuple(_value(values[c]) if c in values else _value(getattr(record, c)) for c in columns)
+
+
+def _upsert(table, columns, key=('id',)):
+    return 'INSERT INTO {table} ({columns}) VALUES ({values}) ON CONFLICT ({key}) DO UPDATE SET {updates}'.format(
+        table=table, columns=', '.join(columns), values=', '.join('?' * len(columns)), key=', '.join(key),
+        updates=', '.join('{0} = excluded.{0}'.format(c) for c in columns if c not in key))
+
+
+def _insert(table, columns):
+    return 'INSERT INTO {table} ({columns}) VALUES ({values})'.format(
+        table=table, columns=', '.join(columns), values=', '.join('?' * len(columns)))
+
+
+def _class_items(doc, path):
+    """
+    Elementen i ett svar, eller elementen från stream=True i tur och ordning utan att samla dem i en lista.
+    """
+    return _items(doc, path) if isinstance(doc, dict) else doc
+
+
+def _class_id(element):
+    return _first(_int(_get(element, 'EventClassId')), _int(_get(element, 'EventClass', 'EventClassId')))
+
+
+class Warehouse:
+    """
+    path  Sökväg till databasfilen, standard ':memory:'. Tabellerna och indexen skapas om de saknas.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self.connection.execute('PRAGMA journal_mode = WAL')
+            self.connection.execute('PRAGMA synchronous = NORMAL')
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, SCHEMA_VERSION) and version not in MIGRATIONS:
+            raise ValueError('Okänd version av databasen: {version}'.format(version=version))
+        with self.connection:
+            for statement in MIGRATIONS.get(version, ()):
+                self.connection.execute(statement)
+            self.connection.executescript(SCHEMA)
+            self.connection.execute('PRAGMA user_version = {0}'.format(SCHEMA_VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def query(self, sql, *params):
+        """
+        Kör en SELECT-fråga och returnerar raderna som sqlite3.Row.
+        """
+        return self.connection.execute(sql, params).fetchall()
+
+    def load_events(self, doc):
+        """
+        Lägger till eller uppdaterar tävlingar ur svaret från Eventor.events eller Eventor.event (även en lista
+        med Event från stream=True). Returnerar antalet tävlingar.
+        """
+        records = [Event.from_dict(d) for d in _class_items(doc, ('EventList', 'Event'))]
+        with self.connection:
+            self.connection.executemany(_upsert('events', EVENT_COLUMNS),
+                                        [_row(r, EVENT_COLUMNS) for r in records])
+            self.connection.executemany('DELETE FROM event_organisers WHERE event_id = ?', [(r.id,) for r in records])
+            self.connection.executemany('INSERT OR IGNORE INTO event_organisers VALUES (?, ?)',
+                                        [(r.id, o) for r in records for o in r.organiser_ids if o is not None])
+        return len(records)
+
+    def load_event_classes(self, doc, event_id=None):
+        """
+        Lägger till eller uppdaterar klasser ur svaret från Eventor.event_classes. event_id används för klasser
+        som saknar EventId. Returnerar antalet klasser.
+        """
+        records = [EventClass.from_dict(d) for d in _class_items(doc, ('EventClassList', 'EventClass'))]
+        with self.connection:
+            self._upsert_classes(records, event_id)
+        return len(records)
+
+    def load_organisations(self, doc):
+        """
+        Lägger till eller uppdaterar organisationer ur svaret från Eventor.organisations. Returnerar antalet.
+        """
+        records = [Organisation.from_dict(d) for d in _class_items(doc, ('OrganisationList', 'Organisation'))]
+        with self.connection:
+            self.connection.executemany(_upsert('organisations', ORGANISATION_COLUMNS),
+                                        [_row(r, ORGANISATION_COLUMNS) for r in records])
+        return len(records)
+
+    def load_entries(self, doc):
+        """
+        Lägger till eller uppdaterar anmälningar ur svaret från Eventor.entries (även en lista med Entry från
+        stream=True). Returnerar antalet anmälningar.
+        """
+        records = [Entry.from_dict(d) for d in _class_items(doc, ('EntryList', 'Entry'))]
+        with self.connection:
+            self.connection.executemany(_upsert('entries', ENTRY_COLUMNS), [_row(r, ENTRY_COLUMNS) for r in records])
+            self.connection.executemany('DELETE FROM entry_classes WHERE entry_id = ?', [(r.id,) for r in records])
+            self.connection.executemany('INSERT OR IGNORE INTO entry_classes VALUES (?, ?)',
+                                        [(r.id, c) for r in records for c in r.event_class_ids if c is not None])
+        return len(records)
+
+    def load_starts(self, doc, event_id):
+        """
+        Ersätter alla starttider för tävlingen med dem i svaret från Eventor.start_times_per_event (även en lista med
+        ClassStart från stream=True), så att klasser som inte längre finns i svaret tas bort. En person får en rad
+        per lopp. Returnerar antalet starter.
+        """
+        count = 0
+        with self.connection:
+            self.connection.execute('DELETE FROM starts WHERE event_id = ?', (event_id,))
+            for class_start in _class_items(doc, ('StartList', 'ClassStart')):
+                event_class_id = _class_id(class_start)
+                self._upsert_classes(self._embedded_class(class_start), event_id)
+                rows = [_row(start, START_COLUMNS, event_id=event_id)
+                        for d in _as_list(class_start.get('PersonStart'))
+                        for start in Start.from_person_start(d, event_class_id)]
+                self.connection.executemany(_upsert('starts', START_COLUMNS, START_KEY), rows)
+                count += len(rows)
+        return count
+
+    def load_results(self, doc, event_id):
+        """
+        Ersätter alla resultat (och sträcktider) för tävlingen med dem i svaret från Eventor.results_per_event (även
+        en lista med ClassResult från stream=True), så att klasser som inte längre finns i svaret tas bort. En person
+        får en rad per lopp. Returnerar antalet resultat.
+        """
+        count = 0
+        with self.connection:
+            self.connection.execute('DELETE FROM splits WHERE result_id IN (SELECT id FROM results WHERE event_id = ?)',
+                                    (event_id,))
+            self.connection.execute('DELETE FROM results WHERE event_id = ?', (event_id,))
+            next_id = self.connection.execute('SELECT coalesce(max(id), 0) FROM results').fetchone()[0] + 1
+            for class_result in _class_items(doc, ('ResultList', 'ClassResult')):
+                event_class_id = _class_id(class_result)
+                self._upsert_classes(self._embedded_class(class_result), event_id)
+                results = {}
+                for d in _as_list(class_result.get('PersonResult')):
+                    for result in Result.from_person_result(d, event_class_id):
+                        key = (result.person_id, result.event_race_id) if result.person_id is not None else len(results)
+                        results[key] = result
+                rows = []
+                splits = []
+                for result in results.values():
+                    rows.append(_row(result, RESULT_COLUMNS, id=next_id, event_id=event_id))
+                    splits.extend((next_id, s.sequence, s.control_code, s.time) for s in result.splits)
+                    next_id += 1
+                self.connection.executemany(_insert('results', RESULT_COLUMNS), rows)
+                self.connection.executemany('INSERT INTO splits VALUES (?, ?, ?, ?)', splits)
+                count += len(rows)
+        return count
+
+    def ingest_event(self, eventor, event_id, include_split_times=False):
+        """
+        Hämtar tävlingen, dess klasser, starttider och resultat från eventor och lägger in dem.
+        """
+        self.load_events(eventor.event(event_id))
+        self.load_event_classes(eventor.event_classes(event_id), event_id)
+        self.load_starts(eventor.start_times_per_event(event_id, stream=True), event_id)
+        self.load_results(eventor.results_per_event(event_id, include_split_times=include_split_times, stream=True),
+                          event_id)
+
+    @staticmethod
+    def _embedded_class(element):
+        event_class = element.get('EventClass')
+        return [EventClass.from_dict(event_class)] if isinstance(event_class, dict) else []
+
+    def _upsert_classes(self, records, event_id):
+        self.connection.executemany(_upsert('event_classes', EVENT_CLASS_COLUMNS), [
+            _row(r, EVENT_CLASS_COLUMNS, event_id=_first(r.event_id, _int(event_id))) for r in records])
@@ -27,22 +27,32 @@ setup(
 
         'License :: OSI Approved :: MIT License',
 
-        'Programming Language :: Python :: 2',
-        'Programming Language :: Python :: 2.6',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
     keywords='Eventor orienteering development',
-    py_modules=['eventor_toolkit'],
+    python_requires='>=3.7',
+    py_modules=['eventor_toolkit', 'eventor_async', 'eventor_sync', 'eventor_records',
+                'eventor_analytics', 'eventor_organisations', 'eventor_live', 'eventor_cli',
+                'eventor_documents', 'eventor_warehouse', 'eventor_pipeline',
+                'eventor_pool'],
+    entry_points={
+        'console_scripts': ['eventor=eventor_cli:main'],
+    },
     install_requires=[
         'requests',
-        'xmltodict'
+        'xmltodict',
     ],
     extras_require={
         'dev': ['check-manifest'],
         'test': ['coverage'],
+        'async': ['aiohttp'],
+        'analytics': ['numpy'],
+        'parquet': ['pyarrow'],
     },
 )
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import eventor_analytics  # noqa: E402
+from eventor_records import Result, SplitTime  # noqa: E402
+
+
+def result(person_id, splits, time, status='OK'):
+    return Result(person_id=person_id, event_class_id=1, time=time, status=status,
+                  splits=tuple(SplitTime(sequence=i + 1, control_code=str(31 + i), time=t)
+                               for i, t in enumerate(splits)))
+
+
+def test_split_analysis():
+    analysis = eventor_analytics.SplitAnalysis.from_results([
+        result(1, [60, 120, 180], 240),
+        result(2, [70, 250, 310], 370),
+        result(3, [60, None, 200], None, status='MisPunch'),
+    ])
+    assert analysis.controls == ('31', '32', '33', 'F')
+    assert analysis.missing.tolist() == [[False] * 4, [False] * 4, [False, True, False, True]]
+    assert np.array_equal(analysis.leg_times()[:2], [[60, 60, 60, 60], [70, 180, 60, 60]])
+    assert analysis.cumulative_ranks().tolist() == [[1, 1, 1, 1], [3, 2, 3, 2], [1, 0, 2, 0]]
+    assert analysis.leg_ranks()[:, 1].tolist() == [1, 2, 0]
+    assert np.array_equal(analysis.leg_time_behind()[1], [10, 120, 0, 0])
+    mistakes = analysis.mistakes()
+    assert mistakes[1, 1] == pytest.approx(180 - 60 * 13 / 12.0)
+    assert mistakes[0].tolist() == [0, 0, 0, 0]
+
+
+def test_analyse_groups_classes():
+    import xmltodict
+    from tests.eventor_test import result_list_xml
+
+    analyses = eventor_analytics.analyse(xmltodict.parse(result_list_xml(3, 4)))
+    assert sorted(analyses) == [0, 1, 2]
+    assert analyses[0].times.shape == (4, 2)
+
+
+def test_analyse_unwraps_race_results():
+    import xmltodict
+    from tests.eventor_records_test import MULTI_RACE_XML
+
+    analyses = eventor_analytics.analyse(xmltodict.parse(MULTI_RACE_XML))
+    assert sorted(analyses) == [(7, 71), (7, 72)]
+    assert analyses[(7, 71)].person_ids.tolist() == [1, 2]
+    assert analyses[(7, 71)].times[:, -1].tolist() == [1800, 1875]
+    assert analyses[(7, 72)].person_ids.tolist() == [1]
+    assert np.isnan(analyses[(7, 72)].times[0, -1])
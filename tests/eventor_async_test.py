@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+import pytest
+
+from tests.fake_eventor import FakeEventorServer
+
+pytest.importorskip('aiohttp')
+
+from eventor_async import AsyncEventor  # noqa: E402
+
+ORGANISATIONS_XML = ('<?xml version="1.0" encoding="utf-8"?><OrganisationList>'
+                     '<Organisation><OrganisationId>1</OrganisationId></Organisation>'
+                     '<Organisation><OrganisationId>2</OrganisationId></Organisation>'
+                     '</OrganisationList>')
+
+
+def event_xml(q):
+    return '<Event><EventId>1</EventId></Event>'
+
+
+def test_async_fan_out_is_bounded_and_concurrent():
+    async def run(url):
+        async with AsyncEventor('KEY', api_url=url, concurrency=4) as e:
+            return await asyncio.gather(*[e.event(i) for i in range(12)])
+
+    responses = dict(('event/{0}'.format(i), event_xml) for i in range(12))
+    with FakeEventorServer(responses, latency=0.05) as server:
+        start = time.perf_counter()
+        results = asyncio.run(run(server.url))
+        elapsed = time.perf_counter() - start
+    assert [r['Event']['EventId'] for r in results] == ['1'] * 12
+    assert server.max_in_flight == 4
+    assert elapsed < 12 * 0.05
+
+
+def test_async_shares_query_building_with_sync():
+    async def run(url):
+        async with AsyncEventor('KEY', api_url=url) as e:
+            organisations = await e.organisations(include_properties=True)
+            activities = await e.activities(1, from_date='2018-01-01', to_date='2018-12-31')
+            return organisations, activities
+
+    responses = {'organisations': ORGANISATIONS_XML, 'activities': '<ActivityList />'}
+    with FakeEventorServer(responses) as server:
+        organisations, activities = asyncio.run(run(server.url))
+    assert [o['OrganisationId'] for o in organisations] == ['1', '2']
+    assert activities == []
+    assert server.requests[0][:2] == ('organisations', {'includeProperties': 'true'})
+    assert server.requests[1][1]['from'] == '2018-01-01'
+
+
+def test_async_stream_yields_entries():
+    async def run(url):
+        async with AsyncEventor('KEY', api_url=url) as e:
+            return [entry['EntryId'] async for entry in e.entries(event_ids=[1], stream=True)]
+
+    entries = '<EntryList>{0}</EntryList>'.format(''.join('<Entry><EntryId>{0}</EntryId></Entry>'.format(i)
+                                                          for i in range(5)))
+    with FakeEventorServer({'entries': entries}) as server:
+        assert asyncio.run(run(server.url)) == ['0', '1', '2', '3', '4']
+
+
+def test_async_stream_splits_long_id_lists_and_records_early_stops():
+    from eventor_toolkit import Metrics
+
+    async def run(url, calls):
+        async with AsyncEventor('KEY', api_url=url, chunk_size=2, metrics=Metrics([calls.append])) as e:
+            streamed = [entry async for entry in e.entries(event_ids=[1, 2, 3], stream=True)]
+            stream = e.entries(event_ids=[1], stream=True)
+            await stream.__anext__()
+            await stream.aclose()
+            return len(streamed)
+
+    calls = []
+    entries = '<EntryList><Entry><EntryId>1</EntryId></Entry><Entry><EntryId>2</EntryId></Entry></EntryList>'
+    with FakeEventorServer({'entries': entries}) as server:
+        assert asyncio.run(run(server.url, calls)) == 4
+        assert [q['eventIds'] for _, q, _ in server.requests] == ['1,2', '3', '1']
+    assert [call.elements for call in calls] == [2, 2, 1]
+
+
+def test_async_identical_calls_are_coalesced():
+    async def run(url):
+        async with AsyncEventor('KEY', api_url=url) as e:
+            results = await asyncio.gather(*[e.event(1) for _ in range(5)])
+            return results, e.coalesced
+
+    with FakeEventorServer({'event/1': event_xml}, latency=0.05) as server:
+        results, coalesced = asyncio.run(run(server.url))
+    assert coalesced == 4
+    assert len(server.requests) == 1
+
+
+def test_async_external_login_urls_are_not_coalesced():
+    async def run(url):
+        async with AsyncEventor('KEY', api_url=url) as e:
+            await asyncio.gather(*[e.external_login_url(1, 646) for _ in range(2)])
+            return e.coalesced
+
+    with FakeEventorServer.synthetic(latency=0.05) as server:
+        assert asyncio.run(run(server.url)) == 0
+    assert len(server.requests) == 2
+
+
+def test_async_retries_throttled_and_raises_on_errors():
+    from eventor_toolkit import EventorError, Metrics
+
+    calls = []
+
+    async def run(url):
+        async with AsyncEventor('KEY', api_url=url, backoff_factor=0, metrics=Metrics([calls.append])) as e:
+            event = await e.event(1)
+            with pytest.raises(EventorError):
+                await e.event(2)
+            return event
+
+    with FakeEventorServer({'event/1': event_xml}) as server:
+        server.status_next = [(429, {'Retry-After': '0'}), (200, {}), (404, {})]
+        assert asyncio.run(run(server.url))['Event']['EventId'] == '1'
+    assert len(server.requests) == 3
+    assert [(c.endpoint, c.status, c.retries, c.elements) for c in calls] == [
+        ('event', 200, 1, 1), ('event', 404, 0, None)]
+    assert isinstance(calls[1].error, EventorError)
+
+
+def test_async_iofxml_raw_passthrough():
+    import io
+    from eventor_toolkit import Metrics
+
+    calls = []
+
+    async def run(url):
+        async with AsyncEventor('KEY', api_url=url, metrics=Metrics([calls.append])) as e:
+            f = io.BytesIO()
+            download = await e.start_times_per_event_iofxml(1, raw=f, checksum='md5')
+            return download, f.getvalue()
+
+    with FakeEventorServer.synthetic() as server:
+        download, body = asyncio.run(run(server.url))
+    assert download.bytes == len(body) and len(download.checksum) == 32 and b'<StartList' in body
+    assert [(c.endpoint, c.status, c.bytes) for c in calls] == [('starts/event/iofxml', 200, len(body))]
+
+
+def test_async_cancelled_leader_does_not_strand_followers():
+    async def run(url):
+        async with AsyncEventor('KEY', api_url=url) as e:
+            leader = asyncio.ensure_future(e.event(1))
+            await asyncio.sleep(0.05)
+            follower = asyncio.ensure_future(e.event(1))
+            await asyncio.sleep(0.05)
+            leader.cancel()
+            event = await asyncio.wait_for(follower, 5)
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return event, e._flights._flights
+
+    with FakeEventorServer({'event/1': event_xml}, latency=0.2) as server:
+        event, flights = asyncio.run(run(server.url))
+    assert event['Event']['EventId'] == '1'
+    assert flights == {}
+    assert len(server.requests) == 2
+
+
+def test_async_batch_helpers_await_each_call():
+    async def run(url):
+        async with AsyncEventor('KEY', api_url=url) as e:
+            events = await e.events_by_id([1, 2, 3], workers=1)
+            mapped = await e.map('event', [(1,), {'event_id': 3}])
+            return events, mapped
+
+    responses = {'event/1': event_xml, 'event/3': event_xml}
+    with FakeEventorServer(responses) as server:
+        server.status_next = [(200, {}), (404, {})]
+        events, mapped = asyncio.run(run(server.url))
+    assert [r.index for r in events] == [0, 1, 2]
+    assert [r.ok for r in events].count(False) == 1
+    assert all(r.value['Event']['EventId'] == '1' for r in events if r.ok)
+    assert [r.value['Event']['EventId'] for r in mapped] == ['1', '1']
+
+
+def test_async_primitives_are_created_in_the_running_loop():
+    from eventor_toolkit import AdaptiveLimiter
+
+    e = AsyncEventor('KEY', concurrency=2, limiter=AdaptiveLimiter(maximum=2))
+    assert e._semaphore is None and e._limiter_condition is None
+
+    async def run(url):
+        e.api_url = url
+        async with e:
+            await asyncio.gather(*[e.event(i) for i in range(4)])
+            return e._semaphore
+
+    responses = dict(('event/{0}'.format(i), event_xml) for i in range(4))
+    with FakeEventorServer(responses, latency=0.05) as server:
+        assert asyncio.run(run(server.url)) is not None
+    assert server.max_in_flight == 2
+
+
+def test_async_stream_and_raw_share_limits_and_retries():
+    import io
+    from eventor_toolkit import AdaptiveLimiter
+
+    limiter = AdaptiveLimiter(maximum=2, cooldown=0)
+
+    async def run(url):
+        async with AsyncEventor('KEY', api_url=url, backoff_factor=0, limiter=limiter) as e:
+            entries = [entry['EntryId'] async for entry in e.entries(event_ids=[1], stream=True)]
+            f = io.BytesIO()
+            await e.start_times_per_event_iofxml(1, raw=f)
+            return entries, f.getvalue()
+
+    with FakeEventorServer.synthetic() as server:
+        server.status_next = [(503, {}), (200, {}), (429, {'Retry-After': '0'})]
+        entries, body = asyncio.run(run(server.url))
+    assert len(entries) == 40 and b'<StartList' in body
+    assert [function for function, q, headers in server.requests] == [
+        'entries', 'entries', 'starts/event/iofxml', 'starts/event/iofxml']
+    assert (limiter.decreases, limiter.in_flight) == (2, 0)
+
+
+def test_async_bypass_cache_follows_the_task():
+    from eventor_toolkit import ResponseCache
+
+    async def run(url):
+        async with AsyncEventor('KEY', api_url=url, cache=ResponseCache()) as e:
+            await e.event(1)
+            with e.bypass_cache():
+                await asyncio.gather(e.event(1), asyncio.sleep(0))
+            await asyncio.gather(e.event(1), e.event(1))
+
+    with FakeEventorServer({'event/1': event_xml}) as server:
+        asyncio.run(run(server.url))
+    assert len(server.requests) == 2
+
+
+def test_async_process_parser_does_not_block_the_loop():
+    from eventor_toolkit import ProcessParser, _parse_expat
+    from tests.fake_eventor import synthetic_responses
+
+    body = synthetic_responses(4)['results/event']({'includeSplitTimes': 'true'})
+
+    async def run(parser, url):
+        ticks = 0
+        parsing = asyncio.ensure_future(parser.parse_async(body))
+        while not parsing.done():
+            ticks += 1
+            await asyncio.sleep(0.001)
+        async with AsyncEventor('KEY', api_url=url, parser=parser) as e:
+            return parsing.result(), ticks, await e.results_per_event(1, include_split_times=True)
+
+    with FakeEventorServer.synthetic() as server, ProcessParser(processes=1) as parser:
+        parsed, ticks, fetched = asyncio.run(run(parser, server.url))
+    assert parsed == _parse_expat(body) and ticks > 1
+    assert fetched == _parse_expat(synthetic_responses()['results/event']({'includeSplitTimes': 'true'}))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import csv
+import json
+
+from eventor_cli import main
+from tests.fake_eventor import FakeEventorServer
+
+
+def test_export_results_csv_and_resume(tmp_path):
+    output = str(tmp_path / 'results.csv')
+    with FakeEventorServer.synthetic() as server:
+        args = ['--api-key', 'KEY', '--api-url', server.url, 'export', 'results', '--event-ids', '1,2,3',
+                '--split-times', '--format', 'csv', '-o', output, '--workers', '1']
+        server.status_next = [(200, {}), (500, {})]
+        assert main(args) == 1
+        with open(output) as f:
+            assert len(list(csv.DictReader(f))) == 400
+        assert json.load(open(output + '.progress'))['done'] == ['1', '3']
+
+        assert main(args + ['--resume']) == 0
+        assert [r[1]['eventId'] for r in server.requests] == ['1', '2', '3', '2']
+    with open(output) as f:
+        rows = list(csv.DictReader(f))
+    assert [len([r for r in rows if r['event_id'] == i]) for i in '123'] == [200, 200, 200]
+    assert rows[0]['person_id'] == '1000' and len(json.loads(rows[0]['splits'])) == 15
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['results.csv']
+
+
+def test_export_members_ndjson_to_stdout(capsys):
+    with FakeEventorServer.synthetic() as server:
+        assert main(['--api-key', 'KEY', '--api-url', server.url, 'export', 'members',
+                     '--organisation-ids', '100']) == 0
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(rows) == 50
+    assert rows[0] == {'id': 1000, 'family': u'Andersson', 'given': u'Anna', 'sex': 'M',
+                       'birth_date': '1950-01-10T00:00:00', 'organisation_id': 100}
+
+
+def test_export_activities_streams_rows(capsys):
+    with FakeEventorServer.synthetic() as server:
+        assert main(['--api-key', 'KEY', '--api-url', server.url, 'export', 'activities',
+                     '--organisation-ids', '100', '--format', 'csv']) == 0
+    rows = list(csv.DictReader(capsys.readouterr().out.splitlines()))
+    assert [row['id'] for row in rows] == [str(i) for i in range(1, 11)]
+    assert rows[0]['name'] == u'Träning 1' and rows[0]['registration_deadline'] == '2018-05-01 12:00:00'
+
+
+def test_export_to_stdout_removes_parts_on_failure(tmp_path, monkeypatch, capsys):
+    import tempfile
+
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    with FakeEventorServer.synthetic() as server:
+        server.status_next = [(500, {})]
+        assert main(['--api-key', 'KEY', '--api-url', server.url, 'export', 'results', '--event-ids', '1,2',
+                     '--workers', '1']) == 1
+    assert len(capsys.readouterr().out.splitlines()) == 200
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+
+from eventor_documents import DocumentMirror
+from eventor_toolkit import Eventor
+from tests.fake_eventor import FakeEventorServer
+
+PM = b'%PDF-1.4 PM ' + b'x' * 200000
+MAP = b'%PDF-1.4 map'
+
+
+def test_document_mirror_dedupes_resumes_and_skips_unchanged(tmp_path):
+    with FakeEventorServer(etags=True) as server:
+        document = '<Document id="{0}" name="PM" url="{1}files/{2}" referenceId="{3}" {4}/>'
+        server.responses.update({
+            'events/documents': '<DocumentList>{0}</DocumentList>'.format(''.join([
+                document.format(1, server.url, 'pm-1', 1, 'modifyDate="2018-05-01 12:00:00"'),
+                document.format(2, server.url, 'pm-2', 2, 'modifyDate="2018-05-01 12:00:00"'),
+                document.format(3, server.url, 'map', 2, '')])),
+            'files/pm-1': PM, 'files/pm-2': PM, 'files/map': MAP})
+        directory = str(tmp_path / 'documents')
+        with Eventor('KEY', api_url=server.url) as e:
+            mirror = DocumentMirror(e, directory, workers=1)
+            for document_id, validator in (('1', None), ('3', '"{0}"'.format(hashlib.sha1(MAP).hexdigest()))):
+                with open(os.path.join(directory, 'partial', document_id), 'wb') as f:
+                    f.write(b'stale content' if validator is None else MAP[:4])
+                if validator:
+                    with open(os.path.join(directory, 'partial', document_id + '.validator'), 'w') as f:
+                        f.write(validator)
+            report = mirror.mirror(from_date='2018-05-01')
+            assert sorted(report.downloaded) == ['1', '2', '3'] and report.failed == {}
+            assert len(report.deduplicated) == 1
+            restarted = [r[2].get('Range') for r in server.requests if r[0] == 'files/pm-1']
+            assert restarted == [None]
+            resumed = [(r[2].get('Range'), r[2].get('If-Range')) for r in server.requests if r[0] == 'files/map']
+            assert resumed == [('bytes=4-', validator)]
+            with open(mirror.path(3), 'rb') as f:
+                assert f.read() == MAP
+            with open(mirror.path(1), 'rb') as f:
+                assert f.read() == PM
+            assert mirror.path(1) == mirror.path(2) != mirror.path(3)
+            assert sorted(os.listdir(os.path.join(directory, 'objects'))) == sorted(
+                os.path.basename(os.path.dirname(mirror.path(i))) for i in (1, 3))
+            assert os.listdir(os.path.join(directory, 'partial')) == []
+
+            del server.requests[:]
+            report = DocumentMirror(e, directory).mirror(from_date='2018-05-01')
+            assert (sorted(report.unchanged), report.downloaded) == (['1', '2', '3'], [])
+            assert [r[0] for r in server.requests] == ['events/documents', 'files/map']
+            assert server.requests[1][2]['If-None-Match']
+
+
+def test_document_mirror_restarts_once_on_bad_content_range(tmp_path):
+    from eventor_toolkit import AdaptiveLimiter, EventorError, Metrics
+
+    with FakeEventorServer(etags=True) as server:
+        server.responses.update({
+            'events/documents': '<DocumentList><Document id="1" url="{0}files/map" /></DocumentList>'.format(
+                server.url.replace('127.0.0.1', 'localhost')),
+            'files/map': MAP})
+        directory = str(tmp_path / 'documents')
+        calls = []
+        limiter = AdaptiveLimiter(maximum=2)
+        with Eventor('KEY', api_url=server.url, limiter=limiter, metrics=Metrics([calls.append])) as e:
+            mirror = DocumentMirror(e, directory, workers=1)
+            bad_range = (206, {'Content-Range': 'bytes 0-3/12'})
+            for bad_responses in (1, 2):
+                with open(os.path.join(directory, 'partial', '1'), 'wb') as f:
+                    f.write(MAP[:4])
+                with open(os.path.join(directory, 'partial', '1.validator'), 'w') as f:
+                    f.write('"stale"')
+                del server.requests[:]
+                server.status_next = [(200, {})] + [bad_range] * bad_responses
+                report = mirror.mirror()
+                requests = [r[2] for r in server.requests if r[0] == 'files/map']
+                assert [r.get('Range') for r in requests] == ['bytes=4-', None]
+                assert all('ApiKey' not in r for r in requests)
+                if bad_responses == 1:
+                    assert report.downloaded == ['1']
+                    with open(mirror.path(1), 'rb') as f:
+                        assert f.read() == MAP
+                    mirror.store.records('documents').clear()
+            assert report.downloaded == [] and isinstance(report.failed['1'], EventorError)
+    documents = [call for call in calls if call.endpoint == 'document']
+    assert [call.status for call in documents] == [206, 200, 206, 206]
+    assert documents[-1].error is report.failed['1']
+    assert limiter.in_flight == 0
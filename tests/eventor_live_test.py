@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from eventor_live import LiveResults
+from eventor_toolkit import Eventor
+from tests.fake_eventor import FakeEventorServer, synthetic_responses
+
+
+def test_live_results_emit_only_changed_rows():
+    responses = synthetic_responses()
+    full = responses['results/event']({})
+    responses['results/event'] = full
+    with FakeEventorServer(responses) as server:
+        with Eventor('KEY', api_url=server.url) as e:
+            live = LiveResults(e, [1], min_interval=5, max_interval=20, backoff=2)
+            assert len(live.poll(now=0)) == 200
+            assert live.poll(now=1) == []
+            assert live.poll(now=5) == [] and live.unchanged == 1
+
+            responses['results/event'] = full.replace('<Time>26:40</Time>', '<Time>26:00</Time>', 1)
+            assert live.poll(now=14) == []
+            changes = live.poll(now=15)
+            assert [(c.event_class_id, c.key, c.old.time, c.new.time) for c in changes] == [(100, 1000, 1600, 1560)]
+            assert (live.requests, live.parsed, live.unchanged) == (3, 2, 1)
+
+            server.status_next = [(304, {})]
+            assert live.poll(now=20) == [] and live.not_modified == 1
+            assert server.requests[-1][1] == {'eventId': '1', 'includeSplitTimes': 'false'}
+
+
+def test_live_results_failed_event_does_not_abort_cycle():
+    errors = []
+    with FakeEventorServer(synthetic_responses()) as server:
+        with Eventor('KEY', api_url=server.url) as e:
+            live = LiveResults(e, [1, 2], min_interval=5, max_interval=20, backoff=2,
+                               on_error=lambda event_id, error: errors.append((event_id, error.status_code)))
+            server.status_next = [(404, {})]
+            changes = live.poll(now=0)
+            assert set(c.event_id for c in changes) == {2} and len(changes) == 200
+            assert errors == [(1, 404)] and list(live.failed) == [1]
+
+            assert live.poll(now=5) == []
+            assert [q['eventId'] for function, q, headers in server.requests] == ['1', '2', '2']
+            assert len(live.poll(now=10)) == 200
+            assert live.failed == {}
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from eventor_organisations import CLUB, DISTRICT, OrganisationIndex
+
+
+def test_organisation_index_lookup_tree_and_snapshot(tmp_path):
+    from eventor_toolkit import Eventor
+    from tests.fake_eventor import FakeEventorServer
+
+    with FakeEventorServer.synthetic() as server:
+        with Eventor('KEY', api_url=server.url) as e:
+            index = OrganisationIndex.from_eventor(e)
+        assert server.requests[0][1]['includeProperties'] == 'true'
+
+    assert len(index) == 46
+    assert index[100].name == 'OK Klubb 100' and 999 not in index
+    assert index.parent(100).id == 2 and index.district_of(100).type_id == DISTRICT
+    assert [o.id for o in index.ancestors(100)] == [2, 1]
+    assert [o.id for o in index.children(2)] == [100, 105, 110, 115, 120, 125, 130, 135]
+    assert len(index.clubs_in(1)) == 40 and all(o.type_id == CLUB for o in index.clubs_in(1))
+    assert [o.id for o in index.search(u'kl10')] == [100, 101, 102, 103, 104, 105, 106, 107, 108, 109]
+    assert [o.id for o in index.search(u'SVENSKA')] == [1]
+    assert index.search(u'finns inte') == []
+
+    index.save(str(tmp_path / 'organisations.bin'))
+    loaded = OrganisationIndex.load(str(tmp_path / 'organisations.bin'))
+    assert list(loaded) == list(index)
+    assert [o.id for o in loaded.clubs_in(2)] == [o.id for o in index.clubs_in(2)]
+    assert [o.id for o in loaded.search(u'distrikt 3')] == [3]
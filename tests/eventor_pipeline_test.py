@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from eventor_pipeline import SeasonPipeline, warehouse_sink
+from eventor_toolkit import Eventor
+from eventor_warehouse import Warehouse
+from tests.fake_eventor import FakeEventorServer, _event, synthetic_responses
+
+
+def test_season_pipeline_runs_stages_and_resumes(tmp_path):
+    responses = synthetic_responses()
+    results = responses['results/event']
+    broken = set(['2'])
+    responses['events'] = lambda q: '<EventList>{0}{1}{2}</EventList>'.format(_event(1), _event(2), _event(3, 10))
+    responses['results/event'] = lambda q: '<ResultList' if q['eventId'] in broken else results(q)
+    checkpoint = str(tmp_path / 'checkpoint.json')
+
+    with FakeEventorServer(responses, latency=0.01) as server, Warehouse() as w:
+        with Eventor('KEY', api_url=server.url) as e:
+            report = SeasonPipeline(e, checkpoint, warehouse_sink(w), workers=3).run(from_date='2018-01-01')
+            assert (report.events, report.skipped) == (3, ['3'])
+            assert sorted(report.completed) == sorted(
+                [(i, s) for i in '12' for s in ('event_classes', 'event_entryfees', 'entries', 'start_times')] +
+                [('1', 'results')])
+            assert list(report.failed) == [('2', 'results')]
+            assert server.max_in_flight <= 3
+            assert not [q for function, q, headers in server.requests if '3' in (q.get('eventId'), q.get('eventIds'))]
+            functions = [function for function, q, headers in server.requests if q.get('eventId') == '1']
+            assert functions.index('starts/event') < functions.index('results/event')
+
+            broken.clear()
+            server.requests = []
+            report = SeasonPipeline(e, checkpoint, warehouse_sink(w), workers=3).run(from_date='2018-01-01')
+            assert (len(report.resumed), report.completed, report.failed) == (9, [('2', 'results')], {})
+            assert [request[0] for request in server.requests] == ['events', 'results/event']
+
+        assert [tuple(r) for r in w.query('SELECT event_id, count(*) FROM results GROUP BY event_id')] == [
+            (1, 200), (2, 200)]
+        assert w.query('SELECT count(*) FROM entries')[0][0] == 80
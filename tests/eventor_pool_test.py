@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from eventor_pool import ClientPool
+from tests.fake_eventor import FakeEventorServer, _event, _event_class, _person, synthetic_responses
+
+
+def test_client_pool_fans_out_per_organisation_key():
+    api_keys = {'KEY100': 100, 'KEY101': 101, 'KEY102': 102}
+    with FakeEventorServer(synthetic_responses(), latency=0.05, api_keys=api_keys) as server:
+        with ClientPool(['KEY100', 'KEY101', 'BAD', 'KEY102', 'KEY100B'], api_url=server.url, rate=100) as pool:
+            assert sorted(pool.organisations) == [100, 101, 102]
+            assert sorted(pool.unresolved) == [2, 4]
+            assert pool.client(101).api_key == 'KEY101'
+            assert len(set(id(client.transport) for client in pool.clients)) == 1
+
+            server.requests = []
+            server.max_in_flight = 0
+            members = pool.collect('members_in_organisation', include_contact_details=True)
+            assert (sorted(members.by_organisation), members.failed) == ([100, 101, 102], {})
+            assert len(members.value) == 150
+            assert server.max_in_flight == 3
+            calls = sorted((function, headers['ApiKey']) for function, q, headers in server.requests)
+            assert calls == [('persons/organisations/100', 'KEY100'), ('persons/organisations/101', 'KEY101'),
+                             ('persons/organisations/102', 'KEY102')]
+
+            results = pool.collect('results_per_organisation', organisation_ids=[100, 102, 999], event_id=1)
+            assert list(results.failed) == [999]
+            assert sorted(q['organisationIds'] for function, q, headers in server.requests[-2:]) == ['100', '102']
+            assert len(results.value['ResultList']['ClassResult']) == 10
+            starts = pool.collect('start_times_per_organisation', event_id=1)
+            assert sorted(q['organisationIds'] for function, q, headers in server.requests[-3:]) == [
+                '100', '101', '102']
+            assert 'StartList' in starts.value
+
+
+def _club_results(q):
+    organisation_id = int(q['organisationIds'])
+    persons = ''.join('<PersonResult>{0}<OrganisationId>{1}</OrganisationId><Result><Time>30:00</Time>'
+                      '<CompetitorStatus value="OK" /></Result></PersonResult>'.format(_person(n), organisation_id)
+                      for n in range(organisation_id - 100, organisation_id - 98))
+    return '<ResultList>{0}<ClassResult>{1}{2}</ClassResult></ResultList>'.format(
+        _event(1, 9), _event_class(1, 0), persons)
+
+
+def test_client_pool_merges_classes_across_organisations():
+    responses = dict(synthetic_responses(), **{'results/organisation': _club_results})
+    with FakeEventorServer(responses, api_keys={'KEY100': 100, 'KEY101': 101}) as server:
+        with ClientPool(['KEY100', 'KEY101'], api_url=server.url) as pool:
+            results = pool.collect('results_per_organisation', event_id=1)
+    class_result = results.value['ResultList']['ClassResult']
+    assert class_result['EventClass']['EventClassId'] == '100'
+    assert [p['Person']['PersonId'] for p in class_result['PersonResult']] == ['1000', '1001', '1002']
+    assert results.value['ResultList']['Event']['EventId'] == '1'
+    first = results.by_organisation[100]['ResultList']['ClassResult']['PersonResult']
+    assert [p['Person']['PersonId'] for p in first] == ['1000', '1001']
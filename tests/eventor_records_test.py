@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import xmltodict
+
+import eventor_records
+from tests.eventor_test import result_list_xml
+
+EVENTS_XML = ('<EventList><Event eventForm="IndSingleDay"><EventId>10</EventId><Name>Natt-KM</Name>'
+              '<EventClassificationId>5</EventClassificationId><EventStatusId>3</EventStatusId>'
+              '<StartDate><Date>2018-05-01</Date><Clock>18:30:00</Clock></StartDate>'
+              '<Organiser><OrganisationId>646</OrganisationId></Organiser></Event></EventList>')
+
+
+def test_event_records():
+    events = eventor_records.events(xmltodict.parse(EVENTS_XML), keep_raw=True)
+    assert len(events) == 1
+    event = events[0]
+    assert (event.id, event.classification_id, event.form) == (10, 5, 'IndSingleDay')
+    assert event.start == datetime(2018, 5, 1, 18, 30)
+    assert event.organiser_ids == (646,)
+    assert event.raw['Name'] == 'Natt-KM'
+    assert eventor_records.events(xmltodict.parse('<EventList />')) == []
+
+
+def test_event_records_with_several_organisers():
+    xml = EVENTS_XML.replace('<OrganisationId>646</OrganisationId>',
+                             '<OrganisationId>646</OrganisationId><OrganisationId>647</OrganisationId>')
+    assert eventor_records.events(xmltodict.parse(xml))[0].organiser_ids == (646, 647)
+    xml = EVENTS_XML.replace('<OrganisationId>646</OrganisationId>',
+                             '<Organisation><OrganisationId>646</OrganisationId></Organisation>'
+                             '<Organisation><OrganisationId>648</OrganisationId></Organisation>')
+    assert eventor_records.events(xmltodict.parse(xml))[0].organiser_ids == (646, 648)
+
+
+def test_result_records_normalise_single_and_many():
+    doc = xmltodict.parse(result_list_xml(2, 1))
+    results = eventor_records.results(doc)
+    assert [(r.event_class_id, r.person_id, r.time, r.status) for r in results] == [(0, 0, 0, 'OK'), (1, 0, 0, 'OK')]
+    assert results[0].splits == (eventor_records.SplitTime(sequence=1, control_code='31', time=None),)
+    assert results[0].raw is None
+    class_result = doc['ResultList']['ClassResult'][1]
+    assert eventor_records.results(class_result) == results[1:]
+    assert not hasattr(results[0], '__dict__')
+
+
+MULTI_RACE_XML = ('<ClassResult><EventClassId>7</EventClassId>'
+                  '<PersonResult><Person><PersonId>1</PersonId></Person>'
+                  '<RaceResult><EventRaceId>71</EventRaceId><Result><Time>30:00</Time>'
+                  '<CompetitorStatus value="OK" /></Result></RaceResult>'
+                  '<RaceResult><EventRaceId>72</EventRaceId><Result><Time>45:30</Time>'
+                  '<CompetitorStatus value="DidNotFinish" /></Result></RaceResult></PersonResult>'
+                  '<PersonResult><Person><PersonId>2</PersonId></Person>'
+                  '<RaceResult><EventRaceId>71</EventRaceId><Result><Time>31:15</Time><ResultPosition>2'
+                  '</ResultPosition><CompetitorStatus value="OK" /></Result></RaceResult></PersonResult>'
+                  '</ClassResult>')
+
+
+def test_result_records_unwrap_race_results():
+    class_result = xmltodict.parse(MULTI_RACE_XML)['ClassResult']
+    results = eventor_records.results(class_result)
+    assert [(r.person_id, r.event_race_id, r.time, r.status) for r in results] == [
+        (1, 71, 1800, 'OK'), (1, 72, 2730, 'DidNotFinish'), (2, 71, 1875, 'OK')]
+    assert results[2].position == 2
+    assert {r.event_class_id for r in results} == {7}
+    many, single = class_result['PersonResult']
+    assert eventor_records.Result.from_dict(many, 7) == results[0]
+    assert eventor_records.Result.from_dict(single, 7) == results[2]
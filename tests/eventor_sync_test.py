@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from eventor_sync import IncrementalSync, SyncStore
+from eventor_toolkit import Eventor
+from tests.fake_eventor import FakeEventorServer
+
+
+def event(event_id, status, modified, name='Test'):
+    return event_id, status, modified, name
+
+
+def event_xml(event_id, status, modified, name):
+    return ('<Event><EventId>{0}</EventId><Name>{3}</Name><EventStatusId>{1}</EventStatusId>'
+            '<ModifyDate><Date>{2}</Date><Clock>12:00:00</Clock></ModifyDate></Event>').format(
+        event_id, status, modified, name)
+
+
+def test_incremental_event_sync(tmp_path):
+    calendar = [event(1, 3, '2018-01-01'), event(2, 3, '2018-01-02')]
+
+    def events(q):
+        changed = [event_xml(*e) for e in calendar if e[2] >= q['fromModifyDate'][:10]]
+        return '<EventList>{0}</EventList>'.format(''.join(changed))
+
+    path = str(tmp_path / 'sync.json')
+    with FakeEventorServer({'events': events}) as server:
+        with Eventor('KEY', api_url=server.url) as e:
+            report = IncrementalSync(e, SyncStore(path)).sync_events(organisation_ids=[2, 1])
+            assert (report.inserted, report.watermark) == (['1', '2'], '2018-01-02 12:00:00')
+
+            calendar[0] = event(1, 10, '2018-01-03')
+            calendar.append(event(3, 3, '2018-01-04'))
+            calendar[1] = event(2, 3, '2018-01-05', name='Ny')
+            report = IncrementalSync(e, SyncStore(path)).sync_events(organisation_ids=[1, 2])
+            assert server.requests[-1][1]['fromModifyDate'] == '2018-01-02 12:00:00'
+            assert (report.inserted, report.updated, report.cancelled) == (['3'], ['2'], ['1'])
+
+            store = SyncStore(path)
+            assert sorted(store.records('events')) == ['1', '2', '3']
+            assert store.watermark(report.scope) == '2018-01-05 12:00:00'
+
+
+def test_member_sync_reports_field_level_changes(tmp_path):
+    from eventor_sync import MemberSync
+    from tests.fake_eventor import synthetic_responses
+
+    responses = synthetic_responses()
+    members = responses['persons/organisations']
+    competitors = responses['competitors']
+    path = str(tmp_path / 'sync.json')
+    with FakeEventorServer(responses) as server:
+        with Eventor('KEY', api_url=server.url) as e:
+            report = MemberSync(e, SyncStore(path)).sync(100)
+            assert (len(report.added), report.removed, report.changed, report.unchanged) == (50, [], {}, 0)
+            assert server.requests[0][1]['includeContactDetails'] == 'true'
+
+            report = MemberSync(e, SyncStore(path)).sync(100)
+            assert (report.added, report.removed, report.changed, report.unchanged) == ([], [], {}, 50)
+
+            responses['persons/organisations'] = lambda q: members(q).replace(
+                '<PersonId>1049</PersonId>', '<PersonId>1050</PersonId>').replace('Skogsvägen 3"', 'Stigen 3"')
+            responses['competitors'] = lambda q: competitors(q).replace('<CCardId>500007<', '<CCardId>7<')
+            report = MemberSync(e, SyncStore(path)).sync(100)
+            assert (report.added, report.removed) == (['1050'], ['1049'])
+            assert report.changed == {
+                '1003': {'person.Address.@street': (u'Skogsvägen 3', u'Stigen 3')},
+                '1007': {'competitor.CCard.CCardId': ('500007', '7')}}
+            assert report.unchanged == 47
+            assert sorted(SyncStore(path).records('members:100'))[:2] == ['1000', '1001']
+
+
+def test_member_sync_empty_club(tmp_path):
+    from eventor_sync import MemberSync
+    from tests.fake_eventor import synthetic_responses
+
+    responses = synthetic_responses()
+    path = str(tmp_path / 'sync.json')
+    with FakeEventorServer(responses) as server:
+        with Eventor('KEY', api_url=server.url) as e:
+            responses['competitors'] = lambda q: '<CompetitorList />'
+            report = MemberSync(e, SyncStore(path)).sync(100)
+            assert (len(report.added), report.removed, report.changed) == (50, [], {})
+
+            responses['persons/organisations'] = lambda q: '<PersonList />'
+            report = MemberSync(e, SyncStore(path)).sync(100)
+            assert (report.added, len(report.removed), report.unchanged) == ([], 50, 0)
+            assert SyncStore(path).records('members:100') == {}
+
+
+def test_incremental_sync_scope_per_date_range(tmp_path):
+    calendar = [event(1, 3, '2018-01-01', name='2018-03-01'), event(2, 3, '2018-01-02', name='2018-09-01')]
+
+    def events(q):
+        changed = [event_xml(*e) for e in calendar
+                   if e[2] >= q['fromModifyDate'][:10] and q['fromDate'][:10] <= e[3] <= q['toDate'][:10]]
+        return '<EventList>{0}</EventList>'.format(''.join(changed))
+
+    path = str(tmp_path / 'sync.json')
+    with FakeEventorServer({'events': events}) as server:
+        with Eventor('KEY', api_url=server.url) as e:
+            sync = IncrementalSync(e, SyncStore(path))
+            spring = sync.sync_events(from_date='2018-01-01', to_date='2018-06-30')
+            autumn = sync.sync_events(from_date='2018-07-01', to_date='2018-12-31')
+            assert spring.scope != autumn.scope
+            assert (spring.inserted, spring.watermark) == (['1'], '2018-01-01 12:00:00')
+            assert (autumn.inserted, autumn.watermark) == (['2'], '2018-01-02 12:00:00')
+            assert server.requests[-1][1]['fromModifyDate'] == '0000-01-01 00:00:00'
+
+            again = sync.sync_events(to_date='2018-06-30', from_date='2018-01-01', from_modify_date='2000-01-01')
+            assert again.scope == spring.scope
+            assert server.requests[-1][1]['fromModifyDate'] == '2018-01-01 12:00:00'
@@ -3,3 +3,419 @@
 def test_success():
     # YAY
     assert True
+
+
+EVENT_XML = '<?xml version="1.0" encoding="utf-8"?><Event><EventId>1</EventId><Name>Testtävling</Name></Event>'
+
+
+def test_transport_reuses_connection():
+    from eventor_toolkit import Eventor
+    from tests.fake_eventor import FakeEventorServer
+
+    with FakeEventorServer({'event/1': EVENT_XML}) as server:
+        with Eventor('KEY', api_url=server.url) as e:
+            for _ in range(5):
+                assert e.event(1)['Event']['Name'] == u'Testtävling'
+        assert server.connections == 1
+        assert server.requests[0][2]['ApiKey'] == 'KEY'
+        assert 'gzip' in server.requests[0][2]['Accept-Encoding']
+
+
+def test_transport_retries_connection_reset():
+    from eventor_toolkit import Eventor, Transport
+    from tests.fake_eventor import FakeEventorServer
+
+    with FakeEventorServer({'event/1': EVENT_XML}) as server:
+        server.reset_next = 2
+        with Transport(retries=3, backoff_factor=0) as transport:
+            e = Eventor('KEY', api_url=server.url, transport=transport)
+            assert e.event(1)['Event']['EventId'] == '1'
+            e.close()
+            assert e.event(1)['Event']['EventId'] == '1'
+        assert len(server.requests) == 4
+
+
+def test_map_runs_concurrently_and_collects_errors():
+    import time
+    from eventor_toolkit import Eventor
+    from tests.fake_eventor import FakeEventorServer
+
+    def competitor_xml(q):
+        return '<Competitor><PersonId>1</PersonId></Competitor>'
+
+    responses = dict(('competitor/{0}'.format(i), competitor_xml) for i in range(10))
+    with FakeEventorServer(responses, latency=0.05) as server:
+        with Eventor('KEY', api_url=server.url, pool_size=5) as e:
+            start = time.perf_counter()
+            results = e.competitors_for(range(10))
+            elapsed = time.perf_counter() - start
+            assert [r.index for r in results] == list(range(10))
+            assert all(r.ok for r in results)
+            assert server.max_in_flight == 5
+            assert elapsed < 10 * 0.05
+
+            def flaky(n):
+                if n == 2:
+                    raise ValueError(n)
+                return n * 2
+
+            results = list(e.map(flaky, [1, 2, 3], ordered=False))
+            assert sorted(r.value for r in results if r.ok) == [2, 6]
+            assert [type(r.error) for r in results if not r.ok] == [ValueError]
+
+
+def test_response_cache_tiers(tmp_path):
+    from eventor_toolkit import Eventor, ResponseCache
+    from tests.fake_eventor import FakeEventorServer
+
+    organisations = ('<OrganisationList><Organisation><OrganisationId>1</OrganisationId></Organisation>'
+                     '</OrganisationList>')
+    path = str(tmp_path / 'cache.sqlite')
+    with FakeEventorServer({'organisations': organisations, 'event/1': EVENT_XML}) as server:
+        cache = ResponseCache(max_entries=1, path=path)
+        with Eventor('KEY', api_url=server.url, cache=cache) as e:
+            e.organisations()
+            e.organisations()
+            e.event(1)
+            e.event(1)
+            e.entries()
+            e.entries()
+            assert cache.stats == {'hits': 2, 'disk_hits': 0, 'misses': 2, 'evictions': 1, 'size': 1}
+            with e.bypass_cache():
+                e.event(1)
+            assert len(server.requests) == 5
+
+        shared = ResponseCache(path=path)
+        with Eventor('KEY', api_url=server.url, cache=shared) as e:
+            assert e.organisations()['OrganisationId'] == '1'
+            assert shared.disk_hits == 1
+            shared.invalidate('organisation/5')
+            e.organisations()
+            shared.invalidate('organisations')
+            e.organisations()
+        with Eventor('OTHER', api_url=server.url, cache=shared) as e:
+            e.event(1)
+        assert [r[0] for r in server.requests[5:]] == ['organisations', 'event/1']
+
+
+def result_list_xml(classes, runners, namespace=''):
+    person = ('<PersonResult><Person><PersonId>{p}</PersonId></Person>'
+              '<Result><Time>{p}:00</Time><SplitTime sequence="1"><ControlCode>31</ControlCode></SplitTime>'
+              '<CompetitorStatus value="OK" /></Result></PersonResult>')
+    class_result = '<ClassResult><EventClass><EventClassId>{c}</EventClassId></EventClass>{persons}</ClassResult>'
+    return ('<?xml version="1.0" encoding="utf-8"?><ResultList{ns}><Event><EventId>1</EventId></Event>{c}'
+            '</ResultList>').format(
+        ns=' xmlns="{0}"'.format(namespace) if namespace else '',
+        c=''.join(class_result.format(c=c, persons=''.join(person.format(p=p) for p in range(runners)))
+                  for c in range(classes)))
+
+
+def test_stream_matches_buffered_results():
+    from eventor_toolkit import Eventor
+    from tests.fake_eventor import FakeEventorServer
+
+    iof = result_list_xml(3, 2, namespace='http://www.orienteering.org/datastandard/3.0')
+    responses = {'results/event': result_list_xml(50, 40), 'results/event/iofxml': iof}
+    with FakeEventorServer(responses) as server:
+        with Eventor('KEY', api_url=server.url) as e:
+            streamed = list(e.results_per_event(1, stream=True))
+            assert len(streamed) == 50
+            assert streamed == e.results_per_event(1)['ResultList']['ClassResult']
+            streamed = list(e.results_per_event_iofxml(1, stream=True))
+            assert streamed == e.results_per_event_iofxml(1)['ResultList']['ClassResult']
+
+
+def test_stream_splits_long_id_lists_and_records_early_stops():
+    from eventor_toolkit import Eventor, Metrics
+    from tests.fake_eventor import FakeEventorServer
+
+    entries = '<EntryList>{0}</EntryList>'.format(''.join('<Entry><EntryId>{0}</EntryId></Entry>'.format(i)
+                                                          for i in range(3)))
+    calls = []
+    with FakeEventorServer({'entries': entries}) as server:
+        with Eventor('KEY', api_url=server.url, chunk_size=2, metrics=Metrics([calls.append])) as e:
+            assert len(list(e.entries(event_ids=[1, 2, 3], stream=True))) == 6
+            assert [q['eventIds'] for _, q, _ in server.requests] == ['1,2', '3']
+            assert [call.elements for call in calls] == [3, 3]
+
+            stream = e.entries(event_ids=[1], stream=True)
+            next(stream)
+            stream.close()
+            assert len(calls) == 3 and calls[-1].elements == 1 and calls[-1].error is None
+
+
+def test_format_list():
+    from eventor_toolkit import format_list
+
+    assert format_list([1, 2, 3]) == '1,2,3'
+
+
+def test_long_id_lists_are_chunked_and_merged():
+    from eventor_toolkit import Eventor
+    from tests.fake_eventor import FakeEventorServer
+
+    def events(q):
+        ids = q['eventIds'].split(',')
+        # Tävling 0 är med i varje svar för att kontrollera att dubbletter tas bort.
+        return '<EventList>{0}</EventList>'.format(''.join(
+            '<Event><EventId>{0}</EventId></Event>'.format(i) for i in ['0'] + ids))
+
+    with FakeEventorServer({'events': events}) as server:
+        with Eventor('KEY', api_url=server.url, chunk_size=100) as e:
+            event_list = e.events(event_ids=range(1, 251))['EventList']['Event']
+    assert [event['EventId'] for event in event_list] == [str(i) for i in range(251)]
+    assert sorted(len(r[1]['eventIds'].split(',')) for r in server.requests) == [50, 100, 100]
+
+
+def test_date_range_sharding():
+    import pytest
+    from eventor_toolkit import Eventor, _date_windows
+    from tests.fake_eventor import FakeEventorServer
+
+    assert _date_windows('2018-01-15', '2018-03-10', 'month') == [
+        ('2018-01-15', '2018-01-31'), ('2018-02-01', '2018-02-28'), ('2018-03-01', '2018-03-10')]
+    assert _date_windows('2018-12-30', '2019-01-02', 'week') == [('2018-12-30', '2018-12-30'),
+                                                                 ('2018-12-31', '2019-01-02')]
+    assert _date_windows('2018-01-01', '2018-01-05', 2)[-1] == ('2018-01-05', '2018-01-05')
+    with pytest.raises(ValueError):
+        _date_windows('0000-01-01', '2018-01-01', 'month')
+
+    calendar = [('1', '2018-01-20', '2018-02-02'), ('2', '2018-02-10', '2018-02-10'), ('3', '2018-03-05', '2018-03-05')]
+
+    def events(q):
+        return '<EventList>{0}</EventList>'.format(''.join(
+            '<Event><EventId>{0}</EventId></Event>'.format(event_id) for event_id, start, finish in calendar
+            if start <= q['toDate'] and finish >= q['fromDate']))
+
+    with FakeEventorServer({'events': events}) as server:
+        with Eventor('KEY', api_url=server.url) as e:
+            event_list = e.events(from_date='2018-01-15', to_date='2018-03-10', shard='month')['EventList']['Event']
+    assert [event['EventId'] for event in event_list] == ['1', '2', '3']
+    assert len(server.requests) == 3
+
+
+def test_concurrent_identical_calls_are_coalesced():
+    from concurrent.futures import ThreadPoolExecutor
+    from eventor_toolkit import Eventor
+    from tests.fake_eventor import FakeEventorServer
+
+    with FakeEventorServer({'event/1': EVENT_XML}, latency=0.2) as server:
+        with Eventor('KEY', api_url=server.url) as e:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(lambda _: e.event(1), range(8)))
+            assert e.coalesced == 7
+    assert all(result is results[0] for result in results)
+    assert len(server.requests) == 1
+
+
+def test_concurrent_external_login_urls_are_not_coalesced():
+    from concurrent.futures import ThreadPoolExecutor
+    from eventor_toolkit import Eventor
+    from tests.fake_eventor import FakeEventorServer
+
+    with FakeEventorServer.synthetic(latency=0.2) as server:
+        with Eventor('KEY', api_url=server.url) as e:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(lambda _: e.external_login_url(1, 646), range(2)))
+            assert e.coalesced == 0
+    assert len(server.requests) == 2
+
+
+def test_throttled_responses_are_retried_after_retry_after():
+    import time
+    import pytest
+    import requests
+    from eventor_toolkit import AdaptiveLimiter, Eventor, EventorError
+    from tests.fake_eventor import FakeEventorServer
+
+    with FakeEventorServer({'event/1': EVENT_XML}) as server:
+        limiter = AdaptiveLimiter(maximum=4, cooldown=0)
+        with Eventor('KEY', api_url=server.url, limiter=limiter) as e:
+            server.status_next = [(429, {'Retry-After': '0.2'}), (503, {})]
+            e.backoff_factor = 0
+            start = time.monotonic()
+            assert e.event(1)['Event']['EventId'] == '1'
+            assert time.monotonic() - start >= 0.2
+            assert len(server.requests) == 3
+            assert limiter.decreases == 2
+
+            server.status_next = [(500, {})]
+            with pytest.raises(EventorError) as error:
+                e.event(1)
+            assert error.value.status_code == 500
+            assert limiter.decreases == 3
+
+            def unreachable(url, headers=None, stream=False):
+                raise requests.ConnectionError(url)
+            e.transport.get = unreachable
+            with pytest.raises(requests.ConnectionError):
+                e.event(1)
+            assert (limiter.decreases, limiter.in_flight) == (4, 0)
+
+
+def test_token_bucket_and_adaptive_limiter():
+    import hashlib
+    import time
+    from eventor_toolkit import AdaptiveLimiter, TokenBucket
+
+    shared = TokenBucket.for_key('KEY', 5)
+    assert TokenBucket.for_key('KEY', 10, burst=20) is shared
+    assert (shared.rate, shared.burst) == (10, 20)
+    key = hashlib.sha256(b'KEY').hexdigest()
+    del shared
+    assert key not in TokenBucket._shared
+    bucket = TokenBucket(rate=50, burst=2)
+    start = time.monotonic()
+    for _ in range(7):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+    limiter = AdaptiveLimiter(maximum=8, target_latency=1.0, cooldown=0)
+    assert limiter.limit == 4
+    for _ in range(40):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert limiter.limit == 8
+    limiter.acquire()
+    limiter.release(2.0)
+    limiter.acquire()
+    limiter.release(0.1, throttled=True)
+    assert int(limiter.limit) == 2
+
+
+def test_synthetic_server_and_recorded_fixtures(tmp_path):
+    import eventor_records
+    from eventor_toolkit import Eventor, EventorError
+    from tests.fake_eventor import FakeEventorServer, RecordingTransport, load_fixtures
+
+    with FakeEventorServer.synthetic() as server:
+        with Eventor('KEY', api_url=server.url, transport=RecordingTransport(str(tmp_path))) as e:
+            results = eventor_records.results(e.results_per_event(1, include_split_times=True))
+            assert len(results) == 200 and len(results[0].splits) == 15
+            assert len(eventor_records.organisations(e.organisations())) == 46
+            assert [a['@id'] for a in e.activities(100)][:2] == ['1', '2']
+            assert e.organisation(100)['Organisation']['OrganisationId'] == '100'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['activities.xml', 'organisation__100.xml',
+                                                          'organisations.xml', 'results__event.xml']
+
+    with FakeEventorServer(load_fixtures(str(tmp_path)), error_rate=0.5, error_status=500) as server:
+        with Eventor('KEY', api_url=server.url) as e:
+            errors = 0
+            for _ in range(20):
+                try:
+                    assert len(eventor_records.organisations(e.organisations())) == 46
+                except EventorError as error:
+                    assert error.status_code == 500
+                    errors += 1
+            assert 0 < errors < 20
+
+
+def test_metrics_per_call_and_prometheus():
+    from eventor_toolkit import Eventor, Metrics, ResponseCache
+    from tests.fake_eventor import FakeEventorServer
+
+    calls = []
+    metrics = Metrics(listeners=[calls.append])
+    with FakeEventorServer.synthetic() as server:
+        with Eventor('KEY', api_url=server.url, metrics=metrics, cache=ResponseCache()) as e:
+            e.event(1)
+            e.event(1)
+            server.status_next = [(503, {'Retry-After': '0'})]
+            e.authenticate_person('user', 'secret')
+            assert len(list(e.results_per_event(1, stream=True))) == 10
+
+    first, hit, login, streamed = calls
+    assert (first.endpoint, first.status, first.retries, first.cache) == ('event', 200, 0, 'miss')
+    assert first.connect is not None and first.bytes > 0 and first.parse >= 0 and first.elements == 10
+    assert (hit.cache, hit.status, hit.connect) == ('hit', None, None)
+    assert login.query == {'Username': 'user', 'Password': '***'}
+    assert (login.retries, login.connect) == (1, None)
+    assert (streamed.endpoint, streamed.elements, streamed.parse) == ('results/event', 10, None)
+
+    text = metrics.prometheus()
+    assert 'eventor_requests_total{endpoint="event",status="200",cache="miss"} 1' in text
+    assert 'eventor_requests_total{endpoint="event",status="none",cache="hit"} 1' in text
+    assert 'eventor_retries_total{endpoint="authenticatePerson"} 1' in text
+    assert 'eventor_parse_seconds_count{endpoint="event"} 1' in text
+    assert 'eventor_request_duration_seconds_bucket{endpoint="event",le="+Inf"} 2' in text
+    assert 'secret' not in text
+
+
+def test_expat_parser_matches_xmltodict_for_every_endpoint():
+    import xmltodict
+    from eventor_toolkit import PARSERS, Eventor
+    from tests.fake_eventor import FakeEventorServer, synthetic_responses
+
+    edge_cases = ['<Empty />', '<A b="1" />', '<A> text <B>x</B> more </A>', '<A><B /><B>1</B><B c="2">3</B></A>',
+                  u'<A xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"><xsi:B>Åäö &amp; &lt;</xsi:B></A>',
+                  '<?xml version="1.0" encoding="iso-8859-1"?><A>\xe5</A>'.encode('latin-1')]
+    bodies = [f({'includeSplitTimes': 'true'}) for f in synthetic_responses().values()] + edge_cases
+    for body in bodies:
+        if not isinstance(body, bytes):
+            assert PARSERS['expat'](body) == xmltodict.parse(body)
+            body = body.encode('utf-8')
+        assert PARSERS['expat'](body) == xmltodict.parse(body)
+
+    with FakeEventorServer.synthetic() as server:
+        with Eventor('KEY', api_url=server.url) as default, Eventor('KEY', api_url=server.url, parser='expat') as e:
+            assert e.results_per_event_iofxml(1, include_split_times=True) == \
+                default.results_per_event_iofxml(1, include_split_times=True)
+            assert e.organisations() == default.organisations()
+
+
+def test_iofxml_raw_passthrough(tmp_path):
+    import hashlib
+    import io
+    import pytest
+    from concurrent.futures import ThreadPoolExecutor
+    from eventor_toolkit import Eventor, EventorError, Metrics
+    from tests.fake_eventor import FakeEventorServer, synthetic_responses
+
+    body = synthetic_responses()['results/event/iofxml']({'includeSplitTimes': 'true'}).encode('utf-8')
+    path = tmp_path / 'results.xml'
+    calls = []
+    with FakeEventorServer.synthetic(latency=0.05) as server:
+        with Eventor('KEY', api_url=server.url, metrics=Metrics([calls.append])) as e:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                downloads = list(executor.map(
+                    lambda _: e.results_per_event_iofxml(1, include_split_times=True, raw=str(path),
+                                                         checksum='sha256'), range(4)))
+            for download in downloads:
+                assert (download.bytes, download.checksum) == (len(body), hashlib.sha256(body).hexdigest())
+            assert path.read_bytes() == body
+            assert [(c.endpoint, c.status, c.bytes) for c in calls] == [('results/event/iofxml', 200, len(body))] * 4
+
+            f = io.BytesIO()
+            assert e.start_times_per_event_iofxml(1, raw=f).checksum is None
+            assert f.getvalue().startswith(b'<?xml') and b'<StartList' in f.getvalue()
+
+            server.status_next = [(404, {})]
+            with pytest.raises(EventorError):
+                e.start_times_per_event_iofxml(1, raw=str(tmp_path / 'starts.xml'))
+            assert (calls[-1].status, type(calls[-1].error)) == (404, EventorError)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['results.xml']
+
+
+def test_process_parser_overlaps_fetching_and_parsing():
+    import pytest
+    from eventor_toolkit import Eventor, ProcessParser
+    from tests.fake_eventor import FakeEventorServer, synthetic_responses
+
+    with FakeEventorServer.synthetic(2) as server:
+        with ProcessParser(processes=2, max_pending=2) as parser, \
+                Eventor('KEY', api_url=server.url, parser='expat') as expected, \
+                Eventor('KEY', api_url=server.url, parser=parser) as e:
+            args = [dict(event_id=event_id, include_split_times=True) for event_id in range(1, 7)]
+            results = list(e.map(e.results_per_event, args, workers=4))
+            assert [r.value for r in results] == [expected.results_per_event(1, include_split_times=True)] * 6
+            assert parser._pool is not None
+            assert e.organisation(100) == expected.organisation(100)
+
+            body = synthetic_responses(2)['results/event']({'includeSplitTimes': 'true'}).encode('utf-8')
+            pending = [parser.submit(body) for _ in range(3)] + [parser.submit(b'<Event />')]
+            assert [f.result() for f in pending] == [results[0].value] * 3 + [{'Event': None}]
+    assert parser._pool is None
+    with pytest.raises(ValueError, match='expat'):
+        ProcessParser(parser='lxml')
+    with pytest.raises(ValueError, match="'expat', 'xmltodict'"):
+        Eventor('KEY', parser='lxml')
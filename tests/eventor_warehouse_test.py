@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import xmltodict
+
+from eventor_toolkit import Eventor
+from eventor_warehouse import Warehouse
+from tests.eventor_records_test import MULTI_RACE_XML
+from tests.fake_eventor import FakeEventorServer
+
+
+def test_warehouse_load_query_and_upsert(tmp_path):
+    path = str(tmp_path / 'eventor.db')
+    with FakeEventorServer.synthetic() as server:
+        with Eventor('KEY', api_url=server.url) as e, Warehouse(path) as w:
+            assert w.load_organisations(e.organisations()) == 46
+            assert w.load_events(e.events()) == 20
+            assert w.load_entries(e.entries(event_ids=[1, 2])) == 80
+            w.ingest_event(e, 1, include_split_times=True)
+
+            assert w.query('SELECT count(*) FROM events WHERE start >= ?', '2018-06-01')[0][0] == 11
+            assert [r['event_id'] for r in w.query('SELECT event_id FROM event_organisers '
+                                                   'WHERE organisation_id = 101 ORDER BY event_id')] == [1]
+            h21 = w.query('SELECT r.person_id, r.time, r.position FROM results r JOIN event_classes c '
+                          'ON c.id = r.event_class_id WHERE r.organisation_id = ? AND c.name = ?', 100, 'H21')
+            assert [tuple(r) for r in h21] == [(1000, 1600, 1)]
+            assert w.query('SELECT count(*) FROM splits')[0][0] == 200 * 15
+            assert w.query('SELECT count(*) FROM starts WHERE event_id = 1')[0][0] == 200
+            assert w.query('SELECT count(*) FROM entry_classes WHERE event_class_id = 100')[0][0] == 4
+
+            w.ingest_event(e, 1, include_split_times=False)
+            w.load_entries(e.entries(event_ids=[1]))
+            assert w.query('SELECT count(*) FROM results')[0][0] == 200
+            assert w.query('SELECT count(*) FROM splits')[0][0] == 0
+            assert w.query('SELECT count(*) FROM entries')[0][0] == 80
+
+    with Warehouse(path) as w:
+        assert w.query('SELECT name FROM organisations WHERE id = 100')[0]['name'] == 'OK Klubb 100'
+
+
+def test_warehouse_reload_drops_classes_missing_from_the_response():
+    with FakeEventorServer.synthetic() as server:
+        with Eventor('KEY', api_url=server.url) as e, Warehouse() as w:
+            w.ingest_event(e, 1, include_split_times=True)
+            classes = list(e.results_per_event(1, include_split_times=True, stream=True))
+            starts = list(e.start_times_per_event(1, stream=True))
+            assert w.load_results(classes[:3], 1) == 60
+            assert w.load_starts(starts[:2], 1) == 40
+            assert w.query('SELECT count(DISTINCT event_class_id), count(*) FROM results')[0][:] == (3, 60)
+            assert w.query('SELECT count(*) FROM splits')[0][0] == 60 * 15
+            assert w.query('SELECT count(DISTINCT event_class_id), count(*) FROM starts')[0][:] == (2, 40)
+
+
+def test_warehouse_keeps_every_race_of_multi_race_events(tmp_path):
+    class_start = xmltodict.parse('<ClassStart><EventClassId>7</EventClassId>'
+                                  '<PersonStart><Person><PersonId>1</PersonId></Person>'
+                                  '<RaceStart><EventRaceId>71</EventRaceId><Start><BibNumber>5</BibNumber></Start>'
+                                  '</RaceStart><RaceStart><EventRaceId>72</EventRaceId><Start><BibNumber>5</BibNumber>'
+                                  '</Start></RaceStart></PersonStart></ClassStart>')['ClassStart']
+    consumed = []
+
+    def stream(element):
+        consumed.append(element)
+        yield element
+        consumed.append(None)
+
+    path = str(tmp_path / 'eventor.db')
+    connection = sqlite3.connect(path)
+    connection.executescript('CREATE TABLE starts (event_id INTEGER NOT NULL, event_class_id INTEGER, '
+                             'person_id INTEGER, organisation_id INTEGER, start_time TEXT, card_number INTEGER, '
+                             'bib_number TEXT); CREATE TABLE results (id INTEGER PRIMARY KEY, event_id INTEGER '
+                             'NOT NULL, event_class_id INTEGER, person_id INTEGER, organisation_id INTEGER, '
+                             'start_time TEXT, finish_time TEXT, time INTEGER, time_diff INTEGER, position INTEGER, '
+                             'status TEXT); PRAGMA user_version = 1;')
+    connection.close()
+    with Warehouse(path) as w:
+        assert w.load_results(stream(xmltodict.parse(MULTI_RACE_XML)['ClassResult']), 1) == 3
+        assert consumed[-1] is None
+        w.load_starts([class_start, class_start], 1)
+        assert [tuple(r) for r in w.query('SELECT person_id, event_race_id, time, status FROM results '
+                                          'ORDER BY person_id, event_race_id')] == [
+            (1, 71, 1800, 'OK'), (1, 72, 2730, 'DidNotFinish'), (2, 71, 1875, 'OK')]
+        assert [tuple(r) for r in w.query('SELECT person_id, event_race_id FROM starts ORDER BY event_race_id')] == [
+            (1, 71), (1, 72)]
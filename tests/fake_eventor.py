@@ -0,0 +1,476 @@
+# -*- coding: utf-8 -*-
+"""
+Lokal ersättare för Eventors API som används av testerna och benchmarkskripten.
+
+Servern lyssnar på 127.0.0.1 på en slumpvis port och svarar på GET /api/<funktion> med XML från `responses`,
+en dict från funktionsnamn (t ex 'events' eller 'event/1', eller 'event' för alla id:n) till en sträng eller en
+funktion som tar query-parametrarna och returnerar en sträng.
+
+synthetic_responses ger genererade svar i Eventors format för alla funktioner som Eventor-klassen använder och
+load_fixtures inspelade svar från RecordingTransport.
+"""
+import gzip
+import hashlib
+import os
+import random
+import socket
+import threading
+import time
+
+from eventor_toolkit import Transport, _endpoint
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qsl
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qsl
+
+DEFAULT_RESPONSE = '<?xml version="1.0" encoding="utf-8"?><Empty />'
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        fake = self.server.fake
+        with fake.lock:
+            fake.connections += 1
+        if fake.connect_latency:
+            time.sleep(fake.connect_latency)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        fake = self.server.fake
+        parts = urlsplit(self.path)
+        function = parts.path[len('/api/'):] if parts.path.startswith('/api/') else parts.path.lstrip('/')
+        q = dict(parse_qsl(parts.query))
+        with fake.lock:
+            fake.requests.append((function, q, dict(self.headers)))
+            reset = fake.reset_next > 0
+            if reset:
+                fake.reset_next -= 1
+            status, headers = fake.status_next.pop(0) if fake.status_next else (200, {})
+            if status == 200 and fake.error_rate and fake.random.random() < fake.error_rate:
+                status = fake.error_status
+        api_key = self.headers.get('ApiKey')
+        if status == 200 and fake.api_keys is not None and api_key not in fake.api_keys:
+            status = 403
+        if reset:
+            self.connection.shutdown(socket.SHUT_RDWR)
+            self.close_connection = True
+            return
+        with fake.lock:
+            fake.in_flight += 1
+            fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+        try:
+            if fake.latency:
+                time.sleep(fake.latency)
+            body = fake.responses.get(function, fake.responses.get(_endpoint(function), DEFAULT_RESPONSE))
+            if callable(body):
+                body = body(q)
+            if fake.api_keys is not None and function == 'organisation/apiKey' and api_key in fake.api_keys:
+                body = _organisation(fake.api_keys[api_key], 3, 2)
+        finally:
+            with fake.lock:
+                fake.in_flight -= 1
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+
+        if status != 200:
+            body = '<html><body>{status}</body></html>'.format(status=status).encode('utf-8')
+        elif fake.etags:
+            etag = '"{0}"'.format(hashlib.sha1(body).hexdigest())
+            headers = dict(headers, ETag=etag)
+            if self.headers.get('If-None-Match') == etag:
+                status, body = 304, b''
+        byte_range = self.headers.get('Range', '')
+        if status == 200 and byte_range.startswith('bytes=') and byte_range.endswith('-'):
+            start = int(byte_range[len('bytes='):-1])
+            headers = dict(headers, **{'Content-Range': 'bytes {0}-{1}/{2}'.format(start, len(body) - 1, len(body))})
+            status, body = 206, body[start:]
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'text/xml; charset=utf-8')
+        if body and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeEventorServer:
+    """
+    responses  Dict från funktionsnamn till XML-svar.
+    latency  Fördröjning i sekunder före varje svar.
+    connect_latency  Fördröjning i sekunder för varje ny anslutning, motsvarar TCP- och TLS-handskakning.
+
+    error_rate  Andel av anropen som slumpvis besvaras med error_status.
+    etags  Sätt till True för att skicka ETag och svara 304 på If-None-Match. Range-anrop (bytes=N-) besvaras alltid
+        med 206.
+    api_keys  Dict från API-nyckel till organisations-id. Om den anges besvaras anrop med andra nycklar med 403 och
+        organisation/apiKey med nyckelns organisation.
+
+    reset_next  Antal kommande anrop där anslutningen stängs utan svar.
+    status_next  Lista med (status, headers) som används i tur och ordning i stället för 200 för kommande anrop.
+    """
+
+    def __init__(self, responses=None, latency=0.0, connect_latency=0.0, error_rate=0.0, error_status=503, seed=0,
+                 etags=False, api_keys=None):
+        self.responses = responses or {}
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.etags = etags
+        self.api_keys = api_keys
+        self.lock = threading.Lock()
+        self.requests = []
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.reset_next = 0
+        self.status_next = []
+        self._server = None
+        self._thread = None
+
+    @classmethod
+    def synthetic(cls, size=1, **kwargs):
+        """
+        En server med synthetic_responses(size) för alla funktioner.
+        """
+        return cls(synthetic_responses(size), **kwargs)
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{port}/api/'.format(port=self._server.server_address[1])
+
+    def start(self):
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def _fixture_name(function):
+    return '{name}.xml'.format(name=function.replace('/', '__'))
+
+
+class RecordingTransport(Transport):
+    """
+    Transport som sparar varje svar från Eventor i directory så att det kan användas med load_fixtures:
+
+        with Eventor(api_key, transport=RecordingTransport('tests/fixtures')) as e:
+            e.results_per_event(event_id, include_split_times=True)
+    """
+
+    def __init__(self, directory, **kwargs):
+        Transport.__init__(self, **kwargs)
+        self.directory = directory
+
+    def get(self, url, headers=None, stream=False):
+        r = Transport.get(self, url, headers=headers)
+        if r.ok:
+            function = url.split('/api/', 1)[1].split('?', 1)[0]
+            with open(os.path.join(self.directory, _fixture_name(function)), 'wb') as f:
+                f.write(r.content)
+        return r
+
+
+def load_fixtures(directory):
+    """
+    Inspelade svar i directory som responses för FakeEventorServer.
+    """
+    responses = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.xml'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                responses[name[:-len('.xml')].replace('__', '/')] = f.read()
+    return responses
+
+
+XML_DECLARATION = '<?xml version="1.0" encoding="utf-8"?>'
+IOF_NAMESPACE = 'http://www.orienteering.org/datastandard/3.0'
+FAMILY_NAMES = [u'Andersson', u'Johansson', u'Karlsson', u'Nilsson', u'Eriksson', u'Larsson', u'Öberg', u'Åström']
+GIVEN_NAMES = [u'Anna', u'Erik', u'Maria', u'Lars', u'Karin', u'Per', u'Åsa', u'Jörgen']
+CLASS_NAMES = ['H21', 'D21', 'H35', 'D35', 'H16', 'D16', 'H45', 'D45', 'H10', 'D10', 'Inskolning', u'Öppen 1']
+
+
+def _date_clock(tag, date, clock):
+    return '<{tag}><Date>{date}</Date><Clock>{clock}</Clock></{tag}>'.format(tag=tag, date=date, clock=clock)
+
+
+def _clock(seconds):
+    return '{0:02d}:{1:02d}:{2:02d}'.format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def _minutes(seconds):
+    return '{0}:{1:02d}'.format(seconds // 60, seconds % 60)
+
+
+def _person_name(n):
+    return (u'<PersonName><Family>{family}</Family><Given sequence="1">{given}</Given></PersonName>'.format(
+        family=FAMILY_NAMES[n % len(FAMILY_NAMES)], given=GIVEN_NAMES[n // len(FAMILY_NAMES) % len(GIVEN_NAMES)]))
+
+
+def _person(n, contact_details=False):
+    contact = ''
+    if contact_details:
+        contact = (u'<Address careOf="" street="Skogsvägen {n}" city="Skogsby" zipCode="12345" />'
+                   u'<Tele mobilePhoneNumber="070-{n:07d}" mailAddress="person{n}@example.com" />').format(n=n)
+    return (u'<Person sex="{sex}">{name}<PersonId>{id}</PersonId><BirthDate><Date>{year}-0{month}-1{day}</Date>'
+            u'</BirthDate><Nationality><CountryId value="752" /></Nationality>{contact}</Person>').format(
+        sex='MF'[n % 2], name=_person_name(n), id=1000 + n, year=1950 + n % 60, month=1 + n % 9, day=n % 10,
+        contact=contact)
+
+
+def _organisation(organisation_id, type_id, parent_id=None):
+    parent = ''
+    if parent_id:
+        parent = '<ParentOrganisation><OrganisationId>{0}</OrganisationId></ParentOrganisation>'.format(parent_id)
+    names = {1: u'Svenska Orienteringsförbundet', 2: u'Distrikt {0} OF', 3: u'OK Klubb {0}'}
+    return (u'<Organisation><OrganisationId>{id}</OrganisationId><Name>{name}</Name><ShortName>{short}'
+            u'</ShortName><OrganisationTypeId>{type}</OrganisationTypeId><CountryId value="752" />{parent}'
+            u'{modified}</Organisation>').format(id=organisation_id, name=names[type_id].format(organisation_id),
+                                                 short=u'Kl{0}'.format(organisation_id), type=type_id,
+                                                 parent=parent,
+                                                 modified=_date_clock('ModifyDate', '2018-01-01', '12:00:00'))
+
+
+def _organisations(size):
+    organisations = [_organisation(1, 1)]
+    districts = 5 * size
+    for district in range(districts):
+        organisations.append(_organisation(2 + district, 2, 1))
+    for club in range(40 * size):
+        organisations.append(_organisation(100 + club, 3, 2 + club % districts))
+    return organisations
+
+
+def _event(event_id, status_id=3):
+    day = 1 + event_id % 28
+    date = '2018-{0:02d}-{1:02d}'.format(1 + event_id % 12, day)
+    return (u'<Event eventForm="IndSingleDay"><EventId>{id}</EventId><Name>Tävling {id}</Name>'
+            u'<EventClassificationId>{classification}</EventClassificationId><EventStatusId>{status}</EventStatusId>'
+            u'<DisciplineId>1</DisciplineId>{start}{finish}<Organiser><OrganisationId>{organiser}</OrganisationId>'
+            u'</Organiser><EventRace raceLightCondition="Day" raceDistance="Middle"><EventRaceId>{id}</EventRaceId>'
+            u'<EventId>{id}</EventId><Name>Tävling {id}</Name>{race_date}</EventRace>{modified}</Event>').format(
+        id=event_id, classification=1 + event_id % 6, status=status_id, organiser=100 + event_id % 40,
+        start=_date_clock('StartDate', date, '10:00:00'), finish=_date_clock('FinishDate', date, '16:00:00'),
+        race_date=_date_clock('RaceDate', date, '10:00:00'),
+        modified=_date_clock('ModifyDate', '2018-01-{0:02d}'.format(day), '12:00:00'))
+
+
+def _ids(q, name, default):
+    if q.get(name):
+        return [int(i) for i in q[name].split(',') if i]
+    return default
+
+
+def _events(size):
+    def events(q):
+        ids = _ids(q, 'eventIds', range(1, 1 + 20 * size))
+        return u'{0}<EventList>{1}</EventList>'.format(XML_DECLARATION, ''.join(_event(i) for i in ids))
+    return events
+
+
+def _event_class(event_id, n):
+    return (u'<EventClass sex="{sex}" lowAge="{low}" highAge="{high}" numberOfEntries="{entries}"><EventClassId>'
+            u'{id}</EventClassId><Name>{name}</Name><ClassShortName>{name}</ClassShortName><EventId>{event}</EventId>'
+            u'<ClassEntryFee sequence="1"><EntryFeeId>1</EntryFeeId></ClassEntryFee></EventClass>').format(
+        sex='MF'[n % 2], low=10 + n, high=99, entries=20, id=event_id * 100 + n,
+        name=CLASS_NAMES[n % len(CLASS_NAMES)], event=event_id)
+
+
+def _split_times(n, controls):
+    return ''.join(u'<SplitTime sequence="{s}"><ControlCode>{code}</ControlCode><Time>{time}</Time></SplitTime>'
+                   .format(s=s + 1, code=31 + s, time=_minutes((s + 1) * (100 + n * 3)))
+                   for s in range(controls))
+
+
+def _result_list(size, split_times, classes_per_size=10, runners=20, controls=15):
+    classes = []
+    for c in range(classes_per_size * size):
+        persons = []
+        for n in range(runners):
+            start = 36000 + n * 120
+            time = (controls + 1) * (100 + n * 3)
+            splits = _split_times(n, controls) if split_times else ''
+            persons.append((u'<PersonResult>{person}<OrganisationId>{organisation}</OrganisationId><Result>'
+                            u'{start}{finish}<Time>{time}</Time><TimeDiff>{diff}</TimeDiff><ResultPosition>{pos}'
+                            u'</ResultPosition><CompetitorStatus value="OK" />{splits}</Result></PersonResult>')
+                           .format(person=_person(c * runners + n), organisation=100 + n % 40,
+                                   start=_date_clock('StartTime', '2018-05-01', _clock(start)),
+                                   finish=_date_clock('FinishTime', '2018-05-01', _clock(start + time)),
+                                   time=_minutes(time), diff=_minutes(n * 3 * (controls + 1)), pos=n + 1,
+                                   splits=splits))
+        classes.append(u'<ClassResult>{cls}{persons}</ClassResult>'.format(
+            cls=_event_class(1, c), persons=''.join(persons)))
+    return u'<ResultList status="complete">{event}{classes}</ResultList>'.format(event=_event(1, 9),
+                                                                                 classes=''.join(classes))
+
+
+def _iof_result_list(size, split_times, classes_per_size=10, runners=20, controls=15):
+    classes = []
+    for c in range(classes_per_size * size):
+        persons = []
+        for n in range(runners):
+            time = (controls + 1) * (100 + n * 3)
+            splits = ''.join('<SplitTime><ControlCode>{0}</ControlCode><Time>{1}</Time></SplitTime>'.format(
+                31 + s, (s + 1) * (100 + n * 3)) for s in range(controls)) if split_times else ''
+            persons.append((u'<PersonResult><Person><Id>{id}</Id><Name><Family>{family}</Family><Given>{given}'
+                            u'</Given></Name></Person><Organisation><Id>{organisation}</Id><Name>OK Klubb '
+                            u'{organisation}</Name></Organisation><Result><StartTime>2018-05-01T{start}+02:00'
+                            u'</StartTime><Time>{time}</Time><TimeBehind>{diff}</TimeBehind><Position>{pos}'
+                            u'</Position><Status>OK</Status>{splits}</Result></PersonResult>').format(
+                id=1000 + c * runners + n, family=FAMILY_NAMES[n % len(FAMILY_NAMES)],
+                given=GIVEN_NAMES[n % len(GIVEN_NAMES)], organisation=100 + n % 40,
+                start=_clock(36000 + n * 120), time=time, diff=n * 3 * (controls + 1), pos=n + 1, splits=splits))
+        classes.append(u'<ClassResult><Class><Id>{id}</Id><Name>{name}</Name></Class>{persons}</ClassResult>'.format(
+            id=100 + c, name=CLASS_NAMES[c % len(CLASS_NAMES)], persons=''.join(persons)))
+    return (u'{decl}<ResultList xmlns="{ns}" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" iofVersion="3.0" '
+            u'status="Complete"><Event><Id>1</Id><Name>Tävling 1</Name></Event>{classes}</ResultList>').format(
+        decl=XML_DECLARATION, ns=IOF_NAMESPACE, classes=''.join(classes))
+
+
+def _start_list(size, classes_per_size=10, runners=20):
+    classes = []
+    for c in range(classes_per_size * size):
+        persons = ''.join((u'<PersonStart>{person}<OrganisationId>{organisation}</OrganisationId><Start>'
+                           u'{start}<CCard><CCardId>{card}</CCardId><PunchingUnitType value="SI" /></CCard>'
+                           u'</Start></PersonStart>').format(
+            person=_person(c * runners + n), organisation=100 + n % 40,
+            start=_date_clock('StartTime', '2018-05-01', _clock(36000 + n * 120)), card=500000 + c * runners + n)
+            for n in range(runners))
+        classes.append(u'<ClassStart><EventClassId>{id}</EventClassId>{persons}</ClassStart>'.format(
+            id=100 + c, persons=persons))
+    return u'<StartList>{event}{classes}</StartList>'.format(event=_event(1, 8), classes=''.join(classes))
+
+
+def _iof_start_list(size, classes_per_size=10, runners=20):
+    classes = []
+    for c in range(classes_per_size * size):
+        persons = ''.join((u'<PersonStart><Person><Id>{id}</Id><Name><Family>{family}</Family><Given>{given}'
+                           u'</Given></Name></Person><Organisation><Id>{organisation}</Id></Organisation><Start>'
+                           u'<StartTime>2018-05-01T{start}+02:00</StartTime><ControlCard>{card}</ControlCard>'
+                           u'</Start></PersonStart>').format(
+            id=1000 + c * runners + n, family=FAMILY_NAMES[n % len(FAMILY_NAMES)],
+            given=GIVEN_NAMES[n % len(GIVEN_NAMES)], organisation=100 + n % 40, start=_clock(36000 + n * 120),
+            card=500000 + c * runners + n) for n in range(runners))
+        classes.append(u'<ClassStart><Class><Id>{id}</Id><Name>{name}</Name></Class>{persons}</ClassStart>'.format(
+            id=100 + c, name=CLASS_NAMES[c % len(CLASS_NAMES)], persons=persons))
+    return (u'{decl}<StartList xmlns="{ns}" iofVersion="3.0"><Event><Id>1</Id><Name>Tävling 1</Name></Event>'
+            u'{classes}</StartList>').format(decl=XML_DECLARATION, ns=IOF_NAMESPACE, classes=''.join(classes))
+
+
+def _entry(entry_id, event_id, n):
+    return (u'<Entry><EntryId>{id}</EntryId><Competitor><PersonId>{person}</PersonId><OrganisationId>{organisation}'
+            u'</OrganisationId><CCard><CCardId>{card}</CCardId><PunchingUnitType value="SI" /></CCard></Competitor>'
+            u'<EntryClass sequence="1"><EventClassId>{cls}</EventClassId></EntryClass><EventId>{event}</EventId>'
+            u'<EventRaceId>{event}</EventRaceId>{entry_date}{modified}</Entry>').format(
+        id=entry_id, person=1000 + n, organisation=100 + n % 40, card=500000 + n, cls=event_id * 100 + n % 12,
+        event=event_id, entry_date=_date_clock('EntryDate', '2018-04-01', '12:00:00'),
+        modified=_date_clock('ModifyDate', '2018-04-{0:02d}'.format(1 + n % 28), '12:00:00'))
+
+
+def _entries(size):
+    def entries(q):
+        event_ids = _ids(q, 'eventIds', range(1, 1 + 5 * size))
+        return u'<EntryList>{0}</EntryList>'.format(''.join(
+            _entry(event_id * 1000 + n, event_id, n) for event_id in event_ids for n in range(40)))
+    return entries
+
+
+def _competitor(n):
+    return (u'<Competitor><PersonId>{person}</PersonId><OrganisationId>{organisation}</OrganisationId>'
+            u'<CCard><CCardId>{card}</CCardId><PunchingUnitType value="SI" /></CCard>'
+            u'<PreSelectedClass sequence="1"><ClassId>{cls}</ClassId></PreSelectedClass>'
+            u'{modified}</Competitor>').format(person=1000 + n, organisation=100, card=500000 + n, cls=n % 12,
+                                               modified=_date_clock('ModifyDate', '2018-01-01', '12:00:00'))
+
+
+def _documents(size):
+    def documents(q):
+        event_ids = _ids(q, 'eventIds', range(1, 1 + 5 * size))
+        return u'<DocumentList>{0}</DocumentList>'.format(''.join(
+            (u'<Document id="{id}" name="PM {event}" url="https://eventor.orientering.se/Documents/Event/{event}/1"'
+             u' type="Invitation" referenceType="Event" referenceId="{event}" />').format(
+                id=event_id * 10, event=event_id)
+            for event_id in event_ids))
+    return documents
+
+
+def _activity(activity_id):
+    return (u'<Activity id="{id}" url="https://eventor.orientering.se/Activities/Show/{id}" '
+            u'registrationDeadline="2018-05-01 12:00:00"><Name>Träning {id}</Name>{start}</Activity>').format(
+        id=activity_id, start=_date_clock('ActivityTime', '2018-05-01', '18:00:00'))
+
+
+def synthetic_responses(size=1):
+    """
+    Genererade svar i Eventors format för alla funktioner som Eventor-klassen använder. size skalar antalet
+    element (tävlingar, klasser, deltagare osv) i svaren.
+    """
+    members = [_person(n, contact_details=True).replace(u'</Person>', u'<OrganisationId>100</OrganisationId></Person>')
+               for n in range(50 * size)]
+    return {
+        'events': _events(size),
+        'events/documents': _documents(size),
+        'event': lambda q: XML_DECLARATION + _event(1),
+        'eventclasses': lambda q: u'<EventClassList>{0}</EventClassList>'.format(
+            ''.join(_event_class(int(q.get('eventId', 1)), n) for n in range(12))),
+        'entryfees/events': lambda q: (u'<EntryFeeList><EntryFee><EntryFeeId>1</EntryFeeId><Name>Ordinarie</Name>'
+                                       u'<Amount currency="SEK">120</Amount></EntryFee></EntryFeeList>'),
+        'organisation/apiKey': lambda q: _organisation(100, 3, 2),
+        'organisations': lambda q: u'<OrganisationList>{0}</OrganisationList>'.format(''.join(_organisations(size))),
+        'organisation': lambda q: _organisation(100, 3, 2),
+        'persons/organisations': lambda q: u'<PersonList>{0}</PersonList>'.format(''.join(members)),
+        'competitors': lambda q: u'<CompetitorList>{0}</CompetitorList>'.format(
+            ''.join(_competitor(n) for n in range(50 * size))),
+        'externalLoginUrl': lambda q: (u'<ExternalLoginUrl>https://eventor.orientering.se/Login/External?token=abc'
+                                       u'</ExternalLoginUrl>'),
+        'authenticatePerson': lambda q: _person(1),
+        'entries': _entries(size),
+        'competitorcount': lambda q: u'<CompetitorCountList>{0}</CompetitorCountList>'.format(''.join(
+            (u'<CompetitorCount eventId="{event}" organisationId="{organisation}" numberOfEntries="12" '
+             u'numberOfStarts="10" numberOfResults="9" />').format(event=event_id, organisation=organisation_id)
+            for event_id in _ids(q, 'eventIds', [1]) for organisation_id in _ids(q, 'organisationIds', [100]))),
+        'starts/event': lambda q: _start_list(size),
+        'starts/event/iofxml': lambda q: _iof_start_list(size),
+        'starts/person': lambda q: u'<StartListList>{0}</StartListList>'.format(_start_list(1, 1, 1)),
+        'starts/organisation': lambda q: _start_list(size, runners=5),
+        'results/event': lambda q: _result_list(size, q.get('includeSplitTimes') == 'true'),
+        'results/event/iofxml': lambda q: _iof_result_list(size, q.get('includeSplitTimes') == 'true'),
+        'results/person': lambda q: u'<ResultListList>{0}</ResultListList>'.format(
+            _result_list(1, q.get('includeSplitTimes') == 'true', 1, 1)),
+        'results/organisation': lambda q: _result_list(size, q.get('includeSplitTimes') == 'true', runners=5),
+        'activities': lambda q: u'<ActivityList>{0}</ActivityList>'.format(
+            ''.join(_activity(n) for n in range(1, 1 + 10 * size))),
+        'activity': lambda q: _activity(1),
+        'competitor': lambda q: _competitor(1),
+    }